@@ -1,28 +1,65 @@
 import json
-from datetime import datetime
+import math
+import os
+import sqlite3
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # The repository root, for finance_core
+from finance_core import analytics, autosave, batch, concurrency, date_codec, instrumentation, schema
+from finance_core.rollups import Rollups
+from finance_core.transaction_store import TransactionStore, VERIFY_TOTALS, read_totals
 
-# Global list to store transactions
-transactions = []
+# Global store of transactions, kept in typed arrays rather than a list of lists
+transactions = TransactionStore(separator="-")
+rollups = Rollups(transactions)  # Income and expense per period, built on the first report and then kept up to date
+summary_analytics = analytics.Analytics(transactions)  # Vectorized with NumPy when installed; rebuilt after changes
+# "json" keeps transactions.json, "binary" the compact transactions.bin snapshot, "sqlite" an indexed transactions.db
+storage_mode = os.environ.get("FINANCE_STORAGE_MODE", "json")
+# Locked and merged when other processes save too; every save also writes the running totals beside the file
+storage_backend = concurrency.open_shared_backend(storage_mode, keep_totals=True)
+autosaver = autosave.AutoSaver(transactions, storage_backend)  # Saves the menu's edits in the background
+
+# Function to check the running totals against a full recompute when FINANCE_VERIFY_TOTALS=1
+def verify_totals(expected=None):
+    if not VERIFY_TOTALS:
+        return
+    mismatches = transactions.verify_totals(expected)
+    if mismatches:
+        print("Warning: running totals do not match the transactions:")
+        for mismatch in mismatches:
+            print(f"   {mismatch}")
 
 # File handling functions
 # Function to load transactions
+@instrumentation.timed("load_transactions")
 def load_transactions():
     try:
-        with open("transactions.json", "r") as file:
-            file_load = json.load(file)
-        transactions.extend(file_load)
+        if not storage_backend.load(transactions):
+            print("No existing transactions found.")
+        upgraded = schema.upgrade(transactions, storage_backend, schema.LIST_SCHEMA)  # e.g. a CourseWork2/3 file
+        if upgraded:
+            print(upgraded)
+        instrumentation.count("transactions.loaded", len(transactions))
+        saved_totals = read_totals(storage_backend.totals_file())
+        if saved_totals and saved_totals.get("count") == len(transactions):
+            verify_totals(saved_totals)
     except FileNotFoundError:
         print("No existing transactions found.")
     except json.JSONDecodeError:
         print("Error decoding JSON from the file.")
+    except ValueError as e:
+        print(f"Error reading the transactions: {e}")
+    except sqlite3.Error as e:
+        print(f"Error reading the database: {e}")
 
-# Function to save transactions
+# Function to save transactions; returns False if the save failed
+@instrumentation.timed("save_transactions")
 def save_transactions():
     try:
-        with open("transactions.json", "w") as file:
-            json.dump(transactions, file)
-    except IOError:
+        storage_backend.save(transactions)
+    except (IOError, sqlite3.Error):
         print("Error saving transactions.")
+        return False
+    return True
 
 # Feature implementations
 # Function to add a transaction
@@ -30,7 +67,7 @@ def add_transaction():
     while True:
         try: 
             amount = float(input("Enter amount: "))
-            if amount < 0:
+            if not math.isfinite(amount) or amount < 0:
                 raise ValueError("Amount cannot be negative.")
             break
         except ValueError: 
@@ -52,53 +89,57 @@ def add_transaction():
 
     while True:
         date = input("Enter date (YYYY-MM-DD): ")
-        try:
-            datetime.strptime(date, "%Y-%m-%d")
+        if date_codec.is_valid_date(date, "-"):
             break
-        except ValueError:
-            print("Invalid date format. Please use YYYY-MM-DD.")
+        print("Invalid date format. Please use YYYY-MM-DD.")
 
-    transaction = [amount, category, transaction_type, date]
-    transactions.append(transaction)
+    transactions.add(category, amount, date, transaction_type)
     print("Transaction added successfully.")
 
 # Function to view transactions
 def view_transactions():
     if transactions:
-        for count, transaction in enumerate(transactions, start=1):
-            print(f"{count}. Amount: {transaction[0]}, Category: {transaction[1]}, Type: {transaction[2]}, Date: {transaction[3]}")
+        for index, row in enumerate(transactions.rows(), 1):
+            transaction = transactions.record(row)
+            print(f"{index}. Amount: {transaction[0]}, Category: {transaction[1]}, Type: {transaction[2]}, Date: {transaction[3]}, "
+                  f"ID: #{transactions.transaction_id(row)}")
     else:
         print("No transactions found.")
 
+# Function to turn a list index or "#ID" typed by the user into a store row; raises IndexError or KeyError if there is none
+def find_transaction(choice):
+    choice = choice.strip()
+    if choice.startswith("#"):
+        return transactions.row_of(int(choice[1:]))  # O(1) through the store's id index
+    return transactions.nth_row(int(choice) - 1)
+
 # Function to update a transaction
 def update_transaction():
     if transactions:
         try:
-            index = int(input("Enter the index of the transaction to update: ")) - 1
-            if 0 <= index < len(transactions):
-                while True:
-                    try: 
-                        amount = float(input("Enter new amount: "))
-                        break
-                    except ValueError: 
-                        print("Invalid input. Please enter a valid number.")
-
-                category = input("Enter new category: ")
-                transaction_type = input("Enter new type (Income/Expense): ").title()
-
-                while True:
-                    date = input("Enter new date (YYYY-MM-DD): ")
-                    try:
-                        datetime.strptime(date, "%Y-%m-%d")
-                        break
-                    except ValueError:
-                        print("Invalid date format. Please use YYYY-MM-DD.")
-
-                transactions[index] = [amount, category, transaction_type, date]
-                print("Transaction updated successfully.")
-            else:
-                print("Invalid index. Please try again.")
-        except (IndexError, ValueError):
+            row = find_transaction(input("Enter the index (or #ID) of the transaction to update: "))
+            while True:
+                try: 
+                    amount = float(input("Enter new amount: "))
+                    break
+                except ValueError: 
+                    print("Invalid input. Please enter a valid number.")
+
+            category = input("Enter new category: ")
+            transaction_type = input("Enter new type (Income/Expense): ").title()
+
+            while True:
+                date = input("Enter new date (YYYY-MM-DD): ")
+                if date_codec.is_valid_date(date, "-"):
+                    break
+                print("Invalid date format. Please use YYYY-MM-DD.")
+
+            transactions.update(row, amount=amount, date_str=date, category=category,
+                                transaction_type=transaction_type)
+            print("Transaction updated successfully.")
+        except (IndexError, KeyError):
+            print("Invalid index. Please try again.")
+        except ValueError:
             print("Invalid input. Please try again.")
     else:
         print("No transactions found.")
@@ -107,37 +148,84 @@ def update_transaction():
 def delete_transaction():
     if transactions:
         try:
-            index = int(input("Enter the index of the transaction to delete: ")) - 1
-            if 0 <= index < len(transactions):
-                del transactions[index]
-                print("Transaction deleted successfully.")
-            else:
-                print("Invalid index. Please try again.")
-        except (IndexError, ValueError):
+            row = find_transaction(input("Enter the index (or #ID) of the transaction to delete: "))
+            transactions.delete(row)
+            print("Transaction deleted successfully.")
+        except (IndexError, KeyError):
+            print("Invalid index. Please try again.")
+        except ValueError:
             print("Invalid input. Please try again.")
     else:
         print("No transactions found.")
 
 # Function to display summary of transactions
+@instrumentation.timed("display_summary")
 def display_summary():
-    total_income = 0
-    total_expense = 0
-
-    for transaction in transactions:
-        transaction_type = transaction[2]
-        amount = transaction[0]
-        if transaction_type == "Income":
-            total_income += amount  
-        elif transaction_type == "Expense":
-            total_expense += amount 
+    verify_totals()
+    totals = storage_backend.type_totals(transactions)
+    total_income = totals["Income"]
+    total_expense = totals["Expense"]
 
     print(f"Total Income: {total_income}")
     print(f"Total Expense: {total_expense}")
     print(f"Balance: {total_income - total_expense}")
+    percentiles = summary_analytics.percentiles()
+    if percentiles[50] is not None:
+        print("Amount percentiles: " + ", ".join(f"{p}th {amount}" for p, amount in percentiles.items()))
+
+# Function to display income, expense and balance per day, month or year from the rollup buckets
+@instrumentation.timed("display_period_report")
+def display_period_report():
+    granularity = input("Report by day, month or year (default month): ").strip().lower() or "month"
+    start_date = input("From date (YYYY-MM-DD, blank for the first): ").strip() or None
+    end_date = input("To date (YYYY-MM-DD, blank for the last): ").strip() or None
+    print_period_report(granularity, start_date, end_date)
+
+# Function to print the period report; returns False if the granularity or a date is invalid
+def print_period_report(granularity, start_date=None, end_date=None):
+    try:
+        report = rollups.report(granularity, "type", start_date, end_date)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return False
+    if VERIFY_TOTALS:
+        for mismatch in rollups.verify():
+            print(f"Warning: period totals do not match the transactions: {mismatch}")
+    if not report:
+        print("No transactions found in that period.")
+        return
+    for period, totals in report:
+        income = totals.get("Income", 0.0)
+        expense = totals.get("Expense", 0.0)
+        print(f"{period}: Income: {income}, Expense: {expense}, Balance: {income - expense}")
+
+# Function to add a transaction given on the command line
+def batch_add(args):
+    if not math.isfinite(args.amount) or args.amount < 0:
+        raise batch.OperationError("Amount cannot be negative.")
+    if not args.category:
+        raise batch.OperationError("Invalid category. Please enter a valid category.")
+    if not date_codec.is_valid_date(args.date, "-"):
+        raise batch.OperationError("Invalid date format. Please use YYYY-MM-DD.")
+    transactions.add(args.category, args.amount, args.date, args.type)
+    print("Transaction added successfully.")
+
+# Function to run commands without the menu, e.g. "Course_work_01.py add Salary 5000 2024-03-01 Income"
+def run_batch(argv):
+    handlers = {
+        "add": batch_add,
+        "delete": lambda args: batch.delete_ids(transactions, args.ids),
+        "summary": lambda args: display_summary(),
+        "report": lambda args: print_period_report(args.granularity, args.start_date, args.end_date),
+        "export": lambda args: batch.export_file(transactions, args),
+    }
+    return batch.main(argv, transactions, handlers, load_transactions, save_transactions, prog="Course_work_01.py",
+                      date_format="YYYY-MM-DD")
 
 # Function to display the main menu
 def main_menu():
     load_transactions()
+    autosaver.start(save_transactions)
     while True:
         print("\nPersonal Finance Tracker")
         print("1. Add Transaction")
@@ -146,24 +234,35 @@ def main_menu():
         print("4. Delete Transaction")
         print("5. Display Summary")
         print("6. Save and Exit")
+        print("7. Period Report")
         choice = input("Enter your choice: ")
-        if choice == '1':
-            add_transaction()
-        elif choice == '2':
-            view_transactions()
-        elif choice == '3':
-            update_transaction()
-        elif choice == '4':
-            delete_transaction()
-        elif choice == '5':
-            display_summary()
-        elif choice == '6':
-            save_transactions()
-            print("Exiting program.")
-            break
-        else:
-            print("Invalid choice. Please try again.")
+        with autosaver.lock:  # A background save waits until the choice is done with the transactions
+            if choice == '1':
+                add_transaction()
+            elif choice == '2':
+                view_transactions()
+            elif choice == '3':
+                update_transaction()
+            elif choice == '4':
+                delete_transaction()
+            elif choice == '5':
+                display_summary()
+            elif choice == '6':
+                break
+            elif choice == '7':
+                display_period_report()
+            else:
+                print("Invalid choice. Please try again.")
+    autosaver.stop()
+    autosaver.flush()
+    print("Exiting program.")
+    report = autosaver.report()
+    if report:
+        print(report)
 
 # Entry point of the program
 if __name__ == "__main__":
+    instrumentation.start_session()
+    if len(sys.argv) > 1:
+        sys.exit(run_batch(sys.argv[1:]))
     main_menu()
@@ -1,82 +1,139 @@
 import json
+import math
+import os
+import sqlite3
+import sys
+import time
 import tkinter as tk
 from datetime import datetime
-
-transactions = {}
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # The repository root, for finance_core
+from finance_core.bulk_import import BULK_READ_BUFFER, parse_bulk_batch, read_bulk_batches
+from finance_core import analytics, autosave, batch, concurrency, date_codec, instrumentation, schema
+from finance_core.rollups import Rollups
+from finance_core.transaction_store import TransactionStore, VERIFY_TOTALS, read_totals
+
+transactions = TransactionStore()
+rollups = Rollups(transactions)  # Period totals, built on the first report and then kept up to date
+summary_analytics = analytics.Analytics(transactions)  # Vectorized with NumPy when installed; rebuilt after changes
+# "journal" appends changes to a log, "snapshot" rewrites the whole JSON file, "binary" writes transactions.bin,
+# "sqlite" keeps an indexed transactions.db
+storage_mode = os.environ.get("FINANCE_STORAGE_MODE", "journal")
+# Locked and merged when other processes save too; every save also writes the running totals beside the file
+storage_backend = concurrency.open_shared_backend(storage_mode, keep_totals=True)
+autosaver = autosave.AutoSaver(transactions, storage_backend)  # Saves the menu's edits in the background
+
+# Function to check that an amount is a number that is not negative (NaN and infinity included). The menu's add and
+# update use it as well as the batch add, so the menu too now refuses the negative amounts it used to accept
+def validate_amount(amount):
+    return math.isfinite(amount) and amount >= 0
 
 # Function to validate the date format and ensure it's not empty
 def validate_date(date_str, date_format="%Y|%m|%d"):
     if not date_str.strip():  # Check for empty or whitespace-only string
         return False
+    separator = date_codec.SEPARATORS.get(date_format)
+    if separator is not None:
+        return date_codec.is_valid_date(date_str, separator)  # Fast cached parser for the usual formats
     try:
         datetime.strptime(date_str, date_format)
         return True
     except ValueError:
         return False
 
-# Function to load transactions from a JSON file
+# Function to check running totals against a full recompute when FINANCE_VERIFY_TOTALS=1
+def verify_totals(expected=None):
+    if not VERIFY_TOTALS:
+        return
+    mismatches = transactions.verify_totals(expected)
+    if mismatches:
+        print("Warning: running totals do not match the transactions:")
+        for mismatch in mismatches:
+            print(f"   {mismatch}")
+
+# Function to load transactions through the storage backend (for the journal, the snapshot plus the changes since)
+@instrumentation.timed("load_transactions")
 def load_transactions():
     try:
-        with open("transactions.json", "r") as file:
-            data = json.load(file)
-            transactions.update(data)
+        if not storage_backend.load(transactions):
+            print("File not found!")
+        upgraded = schema.upgrade(transactions, storage_backend, schema.CATEGORY_SCHEMA)  # e.g. a CourseWork1 file
+        if upgraded:
+            print(upgraded)
+        instrumentation.count("transactions.loaded", len(transactions))
+        saved_totals = read_totals(storage_backend.totals_file())
+        if saved_totals and saved_totals.get("count") == len(transactions):
+            verify_totals(saved_totals)
     except FileNotFoundError:
         print("File not found!")
     except json.JSONDecodeError:
         print("Error: Could not decode the JSON file.")
+    except sqlite3.Error as e:
+        print(f"Error: Could not read the database: {e}")
     except Exception as e:
         print(f"Unexpected error while loading transactions: {e}")
 
-# Function to save transactions to a JSON file
+# Function to save transactions; the journal appends only the changes made since the last save.
+# Returns False if the save failed, after printing why
+@instrumentation.timed("save_transactions")
 def save_transactions():
     try:
-        with open("transactions.json", "w") as file:
-            json.dump(transactions, file)
+        storage_backend.save(transactions)
     except FileNotFoundError:
         print("File not found!")
     except IOError:
         print("Error: Unable to write to the file.")
+    except sqlite3.Error as e:
+        print(f"Error: Unable to write to the database: {e}")
     except Exception as e:
         print(f"Unexpected error while saving transactions: {e}")
-
-# Function to add transactions from a text file
+    else:
+        return True
+    return False
+
+# Function to print the statistics and the rejected lines of a bulk import in one report
+def print_import_report(report):
+    if report["rejected"]:
+        print(f"{report['rejected']} line(s) were rejected:")
+        for line_number, reason, line in report["errors"]:
+            print(f"   Line {line_number}: {reason} - {line}")
+        if report["rejected"] > len(report["errors"]):
+            print(f"   ... and {report['rejected'] - len(report['errors'])} more.")
+    print(f"Accepted {report['accepted']} transaction(s) in {report['seconds']:.2f}s "
+          f"({report['rows_per_sec']:.0f} rows/sec).")
+
+# Function to add transactions from a text file, streaming it in batches so memory stays flat
+@instrumentation.timed("read_bulk_transactions_from_file")
 def read_bulk_transactions_from_file(filename):
     if not filename.strip():
         print("Filename cannot be empty.")
         return
-    
+
+    report = {"accepted": 0, "rejected": 0, "errors": [], "seconds": 0.0, "rows_per_sec": 0.0}
+    completed = False
+    start = time.perf_counter()
     try:
-        with open(filename, 'r') as file:
-            lines = file.readlines()
-
-            for line in lines:
-                data = line.strip().split(',')
-                category, amount_str, date = data[0], data[1], data[2]
-
-                if not category.strip() or not amount_str.strip() or not date.strip():
-                    print(f"Invalid data in line: {line}")
-                    continue
-
-                try:
-                    amount = float(amount_str)
-                except ValueError:
-                    print(f"Invalid amount in line: {line}")
-                    continue
-
-                if not validate_date(date):
-                    print(f"Invalid date format in line: {line}")
-                    continue
-
-                if category in transactions:
-                    transactions[category].append({"amount": amount, "date": date})
-                else:
-                    transactions[category] = [{"amount": amount, "date": date}]
-            print("Transactions data saved successfully.")
+        with open(filename, 'r', buffering=BULK_READ_BUFFER) as file:
+            for batch in read_bulk_batches(file):
+                for category, amount, date in parse_bulk_batch(batch, report):
+                    transactions.add(category, amount, date)
+                    report["accepted"] += 1
+        completed = True
     except FileNotFoundError:
         print(f"Error: {filename} not found!")
+        return
     except Exception as e:
         print(f"Unexpected error while reading transactions: {e}")
 
+    report["seconds"] = time.perf_counter() - start
+    instrumentation.count("bulk.accepted", report["accepted"])
+    instrumentation.count("bulk.rejected", report["rejected"])
+    total_rows = report["accepted"] + report["rejected"]
+    report["rows_per_sec"] = total_rows / report["seconds"] if report["seconds"] else 0.0
+    print_import_report(report)
+    if completed:
+        print("Transactions data saved successfully.")
+    return report
+
 # Function to add a new transaction
 def add_transaction():
     try:
@@ -96,16 +153,16 @@ def add_transaction():
             print("Invalid amount. Please enter a valid number.")
             return
 
+        if not validate_amount(amount):
+            print("Invalid amount. Please enter a number that is not negative.")
+            return
+
         date = input("Enter date (YYYY|MM|DD): ").strip()
         if not validate_date(date):
             print("Invalid date format. Please use YYYY|MM|DD.")
             return
 
-        new_transaction = {"amount": amount, "date": date}
-        if category in transactions:
-            transactions[category].append(new_transaction)
-        else:
-            transactions[category] = [new_transaction]
+        transactions.add(category, amount, date)
 
         print("Transaction added successfully.")
     except Exception as e:
@@ -118,45 +175,67 @@ def view_transactions():
         for category, details_list in transactions.items():
             print(f"{i}. Category: {category}")
             j = 1
-            for details in details_list:
-                print(f"   {j}. Amount: {details['amount']}\n      Date: {details['date']}")
+            for row in details_list.rows:
+                details = transactions.entry(row)
+                print(f"   {j}. Amount: {details['amount']}\n      Date: {details['date']}\n"
+                      f"      ID: #{transactions.transaction_id(row)}")
                 j += 1
             i += 1
     else:
         print("No transactions found.")
 
+# Function to ask which transaction to change, by category and transaction index or directly by "#ID"; returns its row
+def choose_transaction(action):
+    choice = input(f"Enter the index of the category to {action} (or #ID for a transaction id): ").strip()
+    if choice.startswith("#"):
+        # The id goes straight to the row through the store's id index, without walking the categories
+        if not choice[1:].isdigit():
+            print("Invalid ID. Please enter # followed by a number.")
+            return None
+        try:
+            return transactions.row_of(int(choice[1:]))
+        except KeyError:
+            print(f"No transaction with ID {choice}.")
+            return None
+    if not choice.isdigit():
+        print("Invalid index. Please enter a valid number.")
+        return None
+    category = transactions.categories[int(choice) - 1]
+
+    transaction_index = input(f"Enter the index of the transaction to {action}: ").strip()
+    if not transaction_index.isdigit():
+        print("Invalid index. Please enter a valid number.")
+        return None
+    transaction_index = int(transaction_index) - 1
+    if not 0 <= transaction_index < len(transactions.rows_for(category)):
+        print("Invalid index. Please try again.")
+        return None
+    return transactions.row_at(category, transaction_index)
+
 # Function to update a transaction
 def update_transaction():
     view_transactions()
     if transactions:
         try:
-            category_index = input("Enter the index of the category to update: ").strip()
-            if not category_index.isdigit():
-                print("Invalid index. Please enter a valid number.")
-                return
-            category_index = int(category_index) - 1
-
-            category = list(transactions.keys())[category_index]
-
-            transaction_index = input("Enter the index of the transaction to update: ").strip()
-            if not transaction_index.isdigit():
-                print("Invalid index. Please enter a valid number.")
+            row = choose_transaction("update")
+            if row is None:
                 return
-            transaction_index = int(transaction_index) - 1
 
             amount_str = input("Enter amount: ").strip()
             if not amount_str:
                 print("Amount cannot be empty.")
                 return
             amount = float(amount_str)
+            if not validate_amount(amount):
+                print("Invalid amount. Please enter a number that is not negative.")
+                return
 
             date = input("Enter date (YYYY|MM|DD): ").strip()
             if not validate_date(date):
                 print("Invalid date format. Please use YYYY|MM|DD.")
                 return
 
-            transactions[category][transaction_index]["amount"] = amount
-            transactions[category][transaction_index]["date"] = date
+            transactions.update(row, amount=amount, date_str=date)
 
             print("Transaction updated successfully.")
         except (IndexError, ValueError):
@@ -171,25 +250,12 @@ def delete_transaction():
     view_transactions()
     if transactions:
         try:
-            category_index = input("Enter the index of the category: ").strip()
-            if not category_index.isdigit():
-                print("Invalid index. Please enter a valid number.")
+            row = choose_transaction("delete")
+            if row is None:
                 return
-            category_index = int(category_index) - 1
-
-            category = list(transactions.keys())[category_index]
-
-            transaction_index = input("Enter the index of the transaction to delete: ").strip()
-            if not transaction_index.isdigit():
-                print("Invalid index. Please enter a valid number.")
-                return
-            transaction_index = int(transaction_index) - 1
-
-            if 0 <= transaction_index < len(transactions[category]):
-                deleted_transaction = transactions[category].pop(transaction_index)
-                print("Transaction deleted successfully:", deleted_transaction)
-            else:
-                print("Invalid index. Please try again.")
+            deleted_transaction = transactions.entry(row)
+            transactions.delete(row)
+            print("Transaction deleted successfully:", deleted_transaction)
         except (ValueError, IndexError):
             print("Invalid input. Please enter valid indices.")
         except Exception as e:
@@ -198,15 +264,80 @@ def delete_transaction():
         print("No transactions found.")
 
 # Function to display a summary of all transactions
+@instrumentation.timed("display_summary")
 def display_summary():
     print("Summary:")
-    for category, expenses in transactions.items():
-        total_amount = sum(expense['amount'] for expense in expenses)
+    verify_totals()
+    for category, total_amount in storage_backend.category_totals(transactions).items():
         print(f"{category}: Total amount spent - LKR{total_amount:.2f}")
+    percentiles = summary_analytics.percentiles()
+    if percentiles[50] is not None:
+        print("Amount percentiles: " + ", ".join(f"{p}th LKR{amount:.2f}" for p, amount in percentiles.items()))
+
+# Function to print totals per day, month or year and category, read from the rollup buckets instead of every transaction
+@instrumentation.timed("display_period_report")
+def display_period_report():
+    granularity = input("Report by day, month or year (default month): ").strip().lower() or "month"
+    start_date = input("From date (YYYY|MM|DD, blank for the first): ").strip() or None
+    end_date = input("To date (YYYY|MM|DD, blank for the last): ").strip() or None
+    print_period_report(granularity, start_date, end_date)
+
+# Function to print the period report; returns False if the granularity or a date is invalid
+def print_period_report(granularity, start_date=None, end_date=None):
+    try:
+        report = rollups.report(granularity, "category", start_date, end_date)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return False
+    if VERIFY_TOTALS:
+        for mismatch in rollups.verify():
+            print(f"Warning: period totals do not match the transactions: {mismatch}")
+    if not report:
+        print("No transactions found in that period.")
+        return
+    for period, totals in report:
+        print(f"{period}: Total amount spent - LKR{sum(totals.values()):.2f}")
+        for category, total_amount in totals.items():
+            print(f"   {category}: LKR{total_amount:.2f}")
+    undated = rollups.undated_totals()
+    if undated and not (start_date or end_date):
+        print(f"Without a valid date: LKR{sum(undated.values()):.2f}")
+
+# Function to add a transaction given on the command line
+def batch_add(args):
+    if not args.category.strip():
+        raise batch.OperationError("Category cannot be empty.")
+    if not validate_amount(args.amount):
+        raise batch.OperationError("Invalid amount. Please enter a number that is not negative.")
+    if not validate_date(args.date):
+        raise batch.OperationError("Invalid date format. Please use YYYY|MM|DD.")
+    transactions.add(args.category.strip(), args.amount, args.date, args.type)
+    print("Transaction added successfully.")
+
+# Function to import the bulk files given on the command line, one after another
+def batch_import(args):
+    imported_all = True
+    for filename in args.files:
+        if read_bulk_transactions_from_file(filename) is None:
+            imported_all = False
+    return imported_all
+
+# Function to run commands without the menu, e.g. "coursework_b.py add Food 250 2024|03|01" or "run ops.txt"
+def run_batch(argv):
+    handlers = {
+        "add": batch_add,
+        "import": batch_import,
+        "delete": lambda args: batch.delete_ids(transactions, args.ids),
+        "summary": lambda args: display_summary(),
+        "report": lambda args: print_period_report(args.granularity, args.start_date, args.end_date),
+        "export": lambda args: batch.export_file(transactions, args),
+    }
+    return batch.main(argv, transactions, handlers, load_transactions, save_transactions, prog="coursework_b.py")
 
 # Main menu function to interact with the user
 def main_menu():
     load_transactions()
+    autosaver.start(save_transactions)
 
     while True:
         print("\nPersonal Finance Tracker")
@@ -218,29 +349,41 @@ def main_menu():
         print("6. Add Transactions from File")
         print("7. View GUI Window")
         print("8. Save and Exit")
+        print("9. Period Report")
 
         choice = input("Enter your choice: ").strip()
 
-        if choice == "1":
-            add_transaction()
-        elif choice == "2":
-            view_transactions()
-        elif choice == "3":
-            update_transaction()
-        elif choice == "4":
-            delete_transaction()
-        elif choice == "5":
-            display_summary()
-        elif choice == "6":
-            filename = input("Enter filename to load transactions from: ").strip()
-            read_bulk_transactions_from_file(filename)
-            save_transactions()
-        elif choice == "7":
-            print("Exiting...")
-            save_transactions()
-            break
-        else:
-            print("Invalid choice. Please try again.")
+        with autosaver.lock:  # A background save waits until the choice is done with the transactions
+            if choice == "1":
+                add_transaction()
+            elif choice == "2":
+                view_transactions()
+            elif choice == "3":
+                update_transaction()
+            elif choice == "4":
+                delete_transaction()
+            elif choice == "5":
+                display_summary()
+            elif choice == "6":
+                filename = input("Enter filename to load transactions from: ").strip()
+                read_bulk_transactions_from_file(filename)
+                autosaver.flush()
+            elif choice == "7":
+                print("Exiting...")
+                break
+            elif choice == "9":
+                display_period_report()
+            else:
+                print("Invalid choice. Please try again.")
+
+    autosaver.stop()
+    autosaver.flush()
+    report = autosaver.report()
+    if report:
+        print(report)
 
 if __name__ == "__main__":
+    instrumentation.start_session()
+    if len(sys.argv) > 1:
+        sys.exit(run_batch(sys.argv[1:]))
     main_menu()
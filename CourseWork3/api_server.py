@@ -0,0 +1,366 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import signal
+import sys
+import time
+from itertools import islice
+from urllib.parse import parse_qs, unquote, urlsplit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # The repository root, for finance_core
+import coursework_b
+from finance_core import batch, export, instrumentation
+from finance_core.bulk_import import parse_bulk_batch, read_bulk_batches
+from finance_core.transaction_store import TRANSACTION_TYPES
+
+DEFAULT_HOST = "127.0.0.1"  # Only this machine can connect unless another address is asked for
+DEFAULT_PORT = 8765
+FLUSH_DELAY = 1.0  # Seconds a change may wait in memory before it is saved ...
+FLUSH_OPERATIONS = 1000  # ... unless this many changes have piled up first
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 10000
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 64 * 1024 * 1024  # A bulk import is sent as the request body
+STATUS_TEXT = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    # A request that cannot be answered; the status and message are sent back as {"error": message}
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Function to read an integer query parameter that must not be negative
+def int_param(query, name, default):
+    text = query.get(name)
+    if text is None:
+        return default
+    if not text.isdigit():
+        raise HttpError(400, f"Invalid {name} {text!r}. Please enter a whole number.")
+    return int(text)
+
+
+# Function to check the fields of an added or updated transaction and turn them into TransactionStore.update names;
+# an add needs category, amount and date, an update any of them
+def transaction_fields(data, required):
+    if not isinstance(data, dict):
+        raise HttpError(400, "Expected a JSON object.")
+    fields = {}
+    category = data.get("category")
+    if category is not None or required:
+        if not isinstance(category, str) or not category.strip():
+            raise HttpError(400, "Category cannot be empty.")
+        fields["category"] = category.strip()
+    amount = data.get("amount")
+    if amount is not None or required:
+        if isinstance(amount, bool) or not isinstance(amount, (str, int, float)):
+            raise HttpError(400, "Invalid amount. Please enter a valid number.")
+        try:
+            amount = float(amount)
+        except (ValueError, OverflowError):
+            raise HttpError(400, "Invalid amount. Please enter a valid number.")
+        if not coursework_b.validate_amount(amount):  # "nan", "inf" and negative amounts, as the menu refuses them
+            raise HttpError(400, "Invalid amount. Amounts must be finite and cannot be negative.")
+        fields["amount"] = amount
+    date = data.get("date")
+    if date is not None or required:
+        if not isinstance(date, str) or not coursework_b.validate_date(date):
+            raise HttpError(400, "Invalid date format. Please use YYYY|MM|DD.")
+        fields["date_str"] = date
+    transaction_type = data.get("type")
+    if transaction_type is not None:
+        if not isinstance(transaction_type, str) or transaction_type.title() not in TRANSACTION_TYPES:
+            raise HttpError(400, f"Invalid type. Please use {' or '.join(TRANSACTION_TYPES)}.")
+        fields["transaction_type"] = transaction_type.title()
+    return fields
+
+
+class ApiServer:
+    # Serves coursework_b's transactions over HTTP/1.1 with JSON bodies, for dashboards and scripts.
+    # The store stays in memory and every request is handled whole while holding store_lock, so requests never see
+    # each other's half-made changes. Changes are not saved one by one: the first change after a save starts a timer,
+    # and everything changed before it fires (or before FLUSH_OPERATIONS changes pile up) is written by one save. The
+    # save runs on a worker thread with store_lock held, so the event loop keeps reading and answering connections and
+    # requests wait for the lock instead of the whole server waiting for the disk.
+    # Ids are the store's, as in the menu's #ID; they are saved with the transactions, so an id stays the same after a
+    # restart and is never given to another transaction.
+    def __init__(self, flush_delay=FLUSH_DELAY, flush_operations=FLUSH_OPERATIONS):
+        self.store = coursework_b.transactions
+        self.flush_delay = flush_delay
+        self.flush_operations = flush_operations
+        self.store_lock = asyncio.Lock()  # Held by each request while it runs and by a save until it is written
+        self.flush_handle = None  # Timer of the next save, while changes are waiting
+        self.flush_task = None  # Save started because FLUSH_OPERATIONS changes piled up, until it has the lock
+        self.saved_version = self.store.version
+        self.started = time.monotonic()
+        self.requests = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_seconds = 0.0
+        self.routes = {
+            "transactions": {"GET": self.list_transactions, "POST": self.add_transaction},
+            "transactions/id": {"GET": self.get_transaction, "PUT": self.update_transaction,
+                                "PATCH": self.update_transaction, "DELETE": self.delete_transaction},
+            "summary": {"GET": self.summary},
+            "import": {"POST": self.bulk_import},
+            "flush": {"POST": self.flush_now},
+            "stats": {"GET": self.stats},
+        }
+
+    # Requests
+    async def handle_connection(self, reader, writer):
+        # One connection may send many requests in turn (keep-alive), as load generators and dashboards do
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    break  # The client closed the connection between requests
+                except asyncio.LimitOverrunError:
+                    await self.respond(writer, 413, {"error": "Request headers are too large."}, False)
+                    break
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = request_line.split(" ")
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "Malformed request line."}, False)
+                    break
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    if value:
+                        headers[name.strip().lower()] = value.strip()
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                if "transfer-encoding" in headers:
+                    await self.respond(writer, 411, {"error": "Send the body with a Content-Length."}, False)
+                    break
+                length = headers.get("content-length", "0")
+                if not length.isdigit():
+                    await self.respond(writer, 400, {"error": "Invalid Content-Length."}, False)
+                    break
+                if int(length) > MAX_BODY_BYTES:
+                    await self.respond(writer, 413, {"error": f"The body is over {MAX_BODY_BYTES} bytes."}, False)
+                    break
+                body = await reader.readexactly(int(length)) if int(length) else b""
+                status, payload = await self.dispatch(method, target, body)
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # The client went away mid-request; there is no one left to answer
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode("utf-8")
+        writer.write(f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                     f"\r\n".encode("latin-1") + body)
+        await writer.drain()
+
+    async def dispatch(self, method, target, body):
+        # Runs one request to the end and returns (status, payload); the handler runs with store_lock held and does not
+        # await, so requests are never interleaved. POST /flush is the one coroutine handler: it takes the lock itself
+        self.requests += 1
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query, keep_blank_values=True).items()}
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]  # e.g. /transactions/%2312 for #12
+        arguments = ()
+        if len(parts) == 2 and parts[0] == "transactions":
+            parts, arguments = ["transactions", "id"], (parts[1],)
+        methods = self.routes.get("/".join(parts))
+        if methods is None:
+            return 404, {"error": f"No such resource {url.path}."}
+        handler = methods.get(method)
+        if handler is None:
+            return 405, {"error": f"{method} is not allowed here; use {', '.join(methods)}."}
+        try:
+            with instrumentation.timer(f"api.{method} {'/'.join(parts)}"):
+                if asyncio.iscoroutinefunction(handler):
+                    return await handler(query, body, *arguments)
+                async with self.store_lock:
+                    return handler(query, body, *arguments)
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        except (batch.OperationError, ValueError) as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            print(f"Unexpected error while answering {method} {target}: {e}")
+            return 500, {"error": "Unexpected error; see the server's output."}
+        finally:
+            if self.store.version != self.saved_version:
+                self.changed()
+
+    def read_json(self, body):
+        try:
+            return json.loads(body)
+        except ValueError:
+            raise HttpError(400, "The body is not valid JSON.")
+
+    def row_for(self, text):
+        try:
+            return self.store.row_of(batch.parse_id(text))
+        except KeyError:
+            raise HttpError(404, f"No transaction with ID {text}.")
+
+    # Operations
+    def list_transactions(self, query, body):
+        # One page of the transactions matching ?category=&type=&from=&to=, in the order they were added
+        offset = int_param(query, "offset", 0)
+        limit = min(int_param(query, "limit", DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE)
+        transaction_type = query.get("type")
+        rows = export.select_rows(self.store, query.get("category"), query.get("from") or None,
+                                  query.get("to") or None, transaction_type.title() if transaction_type else None)
+        page = list(islice(rows, offset, offset + limit + 1))  # One more than asked for tells whether more follow
+        return 200, {"transactions": [export.transaction_object(self.store, row) for row in page[:limit]],
+                     "offset": offset, "limit": limit, "next_offset": offset + limit if len(page) > limit else None}
+
+    def get_transaction(self, query, body, transaction_id):
+        return 200, export.transaction_object(self.store, self.row_for(transaction_id))
+
+    def add_transaction(self, query, body):
+        fields = transaction_fields(self.read_json(body), required=True)
+        row = self.store.add(fields["category"], fields["amount"], fields["date_str"],
+                             fields.get("transaction_type", "Expense"))
+        return 201, export.transaction_object(self.store, row)
+
+    def update_transaction(self, query, body, transaction_id):
+        row = self.row_for(transaction_id)
+        fields = transaction_fields(self.read_json(body), required=False)
+        if not fields:
+            raise HttpError(400, "Nothing to update; send any of category, amount, date and type.")
+        self.store.update(row, **fields)
+        return 200, export.transaction_object(self.store, row)
+
+    def delete_transaction(self, query, body, transaction_id):
+        row = self.row_for(transaction_id)
+        deleted = export.transaction_object(self.store, row)
+        self.store.delete(row)
+        return 200, {"deleted": deleted}
+
+    def summary(self, query, body):
+        backend = coursework_b.storage_backend
+        return 200, {"count": len(self.store), "categories": backend.category_totals(self.store),
+                     "types": backend.type_totals(self.store)}
+
+    def bulk_import(self, query, body):
+        # The body is a bulk file, one "category,amount,YYYY|MM|DD" line per transaction; bad lines are reported
+        # Each batch is added a category at a time with add_many, so listeners get one event per column, not per row
+        report = {"accepted": 0, "rejected": 0, "errors": []}
+        for lines in read_bulk_batches(io.StringIO(body.decode("utf-8"))):
+            grouped = {}
+            for category, amount, date in parse_bulk_batch(lines, report):
+                amounts, dates = grouped.setdefault(category, ([], []))
+                amounts.append(amount)
+                dates.append(date)
+                report["accepted"] += 1
+            for category, (amounts, dates) in grouped.items():
+                self.store.add_many(category, amounts, dates)
+        instrumentation.count("bulk.accepted", report["accepted"])
+        instrumentation.count("bulk.rejected", report["rejected"])
+        report["errors"] = [{"line": line_number, "reason": reason, "text": line}
+                            for line_number, reason, line in report["errors"]]
+        return 200, report
+
+    async def flush_now(self, query, body):
+        # Save now instead of waiting for the timer, e.g. before a script copies the file
+        if not await self.flush():
+            return 500, {"error": "The save failed; see the server's output.", **self.flush_stats()}
+        return 200, self.flush_stats()
+
+    def stats(self, query, body):
+        return 200, {"requests": self.requests, "transactions": len(self.store),
+                     "uptime_seconds": time.monotonic() - self.started, **self.flush_stats()}
+
+    # Saving
+    def flush_stats(self):
+        return {"pending_changes": self.store.version - self.saved_version, "flushes": self.flushes,
+                "failed_flushes": self.failed_flushes, "last_flush_ms": self.last_flush_seconds * 1000}
+
+    def changed(self):
+        if self.flush_task is not None:
+            return  # A save is already waiting for the lock and will take these changes too
+        if self.store.version - self.saved_version >= self.flush_operations:
+            self.start_flush()
+        elif self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(self.flush_delay, self.start_flush)
+
+    def start_flush(self):
+        # Called by the timer, or at once when FLUSH_OPERATIONS changes are waiting; flush() cancels the timer
+        self.flush_task = asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self):
+        # Save every change made since the last save in one go; with the journal only those changes are appended.
+        # Returns False if the save failed: the changes stay pending and the save is tried again after flush_delay
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        async with self.store_lock:
+            self.flush_task = None  # Changes made from here on are after this save and start the next one
+            if self.store.version == self.saved_version:
+                return True
+            start = time.perf_counter()
+            saved = await asyncio.get_running_loop().run_in_executor(None, self.save)
+            self.last_flush_seconds = time.perf_counter() - start
+            if not saved:
+                self.failed_flushes += 1
+                if self.flush_handle is None:
+                    self.flush_handle = asyncio.get_running_loop().call_later(self.flush_delay, self.start_flush)
+                return False
+            self.saved_version = self.store.version  # A save that merged another process's changes counts as saved
+            self.flushes += 1
+            return True
+
+    def save(self):
+        # Runs on the executor's thread; the store is only touched by requests holding store_lock, which flush() holds
+        # until this returns, and autosaver.lock is the store's own lock for coursework_b's other threads
+        with coursework_b.autosaver.lock:
+            return coursework_b.save_transactions()
+
+
+# Function to load the transactions, serve them until SIGINT or SIGTERM, then save what is left and close the file
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, flush_delay=FLUSH_DELAY, flush_operations=FLUSH_OPERATIONS):
+    coursework_b.load_transactions()
+    api = ApiServer(flush_delay, flush_operations)
+    server = await asyncio.start_server(api.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signal_number, stopping.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: Ctrl+C still ends the server, only without the final save
+    address = server.sockets[0].getsockname()
+    print(f"Serving {len(api.store)} transaction(s) from {coursework_b.storage_backend.filename} "
+          f"on http://{address[0]}:{address[1]}/ (Ctrl+C to stop).", flush=True)
+    try:
+        async with server:
+            await stopping.wait()
+    finally:
+        if not await api.flush():
+            print(f"Warning: {api.flush_stats()['pending_changes']} change(s) could not be saved.")
+        coursework_b.storage_backend.close()
+        print(f"Stopped after {api.requests} request(s) and {api.flushes} save(s).")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the transactions as a local HTTP/JSON API: "
+                                                 "GET/POST /transactions, GET/PUT/PATCH/DELETE /transactions/ID, "
+                                                 "GET /summary, POST /import, POST /flush and GET /stats.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on (default %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on (default %(default)s)")
+    parser.add_argument("--flush-delay", type=float, default=FLUSH_DELAY,
+                        help="seconds changes may wait before they are saved (default %(default)s)")
+    parser.add_argument("--flush-operations", type=int, default=FLUSH_OPERATIONS,
+                        help="save as soon as this many changes are waiting (default %(default)s)")
+    args = parser.parse_args(argv)
+    instrumentation.start_session()
+    asyncio.run(serve(args.host, args.port, args.flush_delay, args.flush_operations))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,62 @@
 import tkinter as tk  # Import the tkinter module as tk for easy reference.
 from tkinter import ttk  # Import ttk submodule from tkinter for themed widgets.
-from datetime import datetime  # Import the datetime class from the datetime module.
+from tkinter import filedialog  # Import filedialog to pick a file of transactions to import.
 import json  # Import the json module for file handling.
+import os  # Import the os module to find the repository root.
+import sys  # Import the sys module to put the repository root on the import path.
+import threading  # Import the threading module for the lock kept around changes to the store.
+import time  # Import the time module to measure how long the tree takes to appear.
+from collections import OrderedDict  # Import OrderedDict to keep the sort cache in least recently used order.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # The repository root, for finance_core
+from finance_core import concurrency  # Import the concurrency module so saves merge with other processes' saves.
+from finance_core import instrumentation  # Import the instrumentation module to time the slow paths.
+from finance_core import storage  # Import the storage module to load from whichever backend the file belongs to.
+from finance_core.transaction_store import CategoryView, TransactionStore  # Import the array-backed transaction store.
+from search_index import ID_PREFIX, SearchIndex  # Import the search index kept in step with the store.
+from background import BackgroundTask  # Import the worker thread used for loading, importing and saving.
+from finance_core.bulk_import import parse_bulk_file  # Import the bulk file parser shared with the menu's import option.
+
+CHILD_CHUNK_SIZE = 500  # Rows inserted per pass of the event loop when a category is expanded
+SORT_CACHE_SIZE = 16  # Sorted row orders of the current data remembered for repeat clicks; the least recently used goes
+POLL_INTERVAL_MS = 50  # How often the event loop checks on a background load, import or save
+INCREMENTAL_CHANGE_LIMIT = 200  # Changes applied row by row in one burst; past this the tree is rebuilt once instead
 
 class FinanceTrackerGUI:
-    def __init__(self, root):
+    def __init__(self, root, filename="transactions.json", editable=True, transactions=None, backend=None,
+                 store_lock=None):
         self.root = root  # Assign the Tkinter root window to an instance variable.
         self.root.title("Personal Finance Tracker")  # Set the window title
         self.root.geometry("600x700")  # Set window size
         self.root.configure(bg="#F5F5F5")  # Set background color of the root window
 
-        self.transactions = self.load_transactions("transactions.json")  # Load file for transactions
+        self.filename = filename  # File the transactions are loaded from and saved to
+        self.editable = editable  # False when the window should only view the file
+        self.backend = backend  # Storage backend shared with the menu, or None to save through a backend for filename
+        self.owns_backend = False  # True once the window has opened a backend of its own while loading filename
+        # Held while the store is changed or saved; the menu passes its autosave lock so its background saves keep going
+        self.store_lock = store_lock if store_lock is not None else threading.RLock()
+        self.merge_job = None  # Pending after() job applying rows the menu's background saves merged in
+        self.transactions = None
+        self.search_index = None
+        self.category_nodes = {}  # Category name -> its node in the tree
+        self.showing_search = False  # True while the tree shows search results rather than every transaction
+        self.shown_term = ""  # Search term of the rows on show, part of the sort cache key
+        self.refresh_job = None  # Pending after_idle() job that finishes a burst of store changes
+        self.changes_in_burst = 0  # Store changes seen since that job was scheduled
+        self.full_refresh_needed = False  # Set when a burst is too big to follow row by row; the tree is rebuilt
+        self.task = None  # BackgroundTask currently loading, importing or saving
+        self.task_done = None  # Called on the Tk thread with the task's result
+        self.task_job = None  # Pending after() job polling the task
         self.expense_labels = {}  # Initialize expense labels dictionary
+        self.shown_rows = {}  # Category node -> rows shown under it, in display order
+        self.id_items = {}  # Category node -> {transaction id: tree item} once expanded, including rows a search detached
+        self.insert_jobs = {}  # Category node -> pending after() job inserting the rest of its rows
+        self.restripe_jobs = {}  # Category node -> (pending after() job, first row it restripes) recolouring its rows
+        self.sort_spec = []  # (column, reverse) pairs for the clicked child columns, most recent last
+        self.sort_cache = OrderedDict()  # (category node, search term, sort spec) -> sorted rows, oldest use first
+        self.sort_cache_version = None  # Data version the cached orders were sorted from
+        self.category_sort_reverse = None  # Order of the category nodes once "Category" has been clicked
+        self.first_paint_seconds = 0.0  # Time taken by the last display_transactions call to appear
 
         self.create_widgets()  # Call the method to create GUI widgets.
 
@@ -19,6 +64,15 @@ class FinanceTrackerGUI:
         self.not_found_label = tk.Label(self.root, text="", font=("Adobe Caslon Pro Bold", 12), fg="red", bg="#F5F5F5")
         self.not_found_label.pack()
 
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        if transactions is not None:
+            self.set_transactions(transactions)  # Share the menu's store; nothing is read from disk
+            if store_lock is not None:
+                self.merge_job = self.root.after(POLL_INTERVAL_MS, self.apply_saved_merge)
+        else:
+            self.set_transactions(TransactionStore())  # Empty until the background load hands the real data over
+            self.start_load()  # Read the file on a worker thread so the window appears straight away
+
     def create_widgets(self):
         # Create and configure GUI widgets
         # Define a custom style for the buttons
@@ -58,6 +112,7 @@ class FinanceTrackerGUI:
         self.tree.tag_configure('oddrow', background="#E8E8E8")
         self.tree.tag_configure('evenrow', background="#DFDFDF")
         self.tree.tag_configure('highlight', foreground="white", background="darkblue")
+        self.tree.bind("<<TreeviewOpen>>", self.on_category_open)  # Insert child rows only when a category is expanded
 
         # Scrollbar for the Treeview
         tree_scroll = ttk.Scrollbar(self.table_frame, orient=tk.VERTICAL, command=self.tree.yview)
@@ -79,8 +134,25 @@ class FinanceTrackerGUI:
         self.expense_button = ttk.Button(self.root, text="Show Summary", style="Custom.TButton", command=self.show_summary_expense)
         self.expense_button.pack()
 
+        # Buttons to import a file of transactions and to save, both run on a worker thread
+        self.import_button = ttk.Button(self.root, text="Import File", style="Custom.TButton", command=self.import_file)
+        self.save_button = ttk.Button(self.root, text="Save", style="Custom.TButton", command=self.save_file)
+        if self.editable:
+            self.import_button.pack()
+            self.save_button.pack()
+
+        # Progress bar, status and cancel button for the background task
+        self.task_frame = tk.Frame(self.root, bg="#F5F5F5")
+        self.task_frame.pack(pady=5)
+        self.progress_bar = ttk.Progressbar(self.task_frame, length=200, mode="determinate", maximum=100)
+        self.progress_bar.pack(side=tk.LEFT, padx=5)
+        self.cancel_button = ttk.Button(self.task_frame, text="Cancel", style="Custom.TButton", command=self.cancel_task, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT)
+        self.status_label = tk.Label(self.root, text="", font=("Adobe Garamond Pro", 11), bg="#F5F5F5")
+        self.status_label.pack()
+
         # Button to exit the window
-        self.exit_button = ttk.Button(self.root, text="Exit", style="Custom.TButton", command=self.root.destroy)
+        self.exit_button = ttk.Button(self.root, text="Exit", style="Custom.TButton", command=self.close)
         self.exit_button.pack()
 
         # Configure canvas scrolling
@@ -91,12 +163,251 @@ class FinanceTrackerGUI:
         self.canvas.configure(scrollregion=self.canvas.bbox("all"))
 
     def load_transactions(self, filename):
+        transactions = TransactionStore()  # An empty store is returned if the file is not found.
+        # Journal for .json, binary snapshot for .bin, SQLite for .db; kept for saving, so that changes the menu or
+        # another window saved in the meantime are merged rather than overwritten.
+        backend = concurrency.shared_backend_for_file(filename)
         try:
-            with open(filename, "r") as file:  # Open the JSON file for reading.
-                transactions = json.load(file)  # Load JSON data into a Python dictionary
-            return transactions  # Return the loaded transactions.
-        except FileNotFoundError:
-            return {}  # Return an empty dictionary if the file is not found.
+            backend.load(transactions)
+        except BaseException:
+            backend.close()
+            raise
+        return transactions, backend  # Return the loaded transactions and the backend that follows them.
+
+    # Background tasks
+    def run_task(self, description, work, on_done, determinate=False):
+        # Start work(task) on a worker thread; on_done(result) runs on the Tk thread once it finishes
+        if self.task is not None:
+            return  # One load, import or save at a time
+        self.task = BackgroundTask(work)
+        self.task_done = on_done
+        self.status_label.config(text=description)
+        self.progress_bar.config(mode="determinate" if determinate else "indeterminate", value=0)
+        if not determinate:
+            self.progress_bar.start(10)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.import_button.config(state=tk.DISABLED)
+        self.save_button.config(state=tk.DISABLED)
+        self.task.start()
+        self.task_job = self.root.after(POLL_INTERVAL_MS, self.poll_task)
+
+    def poll_task(self):
+        self.task_job = None
+        for kind, value in self.task.poll():
+            if kind == "progress":
+                self.progress_bar.config(value=value * 100)
+            elif kind == "committing":
+                self.cancel_button.config(state=tk.DISABLED)  # The write is under way and will be finished
+            else:
+                self.finish_task(kind, value)
+                return
+        self.task_job = self.root.after(POLL_INTERVAL_MS, self.poll_task)
+
+    def cancel_task(self):
+        # The worker stops at its next check and whatever it produces is thrown away
+        if self.task is not None and self.task.cancel():
+            self.finish_task("cancelled", None)
+
+    def finish_task(self, kind, value):
+        on_done = self.task_done
+        if self.task_job is not None:
+            self.root.after_cancel(self.task_job)
+        self.task = self.task_done = self.task_job = None
+        self.progress_bar.stop()
+        self.progress_bar.config(mode="determinate", value=0)
+        self.cancel_button.config(state=tk.DISABLED)
+        self.import_button.config(state=tk.NORMAL)
+        self.save_button.config(state=tk.NORMAL)
+        if kind == "done":
+            on_done(value)
+        elif kind == "error":
+            self.status_label.config(text=f"Error: {value}")
+        else:
+            self.status_label.config(text="Cancelled.")
+
+    def start_load(self):
+        filename = self.filename
+        self.run_task(f"Loading {filename}...", lambda task: self.load_transactions(filename), self.on_loaded)
+
+    def on_loaded(self, result):
+        # Swap in the store the worker built and show it
+        transactions, backend = result
+        if self.owns_backend:
+            self.backend.close()
+        self.backend, self.owns_backend = backend, True
+        self.set_transactions(transactions)
+        self.status_label.config(text=f"Loaded {len(transactions)} transaction(s).")
+        self.display_transactions(self.transactions)
+
+    def import_file(self):
+        filename = filedialog.askopenfilename(title="Import transactions", filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+        if filename:
+            self.run_task(f"Importing {filename}...", lambda task: parse_bulk_file(filename, task.progress, task.cancelled),
+                          self.on_imported, determinate=True)
+
+    def on_imported(self, result):
+        # The worker only parsed the file; the rows are added here on the Tk thread
+        filename, grouped, report = result
+        if report["failed"]:
+            self.status_label.config(text=report["failed"])
+            return
+        with self.store_lock:
+            self.apply_merge()  # A merge is only valid for the store it was saved from, so it goes first
+            for category, (amounts, dates) in grouped.items():
+                self.transactions.add_many(category, amounts, dates)  # The tree follows through on_store_change
+        self.status_label.config(text=f"Imported {report['accepted']} transaction(s), {report['rejected']} line(s) rejected.")
+
+    def save_file(self):
+        self.run_task(f"Saving {self.filename}...", self.save_transactions, self.on_saved)
+
+    def save_transactions(self, task):
+        # Runs on the worker thread; the store is not changed while a task is running
+        if not task.begin_commit():
+            return False
+        with self.store_lock:  # The menu's background save of the same backend waits for this one
+            if isinstance(self.backend, concurrency.SharedBackend):
+                # Rows merged from another process are applied in on_saved, back on the Tk thread that owns the store
+                self.backend.save(self.transactions, defer_merge=True)
+                return True
+            if self.backend is not None:
+                self.backend.save(self.transactions)  # The menu's backend, so its journal or database stays in step
+                return True
+            backend = storage.backend_for_file(self.filename)
+            try:
+                backend.save_all(self.transactions)
+            finally:
+                backend.close()
+        return True
+
+    # Shared store and change notifications
+    def set_transactions(self, transactions):
+        if self.transactions is not None:
+            self.transactions.unsubscribe(self.on_store_change)
+            self.search_index.close()
+        self.transactions = transactions
+        self.search_index = SearchIndex(transactions)
+        self.sort_cache.clear()
+        self.sort_cache_version = None
+        self.reset_tree()  # Row numbers of the old store mean nothing in the new one
+        transactions.subscribe(self.on_store_change)
+
+    def on_store_change(self, event, row, old):
+        # Apply small changes to the rows they touch; a big burst (an import or a reload) rebuilds the tree once it is over
+        if self.refresh_job is None:
+            self.refresh_job = self.root.after_idle(self.finish_store_changes)
+            self.changes_in_burst = 0
+        self.changes_in_burst += len(self.transactions.amounts) - row if event == "add_many" else 1
+        if self.full_refresh_needed:
+            return
+        if event in ("clear", "compact") or self.changes_in_burst > INCREMENTAL_CHANGE_LIMIT:
+            self.full_refresh_needed = True
+        elif event == "add":
+            self.add_tree_row(row)
+        elif event == "add_many":
+            for new_row in range(row, len(self.transactions.amounts)):
+                self.add_tree_row(new_row)
+        elif event == "update":
+            if old[1] != self.transactions.category(row):
+                self.remove_tree_row(old[1], row)
+                self.add_tree_row(row)
+            else:
+                item = self.id_items.get(self.category_nodes.get(old[1]), {}).get(self.transactions.ids[row])
+                if item is not None:
+                    self.tree.item(item, values=(self.transactions.date(row), self.transactions.amounts[row]))
+        elif event == "delete":
+            self.remove_tree_row(old[1], row)  # Deleted rows stay as tombstones, so no other row moves
+
+    def finish_store_changes(self):
+        self.refresh_job = None
+        if self.full_refresh_needed:
+            self.full_refresh_needed = False
+            self.reset_tree()
+            self.search_transactions()  # Redisplay with the current search, or everything if there is none
+        elif self.showing_search:
+            self.search_transactions()  # Filter again; only rows that start or stop matching move
+        if self.expense_labels:
+            self.show_summary_expense()
+
+    def add_tree_row(self, row):
+        category = self.transactions.category(row)
+        category_node = self.category_nodes.get(category)
+        if category_node is None:
+            idx = len(self.category_nodes)
+            category_node = self.tree.insert("", "end", text=category, tags=('evenrow' if idx % 2 == 0 else 'oddrow',))
+            self.category_nodes[category] = category_node
+            self.shown_rows[category_node] = []
+        rows = self.shown_rows[category_node]
+        rows.append(row)
+        if category_node not in self.id_items:
+            if len(rows) == 1:
+                self.tree.insert(category_node, "end")  # Placeholder child so the + expander is shown
+        elif category_node not in self.insert_jobs:  # A chunked insert still running picks the row up by itself
+            self.insert_row_item(category_node, row, len(rows) - 1)
+
+    def insert_row_item(self, category_node, row, position=None):
+        # Add the item of one row at the end of its category, labelled with the transaction id;
+        # position picks the stripe, None leaves it to a restripe
+        transaction_id = self.transactions.ids[row]
+        tags = () if position is None else ('evenrow' if position % 2 == 0 else 'oddrow',)
+        item = self.tree.insert(category_node, "end", text=f"{ID_PREFIX}{transaction_id}",
+                                values=(self.transactions.date(row), self.transactions.amounts[row]), tags=tags)
+        self.id_items[category_node][transaction_id] = item
+        return item
+
+    def remove_tree_row(self, category, row):
+        category_node = self.category_nodes.get(category)
+        if category_node is None:
+            return
+        rows = self.shown_rows[category_node]
+        position = rows.index(row) if row in rows else len(rows)
+        if position < len(rows):
+            del rows[position]
+        items = self.id_items.get(category_node)
+        if items is None:
+            if not rows:
+                self.tree.delete(*self.tree.get_children(category_node))  # Drop the placeholder
+        else:
+            item = items.pop(self.transactions.ids[row], None)
+            if item is not None:
+                self.tree.delete(item)
+                self.restripe_child_rows(category_node, position)  # The rows after it moved up one place
+
+    def close(self):
+        # Stop following the store before the window goes; the menu keeps using it afterwards
+        if self.task is not None:
+            self.task.cancel()
+        self.cancel_tree_jobs()
+        if self.refresh_job is not None:
+            self.root.after_cancel(self.refresh_job)
+            self.refresh_job = None
+        if self.task_job is not None:
+            self.root.after_cancel(self.task_job)
+            self.task_job = None
+        if self.merge_job is not None:
+            self.root.after_cancel(self.merge_job)
+            self.merge_job = None
+        self.transactions.unsubscribe(self.on_store_change)
+        self.search_index.close()
+        if self.owns_backend:
+            self.backend.close()
+        self.root.destroy()
+
+    def on_saved(self, saved):
+        with self.store_lock:
+            self.apply_merge()  # The tree follows the merged rows through on_store_change
+        self.status_label.config(text=f"Saved {len(self.transactions)} transaction(s) to {self.filename}." if saved else "Cancelled.")
+
+    def apply_merge(self):
+        # Bring in the rows the last save merged from another process; called on the Tk thread holding store_lock
+        if isinstance(self.backend, concurrency.SharedBackend):
+            self.backend.apply_merge(self.transactions)
+
+    def apply_saved_merge(self):
+        # The menu's background saves run on its autosave thread and leave their merges to the window's thread
+        self.merge_job = self.root.after(POLL_INTERVAL_MS, self.apply_saved_merge)
+        if self.task is None and getattr(self.backend, "merged", None) is not None:  # Only a SharedBackend merges
+            with self.store_lock:
+                self.apply_merge()
 
     def show_summary_expense(self):
         # Clear existing labels
@@ -104,98 +415,220 @@ class FinanceTrackerGUI:
             label.destroy()
         self.expense_labels = {}
 
-        # Calculate and display expenses for each category
-        for category, items in self.transactions.items():
-            category_total = sum(item["amount"] for item in items)
+        # Calculate and display expenses for each category with a scan over the amount column
+        for category, category_total in self.transactions.category_totals().items():
             label_text = f"{category}: LKR {category_total:.2f}"
             label = tk.Label(self.root, text=label_text, font=("Adobe Caslon Pro Bold", 12), fg="black", bg="#F5F5F5")
             label.pack()
             self.expense_labels[category] = label
 
-    def display_transactions(self, transactions):
-        # Clear existing entries
+    def reset_tree(self):
+        # Forget every node and item, so the next display_transactions builds the tree from scratch
+        self.cancel_tree_jobs()
         self.tree.delete(*self.tree.get_children())
-
-        # Add transactions to the Treeview
-        for idx, (category, items) in enumerate(transactions.items()):
-            sorted_items = sorted(items, key=lambda x: datetime.strptime(x['date'], '%Y|%m|%d'))
-            category_node = self.tree.insert("", "end", text=category, tags=('evenrow' if idx % 2 == 0 else 'oddrow',))
-            for i, item in enumerate(sorted_items):
-                # Convert date format to YYYY|MM|DD
-                formatted_date = datetime.strptime(item['date'], '%Y|%m|%d').strftime('%Y|%m|%d')
-                child_node = self.tree.insert(category_node, "end", tags=('evenrow' if i % 2 == 0 else 'oddrow',))
-                self.tree.set(child_node, "Date", formatted_date)
-                self.tree.set(child_node, "Amount", item["amount"])
-
+        self.tree.delete(*[node for node in self.category_nodes.values() if self.tree.exists(node)])  # Detached ones
+        self.shown_rows = {}
+        self.id_items = {}
+        self.category_nodes = {}
+
+    @instrumentation.timed("display_transactions")
+    def display_transactions(self, transactions, search_term=""):
+        start = time.perf_counter()  # Start timing the first paint
+        self.showing_search = bool(search_term)
+        self.shown_term = search_term
+        # Nodes and rows already in the tree are kept; only the ones that differ from the new set are touched
+        nodes = []
+        for category, items in transactions.items():
+            category_node = self.category_nodes.get(category)
+            if category_node is None:
+                category_node = self.tree.insert("", "end", text=category)
+                self.category_nodes[category] = category_node
+                instrumentation.count("tree.category_nodes")
+            nodes.append(category_node)
+            self.show_category_rows(category_node, self.sorted_rows(category_node, items.rows))
+        # Categories left out are detached, not deleted, so clearing the search puts them back as they were
+        self.tree.set_children("", *nodes)
+        if self.category_sort_reverse is not None:
+            self.sort_categories(self.category_sort_reverse)
+        else:
+            for idx, node in enumerate(nodes):
+                self.tree.item(node, tags=('evenrow' if idx % 2 == 0 else 'oddrow',))
+
+        self.root.update_idletasks()  # Let Tk lay out the tree before the timer stops
+        self.first_paint_seconds = time.perf_counter() - start
+
+    def show_category_rows(self, category_node, rows):
+        # Bring one category's children in line with rows, reusing the items it already has
+        old_rows = self.shown_rows.get(category_node, [])
+        self.shown_rows[category_node] = rows
+        items = self.id_items.get(category_node)
+        if items is None:
+            # Not expanded yet, only the placeholder has to match
+            placeholder = self.tree.get_children(category_node)
+            if rows and not placeholder:
+                self.tree.insert(category_node, "end")  # Placeholder child so the + expander is shown
+            elif placeholder and not rows:
+                self.tree.delete(*placeholder)
+            return
+        ids = self.transactions.ids
+        missing = [row for row in rows if ids[row] not in items]
+        if category_node in self.insert_jobs or len(missing) > CHILD_CHUNK_SIZE:
+            # Too many new rows to add in one go (or still filling); insert the category again a chunk at a time
+            self.reinsert_child_rows(category_node)
+            return
+        if not missing and rows == old_rows:
+            return
+        instrumentation.count("tree.rows_inserted", len(missing))
+        for row in missing:
+            self.insert_row_item(category_node, row)
+        # One call re-orders the children; items of rows left out are detached and kept for when they match again
+        self.tree.set_children(category_node, *[items[ids[row]] for row in rows])
+        first_change = next((i for i, (a, b) in enumerate(zip(old_rows, rows)) if a != b), min(len(old_rows), len(rows)))
+        self.restripe_child_rows(category_node, first_change)
+
+    def on_category_open(self, event):
+        # Replace the placeholder with the real rows the first time a category is expanded
+        category_node = self.tree.focus()
+        if category_node not in self.shown_rows or category_node in self.id_items:
+            return
+        self.tree.delete(*self.tree.get_children(category_node))
+        self.id_items[category_node] = {}
+        self.insert_child_rows(category_node)
+
+    def reinsert_child_rows(self, category_node):
+        # Drop every item of a category and insert its rows again, in their current order, a chunk at a time
+        self.cancel_category_jobs(category_node)
+        self.tree.delete(*self.id_items[category_node].values())
+        self.id_items[category_node] = {}
+        self.insert_child_rows(category_node)
+
+    def insert_child_rows(self, category_node):
+        # Insert a chunk of rows, then hand control back to Tk so the window stays responsive. The items inserted so far
+        # are always the first rows of the category (a row removed meanwhile leaves both), so the insert resumes after them
+        self.insert_jobs.pop(category_node, None)
+        if not self.tree.exists(category_node):
+            return  # The tree was rebuilt while rows were still being inserted
+        rows = self.shown_rows[category_node]
+        start = len(self.id_items[category_node])
+        end = min(start + CHILD_CHUNK_SIZE, len(rows))
+        instrumentation.count("tree.rows_inserted", end - start)
+        for i in range(start, end):
+            self.insert_row_item(category_node, rows[i], i)
+        if end < len(rows):
+            self.insert_jobs[category_node] = self.root.after(1, self.insert_child_rows, category_node)
+
+    def restripe_child_rows(self, category_node, start):
+        # Fix the alternating row colours from start on after a re-order; a restripe still waiting to run is folded in
+        pending = self.restripe_jobs.pop(category_node, None)
+        if pending is not None:
+            self.root.after_cancel(pending[0])
+            start = min(start, pending[1])
+        self.restripe_chunk(category_node, start)
+
+    def restripe_chunk(self, category_node, start):
+        # Restripe a chunk of rows, then hand control back to Tk; rows not inserted yet are skipped, as their insert
+        # stripes them
+        self.restripe_jobs.pop(category_node, None)
+        items = self.id_items.get(category_node)
+        if items is None or not self.tree.exists(category_node):
+            return
+        rows = self.shown_rows[category_node]
+        ids = self.transactions.ids
+        end = min(start + CHILD_CHUNK_SIZE, len(rows))
+        for i in range(start, end):
+            item = items.get(ids[rows[i]])
+            if item is not None:
+                self.tree.item(item, tags=('evenrow' if i % 2 == 0 else 'oddrow',))
+        if end < len(rows):
+            self.restripe_jobs[category_node] = (self.root.after(1, self.restripe_chunk, category_node, end), end)
+
+    def cancel_category_jobs(self, category_node):
+        # Stop the chunked insert or restripe of one category
+        job = self.insert_jobs.pop(category_node, None)
+        if job is not None:
+            self.root.after_cancel(job)
+        pending = self.restripe_jobs.pop(category_node, None)
+        if pending is not None:
+            self.root.after_cancel(pending[0])
+
+    def cancel_tree_jobs(self):
+        # Stop any chunked insert or restripe that is still waiting to run
+        for job in self.insert_jobs.values():
+            self.root.after_cancel(job)
+        for job, start in self.restripe_jobs.values():
+            self.root.after_cancel(job)
+        self.insert_jobs = {}
+        self.restripe_jobs = {}
+
+    @instrumentation.timed("search_transactions")
     def search_transactions(self):
         # Search for transactions based on user input
         search_term = self.search_var.get().strip().lower()
         if search_term:
+            # Matching dates, amounts and category names come from the index instead of a scan of every item
             results = {}
-            for category, items in self.transactions.items():
-                matched_items = [item for item in items if
-                                 search_term in item.get("date", "").lower() or
-                                 search_term in str(item.get("amount", "")).lower()]
-                if matched_items:
-                    results[category] = matched_items
-
-            # Check if the search term matches the parent category names
-            matched_categories = [category for category in self.transactions.keys() if search_term in category.lower()]
-            for category in matched_categories:
-                if category not in results:
-                    results[category] = self.transactions[category]
-
-            # Check if the search term matches the child categories' dates
-            child_category_matches = {}
-            for category, items in self.transactions.items():
-                child_matched_items = [item for item in items if search_term in item.get("date", "").lower()]
-                if child_matched_items:
-                    child_category_matches[category] = child_matched_items
-            results.update(child_category_matches)
+            for category, rows in self.search_index.search(search_term).items():
+                if rows is None:
+                    results[category] = self.transactions[category]  # The category name matched, show all of it
+                else:
+                    results[category] = CategoryView(self.transactions, rows)
 
             if not results:
                 self.not_found_label.config(text="No matching transactions found!")
             else:
                 self.not_found_label.config(text="")
-            self.display_transactions(results)
+            self.display_transactions(results, search_term)
         else:
             self.not_found_label.config(text="")
             self.display_transactions(self.transactions)
 
+    def sorted_rows(self, category_node, rows):
+        # Order rows by date, then by every clicked column in turn; Python's sort is stable so earlier clicks break ties
+        if self.sort_cache_version != self.transactions.version:
+            self.sort_cache.clear()  # Orders sorted from older data are never asked for again
+            self.sort_cache_version = self.transactions.version
+        cache_key = (category_node, self.shown_term, tuple(self.sort_spec))
+        cached = self.sort_cache.get(cache_key)
+        if cached is not None:
+            self.sort_cache.move_to_end(cache_key)
+            return cached
+        ordered = sorted(rows, key=self.transactions.days.__getitem__)
+        for column, reverse in self.sort_spec:
+            key_column = self.transactions.days if column == "Date" else self.transactions.amounts
+            ordered.sort(key=key_column.__getitem__, reverse=reverse)
+        self.sort_cache[cache_key] = ordered
+        if len(self.sort_cache) > SORT_CACHE_SIZE:
+            self.sort_cache.popitem(last=False)
+        return ordered
+
+    def sort_categories(self, reverse):
+        # Re-order the category nodes by name with a single call
+        nodes = sorted(self.tree.get_children(''), key=lambda node: self.tree.item(node, 'text').lower(), reverse=reverse)
+        self.tree.set_children('', *nodes)
+        for idx, node in enumerate(nodes):
+            self.tree.item(node, tags=('evenrow' if idx % 2 == 0 else 'oddrow',))
+
+    @instrumentation.timed("sort_by_column")
     def sort_by_column(self, column, reverse):
-        # Define a key function based on the column
-        if column == "Date":
-            key_func = lambda x: (datetime.strptime(x[0], '%Y|%m|%d') if x[0] else datetime.min)
+        if column == "#0":
+            self.category_sort_reverse = reverse
+            self.sort_categories(reverse)
         else:
-            key_func = lambda x: (float(x[0]) if x[0] else float('inf'))
-
-        # Get all the items in the current column
-        categories = self.tree.get_children('')
-
-        for category in categories:
-            children = self.tree.get_children(category)
-            sorted_children = [(self.tree.set(child, column), child) for child in children]
-            # Sort the items based on the key function and reverse flag
-            sorted_children.sort(key=lambda x: key_func(x), reverse=reverse)
-
-            new_index = 0
-            for value, new_child in sorted_children:
-                # Rearrange the items in the Treeview based on the sorted order
-                self.tree.move(new_child, category, new_index)
-                new_index += 1
-
-                # Sort child nodes within each category
-                if column == "Date":
-                    grandchildren = self.tree.get_children(new_child)
-                    sorted_grandchildren = [(self.tree.set(grandchild, column), grandchild) for grandchild in grandchildren]
-                    # Sort the child nodes based on the key function and reverse flag
-                    sorted_grandchildren.sort(key=lambda x: key_func(x), reverse=reverse)
-
-                    new_grand_index = 0
-                    for v, new_grand_child in sorted_grandchildren:
-                        # Rearrange the child nodes in the Treeview based on the sorted order
-                        self.tree.move(new_grand_child, new_child, new_grand_index)
-                        new_grand_index += 1
+            # The clicked column becomes the primary key; earlier clicks stay as tie breakers
+            self.sort_spec = [spec for spec in self.sort_spec if spec[0] != column] + [(column, reverse)]
+            for category_node, rows in self.shown_rows.items():
+                ordered = self.sorted_rows(category_node, rows)
+                self.shown_rows[category_node] = ordered
+                if category_node not in self.id_items:
+                    continue  # Not expanded yet, the new order is used when it is
+                if category_node in self.insert_jobs:
+                    # Rows are still being inserted, start the insert again in the new order
+                    self.reinsert_child_rows(category_node)
+                else:
+                    # Re-order every existing row of the category in one call instead of one move per row
+                    items, ids = self.id_items[category_node], self.transactions.ids
+                    self.tree.set_children(category_node, *[items[ids[row]] for row in ordered])
+                    self.restripe_child_rows(category_node, 0)
 
         # Reverse the sort order for the next time the column is clicked
         self.tree.heading(column, command=lambda: self.sort_by_column(column, not reverse))
@@ -208,4 +641,5 @@ def main():
     root.mainloop()  # Start the Tkinter event loop.
 
 if __name__ == "__main__":
+    instrumentation.start_session()
     main()
@@ -0,0 +1,58 @@
+import queue
+import threading
+
+
+class BackgroundTask:
+    # Runs work(task) on a worker thread and hands messages back through a queue the Tk side polls.
+    # The work must not touch any widget; it reports with task.progress(fraction) and stops early once
+    # task.cancelled() is True. Work that writes a file calls task.begin_commit() first, after which it can't be cancelled.
+    def __init__(self, work):
+        self.work = work
+        self.messages = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+        self.committed = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        try:
+            result = self.work(self)
+        except Exception as e:
+            self.messages.put(("error", e))
+        else:
+            self.messages.put(("done", result))
+
+    def progress(self, fraction):
+        self.messages.put(("progress", fraction))
+
+    def begin_commit(self):
+        # Returns False if the task was cancelled first; otherwise the write goes ahead and cancel() refuses
+        with self.lock:
+            if self.cancel_event.is_set():
+                return False
+            self.committed = True
+        self.messages.put(("committing", None))
+        return True
+
+    def cancel(self):
+        # Returns False once a write has begun, since a half-finished save is worse than either version
+        with self.lock:
+            if self.committed:
+                return False
+            self.cancel_event.set()
+            return True
+
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def poll(self):
+        # Messages waiting right now, without blocking the event loop
+        pending = []
+        while True:
+            try:
+                pending.append(self.messages.get_nowait())
+            except queue.Empty:
+                return pending
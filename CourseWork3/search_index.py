@@ -0,0 +1,223 @@
+from bisect import bisect_left, bisect_right, insort
+import re
+
+# Search terms shaped like the start of a date (2024|03, 2024|03|1) can only match at the start of a date string
+DATE_PREFIX_PATTERN = re.compile(r"^\d{4}\|\d{0,2}(\|\d{0,2})?$")
+AMOUNT_CHARACTERS = frozenset("0123456789.-+einfa")  # Characters that can appear in the text of an amount
+DATE_CHARACTERS = frozenset("0123456789|")  # Characters that can appear in a date
+AMOUNT_GRAM = 3  # Amount texts are indexed by their substrings of this length; shorter terms match most amounts anyway
+RANGE_SEPARATOR = ".."  # Range queries are written as low..high, for example 2024|01|01..2024|03|31 or 100..200
+ID_PREFIX = "#"  # #42 finds the transaction whose id is 42
+
+
+class SearchIndex:
+    # Indexes over a TransactionStore so a search looks at distinct keys instead of every transaction
+    def __init__(self, store):
+        self.store = store
+        self.dirty = True
+        store.subscribe(self.on_change)
+        self.build()
+
+    def close(self):
+        self.store.unsubscribe(self.on_change)
+
+    def build(self):
+        store = self.store
+        self.category_trie = {}  # Trie over every suffix of every lower-case category name
+        self.rows_by_date = {}  # Date string -> set of rows with that date, so a row leaves it in O(1)
+        self.rows_by_amount = {}  # Amount -> set of rows with that amount
+        self.amount_text = {}  # Amount -> its text as shown in the tree, for substring searches
+        for category_id, category in enumerate(store.categories):
+            self.add_category(category_id, category)
+        # Group by the raw day numbers first so each distinct date is formatted only once
+        rows_by_day = {}
+        days, amounts = store.days, store.amounts
+        for row in store.rows():
+            day = days[row]
+            if day:
+                rows = rows_by_day.get(day)
+                if rows is None:
+                    rows = rows_by_day[day] = set()
+                rows.add(row)
+            else:
+                self.rows_by_date.setdefault(store.date(row), set()).add(row)
+        for day, rows in rows_by_day.items():
+            self.rows_by_date[store.format_day(day)] = rows
+        for row in store.rows():
+            amount = amounts[row]
+            rows = self.rows_by_amount.get(amount)
+            if rows is None:
+                rows = self.rows_by_amount[amount] = set()
+            rows.add(row)
+        self.amount_text = {amount: str(amount).lower() for amount in self.rows_by_amount}
+        self.amount_grams = None  # Substring of AMOUNT_GRAM characters -> amounts with it, built on the first search
+        self.sorted_dates = sorted(self.rows_by_date)
+        self.sorted_amounts = sorted(self.rows_by_amount)
+        self.indexed_categories = len(store.categories)
+        self.dirty = False
+
+    def add_category(self, category_id, category):
+        name = category.lower()
+        for start in range(len(name)):
+            node = self.category_trie
+            for char in name[start:]:
+                node = node.setdefault(char, {})
+                node.setdefault(None, set()).add(category_id)  # The None key holds the ids below this node
+
+    def build_amount_grams(self):
+        self.amount_grams = {}
+        for amount, text in self.amount_text.items():
+            self.add_amount_grams(amount, text)
+
+    def add_amount_grams(self, amount, text):
+        grams = self.amount_grams
+        for start in range(len(text) - AMOUNT_GRAM + 1):
+            gram = text[start:start + AMOUNT_GRAM]
+            amounts = grams.get(gram)
+            if amounts is None:
+                grams[gram] = {amount}
+            else:
+                amounts.add(amount)
+
+    def remove_amount_grams(self, amount, text):
+        for start in range(len(text) - AMOUNT_GRAM + 1):
+            amounts = self.amount_grams.get(text[start:start + AMOUNT_GRAM])
+            if amounts is not None:
+                amounts.discard(amount)
+
+    def add_row(self, row):
+        store = self.store
+        while self.indexed_categories < len(store.categories):
+            self.add_category(self.indexed_categories, store.categories[self.indexed_categories])
+            self.indexed_categories += 1
+        date_str = store.date(row)
+        if date_str not in self.rows_by_date:
+            self.rows_by_date[date_str] = set()
+            insort(self.sorted_dates, date_str)
+        self.rows_by_date[date_str].add(row)
+        amount = store.amounts[row]
+        if amount not in self.rows_by_amount:
+            self.rows_by_amount[amount] = set()
+            self.amount_text[amount] = str(amount).lower()
+            insort(self.sorted_amounts, amount)
+            if self.amount_grams is not None:
+                self.add_amount_grams(amount, self.amount_text[amount])
+        self.rows_by_amount[amount].add(row)
+
+    def remove_row(self, row, amount, date_str):
+        rows = self.rows_by_date.get(date_str)
+        if rows is not None and row in rows:
+            rows.discard(row)
+            if not rows:
+                del self.rows_by_date[date_str]
+                self.sorted_dates.pop(bisect_left(self.sorted_dates, date_str))
+        rows = self.rows_by_amount.get(amount)
+        if rows is not None and row in rows:
+            rows.discard(row)
+            if not rows:
+                del self.rows_by_amount[amount]
+                if self.amount_grams is not None:
+                    self.remove_amount_grams(amount, self.amount_text[amount])
+                del self.amount_text[amount]
+                self.sorted_amounts.pop(bisect_left(self.sorted_amounts, amount))
+
+    def on_change(self, event, row, old):
+        # Keep the index in step with the store; a compaction renumbers rows so it triggers a rebuild
+        if self.dirty:
+            return
+        if event == "add":
+            self.add_row(row)
+        elif event == "add_many":
+            for new_row in range(row, len(self.store.amounts)):
+                self.add_row(new_row)
+        elif event == "update":
+            self.remove_row(row, old[0], old[3])
+            self.add_row(row)
+        elif event == "delete":
+            self.remove_row(row, old[0], old[3])
+        else:
+            self.dirty = True
+
+    # Lookups
+    def categories_matching(self, term):
+        node = self.category_trie
+        for char in term:
+            node = node.get(char)
+            if node is None:
+                return set()
+        return node.get(None, set())
+
+    def dates_matching(self, term):
+        if DATE_PREFIX_PATTERN.match(term):
+            start = bisect_left(self.sorted_dates, term)
+            end = bisect_left(self.sorted_dates, term + "\uffff")
+            return self.sorted_dates[start:end]
+        if not DATE_CHARACTERS.issuperset(term):
+            return [date_str for date_str in set(self.store.odd_dates.values()) if term in date_str.lower()]
+        return [date_str for date_str in self.sorted_dates if term in date_str.lower()]
+
+    def dates_between(self, low, high):
+        return self.sorted_dates[bisect_left(self.sorted_dates, low):bisect_right(self.sorted_dates, high)]
+
+    def amounts_matching(self, term):
+        if not AMOUNT_CHARACTERS.issuperset(term):
+            return []
+        if len(term) < AMOUNT_GRAM:
+            return [amount for amount, text in self.amount_text.items() if term in text]
+        # Only amounts having every substring of the term can match, so check those under its rarest substring
+        if self.amount_grams is None:
+            self.build_amount_grams()
+        grams = self.amount_grams
+        candidates = min((grams.get(term[start:start + AMOUNT_GRAM], ())
+                          for start in range(len(term) - AMOUNT_GRAM + 1)), key=len)
+        amount_text = self.amount_text
+        return [amount for amount in candidates if term in amount_text[amount]]
+
+    def amounts_between(self, low, high):
+        return self.sorted_amounts[bisect_left(self.sorted_amounts, low):bisect_right(self.sorted_amounts, high)]
+
+    def search(self, term):
+        # Returns {category: rows} in store order; categories matched by name map to None (all rows)
+        if self.dirty:
+            self.build()
+        term = term.strip().lower()
+        matched_rows = set()
+        matched_categories = set()
+        if RANGE_SEPARATOR in term:
+            low, high = (part.strip() for part in term.split(RANGE_SEPARATOR, 1))
+            try:
+                amounts = self.amounts_between(float(low), float(high))
+            except ValueError:
+                for date_str in self.dates_between(low, high):
+                    matched_rows.update(self.rows_by_date[date_str])
+            else:
+                for amount in amounts:
+                    matched_rows.update(self.rows_by_amount[amount])
+        elif term.startswith(ID_PREFIX):
+            try:
+                matched_rows.add(self.store.row_of(int(term[len(ID_PREFIX):])))
+            except (ValueError, KeyError):
+                pass
+        elif term.startswith("="):
+            try:
+                matched_rows.update(self.rows_by_amount.get(float(term[1:]), ()))
+            except ValueError:
+                pass
+        else:
+            for date_str in self.dates_matching(term):
+                matched_rows.update(self.rows_by_date[date_str])
+            for amount in self.amounts_matching(term):
+                matched_rows.update(self.rows_by_amount[amount])
+            matched_categories = self.categories_matching(term)
+
+        grouped = {}
+        category_ids = self.store.category_ids
+        for row in sorted(matched_rows):
+            grouped.setdefault(category_ids[row], []).append(row)
+        results = {}
+        for category_id, category in enumerate(self.store.categories):
+            if category_id in grouped:
+                results[category] = grouped[category_id]
+            elif category_id in matched_categories:
+                results[category] = None
+        return results
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The CourseWork3 modules import each other by plain name, as they do when run from their own folder; the shared ones
+# come from the finance_core package at the repository root
+COURSEWORK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [COURSEWORK_DIR, os.path.dirname(COURSEWORK_DIR)]
@@ -0,0 +1,47 @@
+import asyncio
+import api_server
+import coursework_b
+from finance_core.transaction_store import TransactionStore
+
+
+def test_failed_save_leaves_changes_pending(monkeypatch):
+    results = [False, True]
+    monkeypatch.setattr(coursework_b, "save_transactions", lambda: results.pop(0))
+
+    async def run():
+        api = api_server.ApiServer(flush_delay=60, flush_operations=1000)
+        api.store.add("Food", 5, "2024|01|01")
+        failed = await api.flush_now({}, b"")
+        retry_scheduled = api.flush_handle is not None
+        saved = await api.flush_now({}, b"")
+        return failed, retry_scheduled, saved, api.flush_handle
+
+    failed, retry_scheduled, saved, handle = asyncio.run(run())
+    assert failed[0] == 500 and failed[1]["pending_changes"] == 1 and failed[1]["failed_flushes"] == 1
+    assert retry_scheduled
+    assert saved[0] == 200 and saved[1]["pending_changes"] == 0 and saved[1]["flushes"] == 1
+    assert handle is None  # The retry is cancelled once a save works
+
+
+def test_amounts_the_menu_refuses_are_refused():
+    api = api_server.ApiServer()
+    for body in (b'{"amount": NaN}', b'{"amount": Infinity}', b'{"amount": "nan"}', b'{"amount": "-inf"}',
+                 b'{"amount": -5}', b'{"amount": 1e999}'):
+        try:
+            api_server.transaction_fields(api.read_json(body), required=False)
+        except api_server.HttpError as e:
+            assert e.status == 400
+        else:
+            raise AssertionError(f"{body!r} was accepted")
+    assert api_server.transaction_fields({"amount": "12.5"}, required=False) == {"amount": 12.5}
+
+
+def test_a_bulk_import_is_one_event_per_category():
+    api = api_server.ApiServer()
+    api.store = TransactionStore()
+    events = []
+    api.store.subscribe(lambda event, row, old: events.append(event))
+    body = b"Food,5,2024|01|01\nRent,500,2024|01|02\nFood,7,2024|01|03\nFood,x,2024|01|04\n"
+    status, report = api.bulk_import({}, body)
+    assert status == 200 and report["accepted"] == 3 and report["rejected"] == 1
+    assert events == ["add_many", "add_many"]
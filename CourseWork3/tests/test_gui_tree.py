@@ -0,0 +1,239 @@
+import os
+import sys
+import threading
+import pytest
+import assignment03
+import coursework_b
+from finance_core import autosave, concurrency
+from background import BackgroundTask
+from finance_core.transaction_store import TransactionStore
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "benchmarks"))
+import headless_tk  # noqa: E402  The Tk stand-ins the GUI benchmarks use, so no display is needed
+
+
+@pytest.fixture
+def gui(tmp_path):
+    restore = headless_tk.install(assignment03)
+    store = TransactionStore()
+    store.add_many("Food", list(range(1200)), ["2024|01|01"] * 1200)
+    window = assignment03.FinanceTrackerGUI(headless_tk.Tk(), str(tmp_path / "none.json"), transactions=store)
+    window.display_transactions(store)
+    yield window
+    restore()
+
+
+# Function to expand a category node and let its chunked insert finish
+def open_category(gui, category):
+    node = gui.category_nodes[category]
+    gui.tree.focus(node)
+    gui.on_category_open(None)
+    return node
+
+
+# Function to check the children of a category match its shown rows, in order and with alternating stripes
+def assert_tree_matches(gui, node):
+    gui.root.run_pending()
+    children = gui.tree.get_children(node)
+    ids = gui.transactions.ids
+    assert [gui.tree.item(child, "text") for child in children] == [f"#{ids[row]}" for row in gui.shown_rows[node]]
+    for i, child in enumerate(children):
+        assert gui.tree.item(child, "tags") == ('evenrow' if i % 2 == 0 else 'oddrow',)
+
+
+def test_add_while_a_restripe_is_pending(gui):
+    node = open_category(gui, "Food")
+    gui.root.run_pending()
+    gui.transactions.delete(gui.transactions.row_at("Food", 3))  # Restripes the rows after it in chunks
+    gui.transactions.add("Food", 5, "2024|01|02")
+    assert_tree_matches(gui, node)
+
+
+def test_delete_while_rows_are_still_being_inserted(gui):
+    node = open_category(gui, "Food")  # Only the first chunk is in the tree so far
+    gui.transactions.delete(gui.transactions.row_at("Food", 100))
+    gui.transactions.add("Food", 7, "2024|01|03")
+    assert_tree_matches(gui, node)
+    assert len(gui.tree.get_children(node)) == 1200
+
+
+def test_sort_while_a_restripe_is_pending(gui):
+    node = open_category(gui, "Food")
+    gui.root.run_pending()
+    gui.transactions.delete(gui.transactions.row_at("Food", 10))
+    gui.sort_by_column("Amount", True)
+    gui.transactions.add("Food", 9999, "2024|01|04")
+    assert_tree_matches(gui, node)
+
+
+def test_save_applies_merged_rows_on_the_tk_thread(tmp_path):
+    restore = headless_tk.install(assignment03)
+    filename = str(tmp_path / "shared.json")
+    store = TransactionStore()
+    backend = concurrency.open_shared_backend("journal", filename)
+    backend.load(store)
+    store.add("Food", 1, "2024|01|01")
+    backend.save(store)
+    other = TransactionStore()
+    other_backend = concurrency.open_shared_backend("journal", filename)
+    other_backend.load(other)
+    other.add("Food", 2, "2024|01|02")
+    other_backend.save(other)
+    try:
+        gui = assignment03.FinanceTrackerGUI(headless_tk.Tk(), filename, transactions=store, backend=backend)
+        gui.display_transactions(store)
+        node = open_category(gui, "Food")
+        assert gui.save_transactions(BackgroundTask(None))  # What the worker thread runs
+        assert len(store) == 1  # Merged on the worker, but the store is only changed back on the Tk thread
+        gui.on_saved(True)
+        assert sorted(store.ids[row] for row in store.rows()) == [1, 2]
+        assert_tree_matches(gui, node)
+    finally:
+        restore()
+
+
+
+def test_background_saves_go_on_while_the_window_is_open(tmp_path):
+    restore = headless_tk.install(assignment03)
+    filename = str(tmp_path / "shared.json")
+    store = TransactionStore()
+    backend = concurrency.open_shared_backend("journal", filename)
+    backend.load(store)
+    store.add("Food", 1, "2024|01|01")
+    other = TransactionStore()
+    other_backend = concurrency.open_shared_backend("journal", filename)
+    other_backend.load(other)
+    other.add("Food", 2, "2024|01|02")
+    other_backend.save(other)
+    saver = autosave.AutoSaver(store, backend, delay=0)
+    saver.start(lambda: backend.save(store, defer_merge=True))  # As the menu saves while its window is open
+    try:
+        gui = assignment03.FinanceTrackerGUI(headless_tk.Tk(), filename, transactions=store, backend=backend,
+                                             store_lock=saver.lock)
+        gui.display_transactions(store)
+        node = open_category(gui, "Food")
+        worker = threading.Thread(target=saver.flush)  # The worker thread's save, without its timer
+        worker.start()
+        worker.join(5)
+        assert not worker.is_alive() and saver.saves == 1
+        assert len(store) == 1  # The merge waits for the Tk thread
+        gui.root.after_cancel(gui.merge_job)  # Poll once by hand; run_pending would keep running it
+        gui.apply_saved_merge()
+        gui.root.after_cancel(gui.merge_job)
+        assert sorted(store.ids[row] for row in store.rows()) == [1, 2]
+        assert_tree_matches(gui, node)
+    finally:
+        restore()
+
+
+def test_the_menu_does_not_hold_the_store_lock_while_the_window_is_open(monkeypatch):
+    monkeypatch.setattr(coursework_b, "load_transactions", lambda: None)
+    monkeypatch.setattr(coursework_b, "save_transactions", lambda: True)
+    monkeypatch.setattr(coursework_b, "autosaver", autosave.AutoSaver(TransactionStore(), delay=0))
+    choices = iter(["7", "8"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(choices))
+    acquired = []
+
+    def take_lock():
+        if coursework_b.autosaver.lock.acquire(timeout=5):
+            acquired.append(True)
+            coursework_b.autosaver.lock.release()
+
+    def view_for_GUI():
+        # Stands in for the Tk session; an autosave thread must be able to take the lock meanwhile
+        worker = threading.Thread(target=take_lock)
+        worker.start()
+        worker.join()
+
+    monkeypatch.setattr(coursework_b, "view_for_GUI", view_for_GUI)
+    coursework_b.main_menu()
+    assert acquired == [True]
+
+
+def test_rows_are_only_inserted_when_a_category_is_expanded(gui):
+    gui.transactions.add_many("Rent", [500] * 3, ["2024|02|01"] * 3)
+    gui.display_transactions(gui.transactions)
+    food, rent = gui.category_nodes["Food"], gui.category_nodes["Rent"]
+    assert gui.tree.size() == 4  # Two category nodes, each with only a placeholder child for its expander
+    open_category(gui, "Food")
+    assert len(gui.tree.get_children(food)) == assignment03.CHILD_CHUNK_SIZE  # The first chunk paints at once
+    assert len(gui.tree.get_children(rent)) == 1
+    assert_tree_matches(gui, food)
+    assert gui.tree.size() == 2 + 1200 + 1
+
+
+def test_sorting_uses_the_model_and_earlier_clicks_break_ties(gui, monkeypatch):
+    store = TransactionStore()
+    for amount, date_str in ((3, "2024|01|05"), (1, "2024|01|09"), (2, "2024|01|01"), (1, "2024|01|02"),
+                             (3, "2024|01|01")):
+        store.add("Food", amount, date_str)
+    gui.set_transactions(store)
+    gui.display_transactions(store)
+    node = open_category(gui, "Food")
+    monkeypatch.setattr(gui.tree, "set", None)  # Sorting must not read cells back out of the tree
+
+    def values():
+        return [gui.tree.item(child, "values") for child in gui.tree.get_children(node)]
+
+    gui.sort_by_column("Amount", False)
+    assert values() == [("2024|01|02", 1.0), ("2024|01|09", 1.0), ("2024|01|01", 2.0), ("2024|01|01", 3.0),
+                        ("2024|01|05", 3.0)]  # Equal amounts stay in date order
+    gui.sort_by_column("Date", True)
+    assert values() == [("2024|01|09", 1.0), ("2024|01|05", 3.0), ("2024|01|02", 1.0), ("2024|01|01", 2.0),
+                        ("2024|01|01", 3.0)]  # Equal dates stay in the amount order of the earlier click
+    assert_tree_matches(gui, node)
+
+
+def test_repeat_clicks_reuse_the_sorted_order(gui):
+    open_category(gui, "Food")
+    gui.sort_by_column("Amount", True)
+    descending = gui.shown_rows[gui.category_nodes["Food"]]
+    gui.sort_by_column("Amount", False)
+    cached = len(gui.sort_cache)
+    gui.sort_by_column("Amount", True)
+    assert gui.shown_rows[gui.category_nodes["Food"]] is descending and len(gui.sort_cache) == cached
+
+
+
+def test_the_sort_cache_keeps_a_few_orders_of_the_current_data(gui, monkeypatch):
+    monkeypatch.setattr(assignment03, "SORT_CACHE_SIZE", 2)
+    food = gui.category_nodes["Food"]
+    rows = list(gui.transactions.rows())
+    gui.sort_spec = [("Amount", True)]
+    oldest = gui.sorted_rows(food, rows)
+    gui.sort_spec = [("Amount", False)]
+    gui.sorted_rows(food, rows)
+    gui.sort_spec = [("Amount", True)]
+    assert gui.sorted_rows(food, rows) is oldest  # Now the most recently used
+    gui.sort_spec = [("Date", False)]
+    gui.sorted_rows(food, rows)
+    assert list(gui.sort_cache) == [(food, "", (("Amount", True),)), (food, "", (("Date", False),))]
+
+    gui.transactions.add("Food", 5, "2024|03|01")
+    gui.sorted_rows(food, rows)
+    assert list(gui.sort_cache) == [(food, "", (("Date", False),))]
+
+def test_searching_reuses_the_items_already_in_the_tree(gui, monkeypatch):
+    gui.transactions.add_many("Rent", [500] * 3, ["2024|02|01"] * 3)
+    gui.display_transactions(gui.transactions)
+    food = open_category(gui, "Food")
+    gui.root.run_pending()
+    before = gui.tree.get_children(food)
+    inserted = []
+    insert = gui.tree.insert
+    monkeypatch.setattr(gui.tree, "insert", lambda *args, **kwargs: inserted.append(args) or insert(*args, **kwargs))
+
+    gui.search_var.set("115")  # Matches amounts containing the text, e.g. 115, 1115 and 1150 to 1159
+    gui.search_transactions()
+    assert gui.tree.get_children("") == (food,)  # Rent is detached, not deleted
+    assert [gui.tree.item(child, "values")[1] for child in gui.tree.get_children(food)] == [
+        float(amount) for amount in range(1200) if "115" in str(amount)]
+    assert set(gui.tree.get_children(food)) <= set(before)
+    assert_tree_matches(gui, food)
+
+    gui.search_var.set("")
+    gui.search_transactions()
+    assert gui.tree.get_children("") == (food, gui.category_nodes["Rent"])
+    assert gui.tree.get_children(food) == before
+    assert inserted == []  # Neither the search nor clearing it inserted a single item
+    assert_tree_matches(gui, food)
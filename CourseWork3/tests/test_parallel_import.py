@@ -0,0 +1,42 @@
+import coursework_b
+from finance_core.transaction_store import TransactionStore
+
+
+FILE_ROWS = ((1, 3000), (2, 5), (3, 800), (4, 1))  # (file number, good lines); each file also has one broken line
+
+
+# Function to write bulk files of very different sizes, so the workers finish them out of order
+def write_files(tmp_path):
+    for number, rows in FILE_ROWS:
+        lines = [f"{('Food', 'Rent')[row % 2]},{number}.{row},2024|01|{row % 28 + 1:02d}\n" for row in range(rows)]
+        lines.append(f"broken line of file {number}\n")
+        (tmp_path / f"bank{number}.csv").write_text("".join(lines))
+    return [str(tmp_path / "bank*.csv")]
+
+
+# Function to import the files into a new store with the given number of worker processes
+def import_with(monkeypatch, patterns, workers):
+    store = TransactionStore()
+    monkeypatch.setattr(coursework_b, "transactions", store)
+    total = coursework_b.import_files_parallel(patterns, workers)
+    return store, total
+
+
+def test_files_are_merged_in_file_order_whatever_the_workers(tmp_path, monkeypatch, capsys):
+    patterns = write_files(tmp_path)
+    serial, serial_total = import_with(monkeypatch, patterns, 1)
+    parallel, parallel_total = import_with(monkeypatch, patterns, 4)
+    assert [serial.record(row) for row in serial.rows()] == [parallel.record(row) for row in parallel.rows()]
+    assert list(serial.ids) == list(parallel.ids)
+    # Each file adds its Food column, then its Rent column, and file 1 comes first although it finishes last
+    assert serial.record(0)[:2] == [1.0, "Food"] and serial.record(len(serial) - 1)[:2] == [4.0, "Food"]
+    assert parallel_total["files"] == 4 and parallel_total["accepted"] == 3806 and parallel_total["rejected"] == 4
+    where = [f"{rows + 1} of {tmp_path / f'bank{number}.csv'}" for number, rows in FILE_ROWS]
+    assert [error[0] for error in parallel_total["errors"]] == where
+
+
+def test_missing_files_are_reported_and_skipped(tmp_path, monkeypatch, capsys):
+    (tmp_path / "good.csv").write_text("Food,5,2024|01|01\n")
+    store, total = import_with(monkeypatch, [str(tmp_path / "good.csv"), str(tmp_path / "missing.csv")], 2)
+    assert len(store) == 1 and total["files"] == 1
+    assert "missing.csv not found!" in capsys.readouterr().out
@@ -0,0 +1,43 @@
+from search_index import SearchIndex
+from finance_core.transaction_store import TransactionStore
+
+
+# Function to find the amounts containing a term the slow way, by looking at every live row
+def amounts_containing(store, term):
+    return {store.amounts[row] for row in store.rows() if term in str(store.amounts[row])}
+
+
+def test_amount_substrings_follow_changes():
+    store = TransactionStore()
+    index = SearchIndex(store)
+    for amount in (12.5, 112.5, 1250.0, 7.25, 3.0):
+        store.add("Food", amount, "2024|01|01")
+    assert set(index.amounts_matching("12.5")) == {12.5, 112.5}
+
+    store.update(store.row_at("Food", 0), amount=912.55)  # The index for the grams now exists and must be kept up to date
+    store.delete(store.row_at("Food", 1))
+    store.add_many("Rent", [4125.0, 99.125], ["2024|01|02", "2024|01|03"])
+    for term in ("12.5", "125", "2.5", "25", "5", "99.1", "0.0"):
+        assert set(index.amounts_matching(term)) == amounts_containing(store, term), term
+
+
+def test_search_by_amount_text():
+    store = TransactionStore()
+    index = SearchIndex(store)
+    store.add("Food", 45.5, "2024|01|01")
+    store.add("Rent", 145.75, "2024|01|01")
+    store.add("Rent", 300, "2024|01|01")
+    assert index.search("45.") == {"Food": [0], "Rent": [1]}
+    assert index.search("abc") == {}
+
+
+def test_rows_leave_shared_buckets_on_update_and_delete():
+    store = TransactionStore()
+    store.add_many("Food", [10] * 1000, ["2024|01|01"] * 1000)
+    index = SearchIndex(store)
+    store.delete(store.row_of(500))
+    store.update(store.row_of(1), amount=20, date_str="2024|01|02")
+    assert index.rows_by_date["2024|01|01"] == index.rows_by_amount[10.0] == set(range(1, 1000)) - {499}
+    assert index.search("=20") == {"Food": [0]} and index.search("2024|01|02") == {"Food": [0]}
+    store.delete(store.row_of(1))
+    assert "2024|01|02" not in index.rows_by_date and index.sorted_amounts == [10.0]
@@ -0,0 +1,318 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import quote, urlsplit
+
+import ledger_generator
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+SERVER_SCRIPT = os.path.join(REPO_DIR, "CourseWork3", "api_server.py")
+# Share of each operation in the requests sent, as operation:weight pairs
+DEFAULT_MIX = "list:40,filter:15,get:10,summary:10,add:15,update:7,delete:3"
+OPERATIONS = ("list", "filter", "get", "summary", "add", "update", "delete")
+STARTUP_TIMEOUT = 60  # Seconds to wait for a server started here to accept connections
+
+
+class Connection:
+    # One keep-alive HTTP/1.1 connection to the API; requests on it are sent one after another
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, payload=None, body=None):
+        # Returns (status, decoded JSON body); reconnects if the server closed the connection
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        if payload is not None:
+            body = json.dumps(payload).encode("utf-8")
+        body = body or b""
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+        await self.writer.drain()
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(":")
+            if value:
+                headers[name.strip().lower()] = value.strip()
+        data = await self.reader.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return int(status_line.split(" ")[1]), json.loads(data) if data else None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = self.reader = None
+
+
+class LoadTest:
+    # Keeps a number of connections busy with a weighted mix of operations for a fixed time, recording the latency
+    # and status of every request, and counts the adds and deletes that worked so the final count can be checked
+    def __init__(self, host, port, mix, seed):
+        self.host = host
+        self.port = port
+        self.operations = list(mix)
+        self.weights = [mix[operation] for operation in self.operations]
+        self.rng = random.Random(seed)
+        self.ids = []  # Ids known to exist, for get, update and delete
+        self.categories = list(ledger_generator.CATEGORY_NAMES)
+        self.latencies = {operation: [] for operation in OPERATIONS}
+        self.statuses = {operation: {} for operation in OPERATIONS}
+        self.failures = []  # Connection errors and 5xx answers
+        self.added = 0
+        self.deleted = 0
+
+    def random_date(self):
+        day = ledger_generator.FIRST_DAY + self.rng.randrange(ledger_generator.DAY_SPAN)
+        return ledger_generator.date_formatter("|")(day)
+
+    def next_request(self, operation):
+        # (method, path, payload) of one request; ids for delete are taken out of the pool before it is sent
+        rng = self.rng
+        if operation == "list":
+            return "GET", f"/transactions?offset={rng.randrange(max(len(self.ids), 1))}&limit=50", None
+        if operation == "filter":
+            start = self.random_date()
+            return "GET", (f"/transactions?category={quote(rng.choice(self.categories))}&from={quote(start)}"
+                           f"&limit=50"), None
+        if operation == "summary":
+            return "GET", "/summary", None
+        if operation == "add" or not self.ids:
+            return "POST", "/transactions", {"category": rng.choice(self.categories),
+                                             "amount": round(rng.uniform(1, 500), 2), "date": self.random_date()}
+        if operation == "get":
+            return "GET", f"/transactions/{rng.choice(self.ids)}", None
+        if operation == "update":
+            return "PATCH", f"/transactions/{rng.choice(self.ids)}", {"amount": round(rng.uniform(1, 500), 2)}
+        index = rng.randrange(len(self.ids))
+        self.ids[index], self.ids[-1] = self.ids[-1], self.ids[index]
+        return "DELETE", f"/transactions/{self.ids.pop()}", None
+
+    async def worker(self, deadline):
+        connection = Connection(self.host, self.port)
+        try:
+            while time.perf_counter() < deadline:
+                operation = self.rng.choices(self.operations, self.weights)[0]
+                method, path, payload = self.next_request(operation)
+                if method == "POST":
+                    operation = "add"
+                start = time.perf_counter()
+                try:
+                    status, data = await connection.request(method, path, payload)
+                except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                    self.failures.append(f"{method} {path}: {e!r}")
+                    connection.close()
+                    continue
+                self.latencies[operation].append(time.perf_counter() - start)
+                self.statuses[operation][status] = self.statuses[operation].get(status, 0) + 1
+                if status >= 500:
+                    self.failures.append(f"{method} {path}: {status} {data}")
+                elif operation == "add" and status == 201:
+                    self.ids.append(data["id"])
+                    self.added += 1
+                elif operation == "delete" and status == 200:
+                    self.deleted += 1
+        finally:
+            connection.close()
+
+    async def run(self, connections, duration):
+        start = time.perf_counter()
+        await asyncio.gather(*(self.worker(start + duration) for _ in range(connections)))
+        return time.perf_counter() - start
+
+
+# Function to pick the p-th percentile of sorted latencies by nearest rank, in milliseconds
+def percentile_ms(values, p):
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))] * 1000
+
+
+# Function to parse "list:40,add:15,..." into {operation: weight}
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        operation, _, weight = part.partition(":")
+        operation = operation.strip()
+        if operation not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {operation!r}, expected one of: {', '.join(OPERATIONS)}")
+        mix[operation] = float(weight or 1)
+    return mix
+
+
+# Function to find a free port for a server started here
+def free_port(host):
+    with socket.socket() as probe:
+        probe.bind((host, 0))
+        return probe.getsockname()[1]
+
+
+# Function to start api_server.py in workdir and wait until it accepts connections
+def start_server(workdir, host, port, storage_mode, flush_delay):
+    env = dict(os.environ, FINANCE_STORAGE_MODE=storage_mode)
+    server = subprocess.Popen([sys.executable, SERVER_SCRIPT, "--host", host, "--port", str(port),
+                               "--flush-delay", str(flush_delay)], cwd=workdir, env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"the server exited early:\n{server.stdout.read()}")
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f"the server did not start within {STARTUP_TIMEOUT}s")
+
+
+# Function to stop a server started here; SIGTERM makes it save what is still waiting first
+def stop_server(server):
+    server.send_signal(signal.SIGTERM)
+    try:
+        output, _ = server.communicate(timeout=STARTUP_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        output, _ = server.communicate()
+    return output
+
+
+async def load_test(args, host, port):
+    connection = Connection(host, port)
+    try:
+        if args.rows:
+            lines = []
+            format_day = ledger_generator.date_formatter("|")
+            for amount, category, transaction_type, day in ledger_generator.generate_transactions(args.rows, args.seed):
+                lines.append(f"{category},{amount!r},{format_day(day)}\n")
+            start = time.perf_counter()
+            status, report = await connection.request("POST", "/import", body="".join(lines).encode("utf-8"))
+            if status != 200:
+                raise RuntimeError(f"the import failed: {status} {report}")
+            print(f"Imported {report['accepted']} transaction(s) in {time.perf_counter() - start:.2f}s.",
+                  file=sys.stderr)
+        status, summary = await connection.request("GET", "/summary")
+        status, page = await connection.request("GET", f"/transactions?limit={summary['count']}")
+        test = LoadTest(host, port, args.mix, args.seed)
+        test.ids = [transaction["id"] for transaction in page["transactions"]]
+        initial_count = summary["count"]
+
+        seconds = await test.run(args.connections, args.duration)
+
+        status, flushed = await connection.request("POST", "/flush")
+        status, stats = await connection.request("GET", "/stats")
+        status, summary = await connection.request("GET", "/summary")
+    finally:
+        connection.close()
+
+    total = sum(len(latencies) for latencies in test.latencies.values())
+    operations = {}
+    for operation, latencies in test.latencies.items():
+        if not latencies:
+            continue
+        latencies.sort()
+        operations[operation] = {"requests": len(latencies), "statuses": test.statuses[operation],
+                                 "mean_ms": sum(latencies) * 1000 / len(latencies),
+                                 "p50_ms": percentile_ms(latencies, 50), "p95_ms": percentile_ms(latencies, 95),
+                                 "p99_ms": percentile_ms(latencies, 99), "max_ms": latencies[-1] * 1000}
+    expected_count = initial_count + test.added - test.deleted
+    return {"connections": args.connections, "duration_seconds": seconds, "requests": total,
+            "requests_per_sec": total / seconds, "failures": len(test.failures), "failure_samples": test.failures[:10],
+            "operations": operations, "expected_count": expected_count, "count": summary["count"],
+            "pending_after_flush": flushed["pending_changes"], "server": stats}
+
+
+async def count_transactions(host, port):
+    connection = Connection(host, port)
+    try:
+        status, summary = await connection.request("GET", "/summary")
+        return summary["count"]
+    finally:
+        connection.close()
+
+
+# Function to print the results as a table
+def print_results(results):
+    print(f"{results['requests']} request(s) over {results['connections']} connection(s) in "
+          f"{results['duration_seconds']:.1f}s: {results['requests_per_sec']:.0f} requests/sec, "
+          f"{results['failures']} failure(s)")
+    print(f"{'operation':<10}{'requests':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+          f"  statuses")
+    for operation, stats in results["operations"].items():
+        statuses = ", ".join(f"{status}: {n}" for status, n in sorted(stats["statuses"].items()))
+        print(f"{operation:<10}{stats['requests']:>10}{stats['mean_ms']:>10.2f}{stats['p50_ms']:>10.2f}"
+              f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['max_ms']:>10.2f}  {statuses}")
+    server = results["server"]
+    print(f"Server: {server['flushes']} save(s), last took {server['last_flush_ms']:.1f} ms; "
+          f"{results['count']} transaction(s), expected {results['expected_count']}")
+    if "reloaded_count" in results:
+        print(f"After a restart the server loaded {results['reloaded_count']} transaction(s).")
+    for failure in results["failure_samples"]:
+        print(f"   {failure}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the HTTP/JSON API of CourseWork3/api_server.py with many "
+                                                 "keep-alive connections and a mix of reads and writes, then check "
+                                                 "that every add and delete was kept, in memory and on disk.")
+    parser.add_argument("--url", help="test a server that is already running, e.g. http://127.0.0.1:8765; by default "
+                                      "one is started on a fresh ledger in a temporary folder")
+    parser.add_argument("--connections", type=int, default=50, help="concurrent connections (default %(default)s)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to send requests (default %(default)s)")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="operation:weight pairs (default %(default)s)")
+    parser.add_argument("--rows", type=int, default=10000,
+                        help="transactions bulk imported before the test; 0 imports none (default %(default)s)")
+    parser.add_argument("--storage", default="journal", help="FINANCE_STORAGE_MODE of a server started here "
+                                                             "(default %(default)s)")
+    parser.add_argument("--flush-delay", type=float, default=1.0, help="--flush-delay of a server started here")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    server = workdir = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        host = "127.0.0.1"
+        port = free_port(host)
+        workdir = tempfile.mkdtemp(prefix="finance-api-")
+        server = start_server(workdir, host, port, args.storage, args.flush_delay)
+    try:
+        results = asyncio.run(load_test(args, host, port))
+        if server is not None:
+            # Start a fresh server on the same folder to check the saved file holds what the first one had
+            stop_server(server)
+            server = start_server(workdir, host, port, args.storage, args.flush_delay)
+            results["reloaded_count"] = asyncio.run(count_transactions(host, port))
+    finally:
+        if server is not None:
+            stop_server(server)
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    consistent = results["count"] == results["expected_count"] and results.get("reloaded_count",
+                                                                                results["count"]) == results["count"]
+    return 0 if consistent and not results["failures"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+import itertools
+import types
+
+# Stand-ins for the parts of tkinter the GUI uses, so FinanceTrackerGUI can be built and timed without a display.
+# The Treeview keeps a real item tree so inserts, deletes and re-orders cost roughly what the data structure work costs;
+# everything else accepts any call and does nothing.
+
+
+class Widget:
+    def __init__(self, *args, **kwargs):
+        self.options = kwargs
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: None  # pack, bind, configure, destroy, ...
+
+    def config(self, *args, **kwargs):
+        self.options.update(kwargs)
+
+    configure = config
+
+    def cget(self, option):
+        return self.options.get(option, "")
+
+
+class Tk(Widget):
+    # Root window whose after() jobs are queued until run_pending() is called
+    def __init__(self):
+        super().__init__()
+        self.jobs = {}
+        self.job_ids = itertools.count(1)
+
+    def after(self, delay, func=None, *args):
+        job = f"after#{next(self.job_ids)}"
+        self.jobs[job] = (func, args)
+        return job
+
+    def after_idle(self, func, *args):
+        return self.after(0, func, *args)
+
+    def after_cancel(self, job):
+        self.jobs.pop(job, None)
+
+    def run_pending(self):
+        # Run queued jobs, including any they queue in turn, until none are left; returns how many ran
+        ran = 0
+        while self.jobs:
+            job = next(iter(self.jobs))
+            func, args = self.jobs.pop(job)
+            func(*args)
+            ran += 1
+        return ran
+
+
+class StringVar:
+    def __init__(self, master=None, value=""):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class Treeview(Widget):
+    def __init__(self, master=None, columns=(), **kwargs):
+        super().__init__(master, **kwargs)
+        self.columns = tuple(columns)
+        self.nodes = {"": {"parent": None, "children": [], "text": "", "values": (), "tags": ()}}
+        self.item_ids = itertools.count(1)
+        self.focused = ""
+
+    def insert(self, parent, index, iid=None, text="", values=(), tags=(), **kwargs):
+        iid = iid or f"I{next(self.item_ids):06X}"
+        self.nodes[iid] = {"parent": parent, "children": [], "text": text, "values": tuple(values), "tags": tuple(tags)}
+        children = self.nodes[parent]["children"]
+        if index == "end":
+            children.append(iid)
+        else:
+            children.insert(index, iid)
+        return iid
+
+    def delete(self, *items):
+        for iid in items:
+            node = self.nodes.pop(iid, None)
+            if node is None:
+                continue
+            stack = list(node["children"])
+            while stack:
+                stack.extend(self.nodes.pop(stack.pop())["children"])
+            siblings = self.nodes[node["parent"]]["children"]
+            if iid in siblings:
+                siblings.remove(iid)
+
+    def get_children(self, item=""):
+        return tuple(self.nodes[item]["children"])
+
+    def set_children(self, item, *children):
+        for iid in children:
+            old_parent = self.nodes[iid]["parent"]
+            if old_parent != item:
+                self.nodes[old_parent]["children"].remove(iid)
+                self.nodes[iid]["parent"] = item
+        self.nodes[item]["children"] = list(children)
+
+    def move(self, iid, parent, index):
+        node = self.nodes[iid]
+        self.nodes[node["parent"]]["children"].remove(iid)
+        node["parent"] = parent
+        children = self.nodes[parent]["children"]
+        if index == "end":
+            children.append(iid)
+        else:
+            children.insert(index, iid)
+
+    reattach = move
+
+    def exists(self, iid):
+        return iid in self.nodes
+
+    def parent(self, iid):
+        return self.nodes[iid]["parent"]
+
+    def index(self, iid):
+        return self.nodes[self.nodes[iid]["parent"]]["children"].index(iid)
+
+    def focus(self, iid=None):
+        if iid is None:
+            return self.focused
+        self.focused = iid
+
+    def item(self, iid, option=None, **kwargs):
+        node = self.nodes[iid]
+        if kwargs:
+            for key, value in kwargs.items():
+                node[key] = tuple(value) if key in ("values", "tags") else value
+            return None
+        if option is not None:
+            return node[option]
+        return dict(node)
+
+    def set(self, iid, column=None, value=None):
+        values = list(self.nodes[iid]["values"]) or [""] * len(self.columns)
+        if value is None:
+            return values[self.columns.index(column)]
+        values[self.columns.index(column)] = value
+        self.nodes[iid]["values"] = tuple(values)
+
+    def size(self):
+        return len(self.nodes) - 1
+
+
+# Module objects to swap in for the GUI module's tk and ttk globals
+tk = types.SimpleNamespace(Tk=Tk, Label=Widget, Frame=Widget, Canvas=Widget, Entry=Widget, Button=Widget,
+                           Scrollbar=Widget, StringVar=StringVar, BOTH="both", X="x", Y="y", LEFT="left",
+                           RIGHT="right", W="w", NW="nw", CENTER="center", VERTICAL="vertical", END="end",
+                           NORMAL="normal", DISABLED="disabled")
+ttk = types.SimpleNamespace(Treeview=Treeview, Scrollbar=Widget, Button=Widget, Style=Widget,
+                            Progressbar=Widget, Label=Widget, Frame=Widget)
+
+
+# Function to point a GUI module at the stand-ins; returns a function that puts the real tkinter back
+def install(gui_module):
+    saved = gui_module.tk, gui_module.ttk
+    gui_module.tk, gui_module.ttk = tk, ttk
+
+    def restore():
+        gui_module.tk, gui_module.ttk = saved
+    return restore
@@ -0,0 +1,133 @@
+from datetime import date
+import argparse
+import json
+import os
+import random
+import tempfile
+
+# Names for the first categories; any further ones are numbered. Weights make a few categories much larger than the rest.
+CATEGORY_NAMES = ("Food", "Rent", "Transport", "Utilities", "Salary", "Health", "Entertainment", "Shopping",
+                  "Education", "Travel", "Insurance", "Freelance")
+INCOME_CATEGORIES = frozenset(("Salary", "Freelance"))
+FIRST_DAY = date(2015, 1, 1).toordinal()
+DAY_SPAN = 3652  # Ten years of dates
+SCHEMAS = ("list", "dict", "bulk")
+
+
+# Function to name and weight the categories of a ledger
+def category_table(categories):
+    names = [CATEGORY_NAMES[i] if i < len(CATEGORY_NAMES) else f"Category {i + 1}" for i in range(categories)]
+    weights = [1.0 / (i + 1) for i in range(categories)]
+    return names, weights
+
+
+# Function to yield count transactions as (amount, category, type, day number); the same seed gives the same ledger
+def generate_transactions(count, seed=42, categories=len(CATEGORY_NAMES)):
+    rng = random.Random(seed)
+    names, weights = category_table(categories)
+    types = ["Income" if name in INCOME_CATEGORIES else "Expense" for name in names]
+    cumulative = []
+    total = 0.0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    indexes = range(categories)
+    for _ in range(count):
+        i = rng.choices(indexes, cum_weights=cumulative)[0]
+        amount = round(rng.lognormvariate(3.5, 1.0), 2)
+        yield amount, names[i], types[i], FIRST_DAY + rng.randrange(DAY_SPAN)
+
+
+# Function to format day numbers, remembering each distinct day so large ledgers format every date only once
+def date_formatter(separator):
+    cache = {}
+
+    def format_day(day):
+        text = cache.get(day)
+        if text is None:
+            d = date.fromordinal(day)
+            text = cache[day] = f"{d.year:04d}{separator}{d.month:02d}{separator}{d.day:02d}"
+        return text
+    return format_day
+
+
+# Function to write the CourseWork1 schema, [[amount, category, type, "YYYY-MM-DD"], ...], one record at a time
+def write_list_schema(file, transactions):
+    format_day = date_formatter("-")
+    quoted = {}
+    file.write("[")
+    first = True
+    for amount, category, transaction_type, day in transactions:
+        name = quoted.get(category)
+        if name is None:
+            name = quoted[category] = json.dumps(category)
+        file.write(f'{"" if first else ", "}[{amount!r}, {name}, "{transaction_type}", "{format_day(day)}"]')
+        first = False
+    file.write("]")
+
+
+# Function to write the CourseWork2/3 schema, {category: [{"amount": ..., "date": "YYYY|MM|DD"}, ...]}
+def write_dict_schema(file, transactions):
+    # Rows are spooled to one temporary file per category, so memory stays flat however large the ledger is
+    format_day = date_formatter("|")
+    with tempfile.TemporaryDirectory() as spool_dir:
+        spools = {}
+        try:
+            for amount, category, transaction_type, day in transactions:
+                spool = spools.get(category)
+                if spool is None:
+                    spool = spools[category] = open(os.path.join(spool_dir, str(len(spools))), "w+")
+                    spool.write(f'{{"amount": {amount!r}, "date": "{format_day(day)}"}}')
+                else:
+                    spool.write(f', {{"amount": {amount!r}, "date": "{format_day(day)}"}}')
+            file.write("{")
+            for i, (category, spool) in enumerate(spools.items()):
+                file.write(f'{", " if i else ""}{json.dumps(category)}: [')
+                spool.seek(0)
+                while True:
+                    chunk = spool.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    file.write(chunk)
+                file.write("]")
+            file.write("}")
+        finally:
+            for spool in spools.values():
+                spool.close()
+
+
+# Function to write the text format read by the bulk import, one "category,amount,YYYY|MM|DD" line per transaction
+def write_bulk_file(file, transactions):
+    format_day = date_formatter("|")
+    for amount, category, transaction_type, day in transactions:
+        file.write(f"{category},{amount!r},{format_day(day)}\n")
+
+
+WRITERS = {"list": write_list_schema, "dict": write_dict_schema, "bulk": write_bulk_file}
+
+
+# Function to write a synthetic ledger of count transactions to filename in one of SCHEMAS
+def write_ledger(filename, count, schema="dict", seed=42, categories=len(CATEGORY_NAMES)):
+    writer = WRITERS.get(schema)
+    if writer is None:
+        raise ValueError(f"Unknown schema {schema!r}, expected one of: {', '.join(SCHEMAS)}")
+    with open(filename, "w", buffering=1024 * 1024) as file:
+        writer(file, generate_transactions(count, seed, categories))
+    return filename
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic ledger for benchmarking.")
+    parser.add_argument("output", help="file to write")
+    parser.add_argument("--count", type=int, default=10000, help="number of transactions (default 10000)")
+    parser.add_argument("--schema", choices=SCHEMAS, default="dict",
+                        help="list = CourseWork1 JSON, dict = CourseWork2/3 JSON, bulk = bulk import text file")
+    parser.add_argument("--seed", type=int, default=42, help="random seed; the same seed gives the same ledger")
+    parser.add_argument("--categories", type=int, default=len(CATEGORY_NAMES), help="number of categories")
+    args = parser.parse_args(argv)
+    write_ledger(args.output, args.count, args.schema, args.seed, args.categories)
+    print(f"Wrote {args.count} transaction(s) to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
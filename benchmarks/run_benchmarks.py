@@ -0,0 +1,328 @@
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+# CourseWork3 holds the GUI and the category-dict CLI; the modules every coursework shares are in finance_core
+sys.path[:0] = [BENCHMARK_DIR, REPO_DIR, os.path.join(REPO_DIR, "CourseWork3")]
+
+import headless_tk
+import ledger_generator
+import assignment03
+import coursework_b
+from finance_core import analytics, storage
+from finance_core.rollups import GRANULARITIES, Rollups
+from search_index import SearchIndex
+from finance_core.transaction_store import TransactionStore
+
+RESULTS_VERSION = 1
+DEFAULT_SIZES = (10000, 100000)
+SEARCH_TERMS = ("food", "2019|03", "12.5", "100..200", "2018|01|01..2018|03|31")
+LIST_BACKENDS = ("json", "binary", "sqlite")
+DICT_BACKENDS = ("journal", "binary", "sqlite")
+BACKEND_SUFFIXES = {"json": ".json", "journal": ".json", "binary": ".bin", "sqlite": ".db"}
+
+
+# Function to import CourseWork1's menu module from its own folder
+def import_coursework1():
+    path = os.path.join(REPO_DIR, "CourseWork1", "Course_work_01.py")
+    spec = importlib.util.spec_from_file_location("Course_work_01", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# Function to return the current commit so results from different commits can be told apart
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Function to open a backend on a file, saving with a full snapshot so "save" always measures the whole ledger
+def open_backend(name, filename):
+    if name == "journal":
+        return storage.JournalBackend(filename, compact_on_save=True)
+    return storage.open_backend(name, filename)
+
+
+# Function to remove a data file and anything its backend keeps next to it
+def remove_data_file(filename):
+    stem = os.path.splitext(filename)[0]
+    for path in (filename, stem + ".journal", filename + "-wal", filename + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class Suite:
+    def __init__(self, workdir, repeat, seed, gui_mode):
+        self.workdir = workdir
+        self.repeat = repeat
+        self.seed = seed
+        self.gui_mode = gui_mode
+        self.results = []
+
+    def measure(self, schema, size, operation, action, setup=None, variant=None, repeat=None):
+        # Run setup (untimed) then action, repeat times; prints from the menus are swallowed
+        runs = []
+        for _ in range(repeat or self.repeat):
+            state = setup() if setup else None
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                action(state)
+                runs.append(time.perf_counter() - start)
+        result = {"schema": schema, "size": size, "operation": operation, "variant": variant,
+                  "seconds_min": min(runs), "seconds_median": statistics.median(runs), "runs": runs,
+                  "rows_per_sec": size / min(runs) if min(runs) else None}
+        self.results.append(result)
+        label = f"{operation}[{variant}]" if variant else operation
+        print(f"{schema:>4} {size:>9} {label:<40} {result['seconds_median'] * 1000:10.2f} ms", file=sys.stderr)
+        return result
+
+    def ledger(self, schema, size):
+        filename = os.path.join(self.workdir, f"ledger-{schema}-{size}-{self.seed}" +
+                                (".txt" if schema == "bulk" else ".json"))
+        if not os.path.exists(filename):
+            ledger_generator.write_ledger(filename, size, schema, self.seed)
+        return filename
+
+    def data_file(self, schema, size, backend, store):
+        # The ledger in a backend's own format, written once from an already loaded store
+        filename = os.path.join(self.workdir, f"{backend}-{schema}-{size}{BACKEND_SUFFIXES[backend]}")
+        if backend in ("json", "journal"):
+            return self.ledger(schema, size)
+        if not os.path.exists(filename):
+            target = open_backend(backend, filename)
+            target.save(store)
+            target.close()
+        return filename
+
+    def load_store(self, schema, size):
+        store = TransactionStore(separator="-" if schema == "list" else "|")
+        storage.JsonBackend(self.ledger(schema, size)).load(store)
+        return store
+
+    # Benchmarks
+    def run_storage(self, schema, size, backends):
+        store = self.load_store(schema, size)
+        separator = store.separator
+        for backend in backends:
+            filename = self.data_file(schema, size, backend, store)
+
+            def load(state, backend=backend, filename=filename):
+                source = open_backend(backend, filename)
+                source.load(TransactionStore(separator=separator))
+                source.close()
+            self.measure(schema, size, "load", load, variant=backend)
+
+            target_name = os.path.join(self.workdir, f"save-{schema}-{size}{BACKEND_SUFFIXES[backend]}")
+
+            def clean_target(target_name=target_name):
+                remove_data_file(target_name)
+                return target_name
+
+            def save(target_name, backend=backend):
+                target = open_backend(backend, target_name)
+                target.save(store)
+                target.close()
+            self.measure(schema, size, "save", save, setup=clean_target, variant=backend)
+            remove_data_file(target_name)
+
+    def run_summary(self, schema, size):
+        store = self.load_store(schema, size)
+        module = import_coursework1() if schema == "list" else coursework_b
+        module.transactions = store
+        module.storage_backend = storage.JsonBackend(os.path.join(self.workdir, "unused.json"))
+        self.measure(schema, size, "summary", lambda state: module.display_summary())
+        rollups = Rollups(store)
+        by = "type" if schema == "list" else "category"
+        self.measure(schema, size, "rollup_build", lambda state: rollups.build())
+        for granularity in GRANULARITIES:
+            self.measure(schema, size, "period_report", lambda state, granularity=granularity: rollups.report(granularity, by),
+                         variant=granularity)
+        rollups.close()
+        for engine in ("numpy", "python") if analytics.numpy is not None else ("python",):
+            engine_analytics = analytics.Analytics(store, use_numpy=engine == "numpy")
+
+            def analyse(state, engine_analytics=engine_analytics):
+                engine_analytics.version = None  # Convert the columns again on every run
+                engine_analytics.totals(by)
+                engine_analytics.period_totals("month", by)
+                engine_analytics.running_balance()
+                engine_analytics.percentiles()
+            self.measure(schema, size, "analytics", analyse, variant=engine)
+
+    def run_bulk_import(self, size):
+        filename = self.ledger("bulk", size)
+
+        def fresh_store():
+            coursework_b.transactions = TransactionStore()
+            coursework_b.storage_backend = storage.JournalBackend(os.path.join(self.workdir, "bulk.json"))
+        self.measure("dict", size, "bulk_import", lambda state: coursework_b.read_bulk_transactions_from_file(filename),
+                     setup=fresh_store)
+
+    def run_search(self, size):
+        store = self.load_store("dict", size)
+        self.measure("dict", size, "search_index_build", lambda state: SearchIndex(store))
+        search_index = SearchIndex(store)
+        for term in SEARCH_TERMS:
+            self.measure("dict", size, "search", lambda state, term=term: search_index.search(term), variant=term)
+
+    def open_gui(self, filename):
+        if self.gui_mode == "tk":
+            root = assignment03.tk.Tk()
+            root.withdraw()
+            drain = root.update
+        else:
+            root = assignment03.tk.Tk()
+            drain = root.run_pending
+        gui = assignment03.FinanceTrackerGUI(root, filename)
+        while gui.task is not None:
+            drain()  # The file is read on a worker thread; wait until the window has it
+        return gui, root, drain
+
+    def run_gui(self, size):
+        filename = self.ledger("dict", size)
+        restore = headless_tk.install(assignment03) if self.gui_mode == "mock" else None
+        try:
+            opened = []
+
+            def open_window(state):
+                opened.append(self.open_gui(filename))
+            self.measure("dict", size, "gui_open", open_window, repeat=1)
+            gui, root, drain = opened[0]
+
+            def drain_jobs():
+                while gui.insert_jobs or gui.restripe_jobs:
+                    drain()
+
+            def expand_all(state):
+                for node in gui.tree.get_children(""):
+                    gui.tree.focus(node)
+                    gui.on_category_open(None)
+                drain_jobs()
+            def fresh_tree():
+                gui.search_var.set("")
+                gui.reset_tree()
+                gui.display_transactions(gui.transactions)
+            self.measure("dict", size, "gui_first_paint", lambda state: gui.display_transactions(gui.transactions),
+                         setup=gui.reset_tree)
+            self.measure("dict", size, "gui_expand_all", expand_all, setup=fresh_tree)
+            for column in ("Amount", "Date", "#0"):
+                def sort(state, column=column):
+                    gui.sort_by_column(column, False)
+                    drain_jobs()
+                self.measure("dict", size, "gui_sort", sort, variant=column)
+            for term in SEARCH_TERMS[:2]:
+                def search(state, term=term):
+                    gui.search_var.set(term)
+                    gui.search_transactions()
+                self.measure("dict", size, "gui_search", search, variant=term)
+
+                def clear_search(state):
+                    gui.search_var.set("")
+                    gui.search_transactions()
+                    drain_jobs()
+                # Put every row back after a search; the tree is diffed, so only the filtered-out rows are re-attached
+                self.measure("dict", size, "gui_search_clear", clear_search, setup=lambda term=term: search(None, term),
+                             variant=term)
+            root.destroy()
+        finally:
+            if restore:
+                restore()
+
+
+# Function to compare results with an earlier run; returns the cases that got slower than the threshold allows
+def compare_results(current, baseline, threshold):
+    earlier = {(r["schema"], r["size"], r["operation"], r["variant"]): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = earlier.get((result["schema"], result["size"], result["operation"], result["variant"]))
+        if not before or not before["seconds_median"]:
+            continue
+        ratio = result["seconds_median"] / before["seconds_median"]
+        label = f"{result['schema']} {result['size']} {result['operation']}" + \
+                (f"[{result['variant']}]" if result["variant"] else "")
+        flag = "  <-- slower" if ratio > threshold else ""
+        print(f"{label:<60} {ratio:6.2f}x{flag}", file=sys.stderr)
+        if ratio > threshold:
+            regressions.append(label)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time load, save, bulk import, summary, search, sort and GUI "
+                                                 "population on synthetic ledgers and write the results as JSON.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma separated ledger sizes, e.g. 10000,100000,1000000 (default %(default)s)")
+    parser.add_argument("--schemas", default="list,dict", help="list (CourseWork1), dict (CourseWork2/3) or both")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case; the median is compared")
+    parser.add_argument("--seed", type=int, default=42, help="seed for the synthetic ledgers")
+    parser.add_argument("--gui", choices=("auto", "tk", "mock", "none"), default="auto",
+                        help="tk needs a display (run under xvfb-run); mock uses a headless Treeview; "
+                             "auto picks tk when DISPLAY is set")
+    parser.add_argument("--workdir", help="keep the generated ledgers here instead of a temporary folder")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="slowdown ratio reported as a regression by --compare (default %(default)s)")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    schemas = [schema.strip() for schema in args.schemas.split(",") if schema.strip()]
+    gui_mode = args.gui
+    if gui_mode == "auto":
+        gui_mode = "tk" if os.environ.get("DISPLAY") else "mock"
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="finance-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    suite = Suite(workdir, args.repeat, args.seed, gui_mode)
+    try:
+        for size in sizes:
+            for schema in schemas:
+                suite.run_storage(schema, size, LIST_BACKENDS if schema == "list" else DICT_BACKENDS)
+                suite.run_summary(schema, size)
+            if "dict" in schemas:
+                suite.run_bulk_import(size)
+                suite.run_search(size)
+                if gui_mode != "none":
+                    suite.run_gui(size)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = {"version": RESULTS_VERSION, "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+              "commit": current_commit(), "python": platform.python_version(), "platform": platform.platform(),
+              "seed": args.seed, "repeat": args.repeat, "gui": gui_mode, "results": suite.results}
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(output, file, indent=2)
+    else:
+        json.dump(output, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            regressions = compare_results(output, json.load(file), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} case(s) slower than {args.threshold}x the baseline.", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,3 @@
+# Modules shared by the three courseworks: the columnar transaction store, its storage backends and file schemas,
+# bulk import, batch mode, export, rollups, analytics and the instrumentation. Each coursework's menu adds the
+# repository root to sys.path and imports them from here, so there is one copy of each.
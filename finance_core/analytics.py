@@ -0,0 +1,217 @@
+from datetime import date
+import argparse
+import math
+import os
+import sqlite3
+from . import storage
+from .rollups import GRANULARITIES, period_keys, period_label
+from .transaction_store import DELETED, TransactionStore
+
+try:
+    import numpy
+except ImportError:
+    numpy = None  # Everything below has a pure Python path giving the same answers, only slower
+
+# "numpy" or "python" forces a path; anything else uses NumPy when it is installed
+ANALYTICS_MODE = os.environ.get("FINANCE_ANALYTICS", "auto")
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()  # Day number of datetime64's day 0
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+
+# Function to interpolate between two sorted values the way numpy.percentile does, so both paths round alike
+def lerp(low, high, fraction):
+    if fraction >= 0.5:
+        return high - (high - low) * (1 - fraction)
+    return low + (high - low) * fraction
+
+
+class Analytics:
+    # Group-bys, running balances and percentiles over a TransactionStore. With NumPy the columns are turned into
+    # arrays once (float64 amounts, datetime64 dates, integer category codes) and every query is vectorized;
+    # without it the same queries loop over the store's own arrays. Sums are taken in row order on both paths
+    # (bincount and cumsum add sequentially), so the two give identical results, not merely close ones.
+    def __init__(self, store, use_numpy=None):
+        if use_numpy is None:
+            use_numpy = ANALYTICS_MODE == "numpy" or (numpy is not None and ANALYTICS_MODE != "python")
+        if use_numpy and numpy is None:
+            raise ImportError("NumPy is not installed; set FINANCE_ANALYTICS=python or install numpy")
+        self.store = store
+        self.use_numpy = use_numpy
+        self.version = None  # Store version the arrays were made from
+
+    def refresh(self):
+        # Rebuild the arrays only when the store changed since the last query
+        store = self.store
+        if self.version == store.version:
+            return
+        if self.use_numpy:
+            category_ids = numpy.frombuffer(store.category_ids, dtype=numpy.uint32)
+            live = category_ids != DELETED  # Tombstones of deleted rows are left out
+            self.amounts = numpy.frombuffer(store.amounts, dtype=numpy.float64)[live]
+            self.days = numpy.frombuffer(store.days, dtype=numpy.int32)[live]
+            self.category_codes = category_ids[live].astype(numpy.intp)
+            self.type_codes = numpy.frombuffer(store.type_ids, dtype=numpy.uint8)[live].astype(numpy.intp)
+            self.dated = self.days != 0  # Rows whose date could not be parsed have day 0
+            self.dates = (self.days[self.dated].astype(numpy.int64) - EPOCH_ORDINAL).astype("datetime64[D]")
+        else:
+            self.rows = list(store.rows())
+        self.version = store.version
+
+    def codes(self, by):
+        # (per-row codes, names) of the dimension to group by
+        if by == "category":
+            return (self.category_codes if self.use_numpy else self.store.category_ids), self.store.categories
+        if by == "type":
+            return (self.type_codes if self.use_numpy else self.store.type_ids), self.store.type_names
+        raise ValueError(f"Unknown dimension {by!r}, expected category or type")
+
+    def totals(self, by="category"):
+        # {name: total} over every transaction
+        self.refresh()
+        codes, names = self.codes(by)
+        if self.use_numpy:
+            sums = numpy.bincount(codes, weights=self.amounts, minlength=len(names))
+            return dict(zip(names, sums.tolist()))
+        sums = [0.0] * len(names)
+        amounts = self.store.amounts
+        for row in self.rows:
+            sums[codes[row]] += amounts[row]
+        return dict(zip(names, sums))
+
+    def period_totals(self, granularity="month", by="category"):
+        # [(period label, {name: total}), ...] in date order; undated rows are left out
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity {granularity!r}, expected one of: {', '.join(GRANULARITIES)}")
+        self.refresh()
+        codes, names = self.codes(by)
+        separator = self.store.separator
+        if self.use_numpy:
+            if granularity == "day":
+                periods = self.days[self.dated].astype(numpy.int64)
+            elif granularity == "month":
+                periods = self.dates.astype("datetime64[M]").astype(numpy.int64) + 1970 * 12
+            else:
+                periods = self.dates.astype("datetime64[Y]").astype(numpy.int64) + 1970
+            keys = periods * len(names) + codes[self.dated]
+            unique_keys, groups = numpy.unique(keys, return_inverse=True)
+            sums = numpy.bincount(groups.ravel(), weights=self.amounts[self.dated], minlength=len(unique_keys))
+            grouped = {}
+            for key, total in zip(unique_keys.tolist(), sums.tolist()):
+                period, code = divmod(key, len(names))
+                grouped.setdefault(period, {})[names[code]] = total
+        else:
+            index = GRANULARITIES.index(granularity)
+            period_cache = {}
+            grouped = {}
+            amounts, days = self.store.amounts, self.store.days
+            for row in self.rows:
+                day = days[row]
+                if not day:
+                    continue
+                period = period_cache.get(day)
+                if period is None:
+                    period = period_cache[day] = period_keys(day)[index]
+                bucket = grouped.get(period)
+                if bucket is None:
+                    bucket = grouped[period] = {}
+                name = names[codes[row]]
+                bucket[name] = bucket.get(name, 0.0) + amounts[row]
+            # Same name order as the NumPy path, which meets the names in code order
+            order = {name: i for i, name in enumerate(names)}
+            grouped = {period: dict(sorted(bucket.items(), key=lambda item: order[item[0]]))
+                       for period, bucket in grouped.items()}
+        return [(period_label(granularity, period, separator), grouped[period]) for period in sorted(grouped)]
+
+    def running_balance(self):
+        # [(date, balance at the end of that day), ...]: income adds, every other type takes away, in date order
+        self.refresh()
+        income = self.store.type_lookup.get("Income", -1)
+        if self.use_numpy:
+            order = numpy.argsort(self.days[self.dated], kind="stable")
+            days = self.days[self.dated][order]
+            amounts = self.amounts[self.dated][order]
+            signed = numpy.where(self.type_codes[self.dated][order] == income, amounts, -amounts)
+            balances = numpy.cumsum(signed)
+            last_of_day = numpy.flatnonzero(numpy.append(days[1:] != days[:-1], True)) if len(days) else []
+            pairs = zip(days[last_of_day].tolist(), balances[last_of_day].tolist())
+        else:
+            store = self.store
+            rows = sorted((row for row in self.rows if store.days[row]), key=store.days.__getitem__)
+            pairs = []
+            balance = 0.0
+            for i, row in enumerate(rows):
+                amount = store.amounts[row]
+                balance += amount if store.type_ids[row] == income else -amount
+                if i + 1 == len(rows) or store.days[rows[i + 1]] != store.days[row]:
+                    pairs.append((store.days[row], balance))
+        return [(self.store.format_day(day), balance) for day, balance in pairs]
+
+    def percentiles(self, percentiles=DEFAULT_PERCENTILES, category=None):
+        # {p: amount} with numpy.percentile's default linear interpolation; None for each p if there are no rows
+        self.refresh()
+        if category is not None and category not in self.store:
+            return dict.fromkeys(percentiles)
+        if self.use_numpy:
+            amounts = self.amounts
+            if category is not None:
+                amounts = amounts[self.category_codes == self.store.category_lookup[category]]
+            values = numpy.sort(amounts)
+        else:
+            rows = self.store.rows_for(category) if category is not None else self.rows
+            values = sorted(map(self.store.amounts.__getitem__, rows))
+        if not len(values):
+            return dict.fromkeys(percentiles)
+        result = {}
+        for p in percentiles:
+            position = p / 100 * (len(values) - 1)
+            low = math.floor(position)
+            high = min(low + 1, len(values) - 1)
+            result[p] = float(lerp(values[low], values[high], position - low))
+        return result
+
+
+# Function to print every report for a transactions file
+def print_report(store, granularity="month", by="category", use_numpy=None):
+    analytics = Analytics(store, use_numpy)
+    print(f"{len(store)} transaction(s), using {'NumPy' if analytics.use_numpy else 'pure Python'}")
+    for name, total in analytics.totals(by).items():
+        print(f"{name}: LKR{total:.2f}")
+    print(f"Totals by {granularity}:")
+    for period, totals in analytics.period_totals(granularity, by):
+        print(f"   {period}: " + ", ".join(f"{name} LKR{total:.2f}" for name, total in totals.items()))
+    balance = analytics.running_balance()
+    if balance:
+        print(f"Balance on {balance[-1][0]}: LKR{balance[-1][1]:.2f} "
+              f"(lowest LKR{min(b for d, b in balance):.2f}, highest LKR{max(b for d, b in balance):.2f})")
+    for p, amount in analytics.percentiles().items():
+        if amount is not None:
+            print(f"{p}th percentile amount: LKR{amount:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print totals, period group-bys, the running balance and amount "
+                                                 "percentiles for a transactions file.")
+    parser.add_argument("source", nargs="?", default=storage.JSON_FILE, help="a .json, .bin or .db transactions file")
+    parser.add_argument("--by", choices=("category", "type"), default="category")
+    parser.add_argument("--period", choices=GRANULARITIES, default="month")
+    parser.add_argument("--engine", choices=("auto", "numpy", "python"), default="auto",
+                        help="auto follows FINANCE_ANALYTICS, then uses NumPy when it is installed")
+    args = parser.parse_args(argv)
+
+    source = storage.backend_for_file(args.source)
+    store = TransactionStore()
+    try:
+        if not source.load(store):
+            print(f"Error: {args.source} not found!")
+            return
+        print_report(store, args.period, args.by, {"auto": None, "numpy": True, "python": False}[args.engine])
+    except ImportError as e:
+        print(f"Error: {e}")
+    except (ValueError, KeyError, sqlite3.Error) as e:
+        print(f"Error: could not read the file: {e}")
+    finally:
+        source.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from . import instrumentation
+
+# Seconds the oldest unsaved change may wait before the transactions are saved in the background; 0 turns autosave off
+AUTOSAVE_DELAY = float(os.environ.get("FINANCE_AUTOSAVE_DELAY", "2"))
+AUTOSAVE_OPERATIONS = int(os.environ.get("FINANCE_AUTOSAVE_OPERATIONS", "100"))  # Save sooner once this many are waiting
+
+
+class AutoSaver:
+    # Write-behind saving for the menus. Every change to the store marks it dirty; a worker thread saves once the
+    # oldest unsaved change is delay seconds old or max_operations changes are waiting, so a burst of edits (or a whole
+    # bulk import) becomes one save instead of one per edit, and the menu never waits for the disk.
+    # The store is not thread-safe, so whoever changes it holds lock meanwhile and a save takes the same lock; a save
+    # that comes due in the middle of a menu choice waits for the choice to finish.
+    def __init__(self, store, backend=None, delay=AUTOSAVE_DELAY, max_operations=AUTOSAVE_OPERATIONS):
+        self.store = store
+        self.backend = backend  # Asked for bytes_written around each save, if given
+        self.delay = delay
+        self.max_operations = max_operations
+        self.save = None  # Function saving the store, given to start()
+        self.lock = threading.RLock()  # Held while the store is changed or saved
+        self.wakeup = threading.Condition()  # Guards pending and first_change, and wakes the worker
+        self.pending = 0  # Changes since the last save
+        self.first_change = None  # time.monotonic() of the oldest unsaved change
+        self.stopping = False
+        self.thread = None
+        self.retry_at = None  # time.monotonic() before which a failed save is not tried again
+        self.saves = 0
+        self.background_saves = 0
+        self.failed_saves = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds = 0.0
+        self.total_bytes = 0
+        self.last_bytes = 0
+
+    def start(self, save):
+        # Begin following the store; with a delay of 0 saves only happen when flush() is called
+        self.save = save
+        if self.delay <= 0 or self.thread is not None:
+            return
+        self.stopping = False
+        self.store.subscribe(self.on_change)
+        self.thread = threading.Thread(target=self.run, name="autosave", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # Stop the worker without saving; call it without holding lock, as the worker may be waiting for it
+        if self.thread is None:
+            return
+        with self.wakeup:
+            self.stopping = True
+            self.wakeup.notify()
+        self.thread.join()
+        self.thread = None
+        self.store.unsubscribe(self.on_change)
+
+    def on_change(self, event, row, old):
+        count = len(self.store.amounts) - row if event == "add_many" else 1
+        with self.wakeup:
+            if not self.pending:
+                self.first_change = time.monotonic()
+            self.pending += count
+            if self.pending == count or self.pending - count < self.max_operations <= self.pending:
+                self.wakeup.notify()
+
+    def time_left(self):
+        # Seconds until the waiting changes are due to be saved, None while there are none
+        if not self.pending:
+            return None
+        if self.retry_at is not None:
+            return max(0.0, self.retry_at - time.monotonic())  # A failed save waits delay before the next try
+        if self.pending >= self.max_operations:
+            return 0.0
+        return max(0.0, self.first_change + self.delay - time.monotonic())
+
+    def run(self):
+        while True:
+            with self.wakeup:
+                while not self.stopping and self.time_left() != 0.0:
+                    self.wakeup.wait(self.time_left())
+                if self.stopping:
+                    return
+            self.flush(background=True)
+
+    def flush(self, background=False):
+        # Save now, on the calling thread, and note how long it took and how much was written. Returns False if the
+        # save failed, by returning False or raising; the changes then stay pending and are tried again after delay
+        with self.lock:
+            if background and not self.pending:
+                return True  # Saved by an explicit flush while the worker was waiting for the lock
+            bytes_before = self.backend.bytes_written if self.backend is not None else 0
+            start = time.perf_counter()
+            try:
+                with instrumentation.timer("autosave.flush" if background else "autosave.flush_now"):
+                    saved = self.save() is not False
+            except Exception as e:
+                print(f"Error: the transactions could not be saved: {e}")
+                saved = False
+            seconds = time.perf_counter() - start
+            written = self.backend.bytes_written - bytes_before if self.backend is not None else 0
+            with self.wakeup:
+                if saved:
+                    self.pending = 0  # Changes a save makes itself (merging another process's) are saved with it
+                    self.first_change = None
+                    self.retry_at = None
+                else:
+                    self.retry_at = time.monotonic() + self.delay
+        if not saved:
+            self.failed_saves += 1
+            return False
+        instrumentation.count("autosave.bytes", written)
+        self.saves += 1
+        self.background_saves += background
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.last_seconds = seconds
+        self.total_bytes += written
+        self.last_bytes = written
+        return True
+
+    def report(self):
+        # One line on the saves made so far, or None if none were made in the background and none failed
+        if not self.background_saves and not self.failed_saves:
+            return None
+        failed = f" {self.failed_saves} save(s) failed." if self.failed_saves else ""
+        if not self.saves:
+            return failed.strip()
+        return (f"Saved {self.saves} time(s), {self.background_saves} in the background: "
+                f"{self.total_seconds * 1000 / self.saves:.1f} ms on average, {self.max_seconds * 1000:.1f} ms at most, "
+                f"{self.total_bytes} byte(s) written.{failed}")
@@ -0,0 +1,173 @@
+import argparse
+import os
+import shlex
+import sqlite3
+import sys
+from . import export
+from . import storage
+from .transaction_store import TRANSACTION_TYPES
+
+
+class OperationError(Exception):
+    # An operation in a batch that could not be applied; the rest of the batch still runs
+    pass
+
+
+class ScriptParser(argparse.ArgumentParser):
+    # Raises instead of exiting, so one bad line of a script does not end the whole batch
+    def error(self, message):
+        raise OperationError(message)
+
+    def exit(self, status=0, message=None):
+        # -h on a script line prints the help and would then end the program; report the line instead
+        raise OperationError(message.strip() if message else "-h prints help and is not an operation")
+
+
+# Function to build the command line parser; the same subcommands are used for the lines of a script
+def build_parser(prog, commands, date_format, parser_class=argparse.ArgumentParser):
+    parser = parser_class(prog=prog, description="Run operations without the menu: the transactions are loaded once, "
+                                                 "every operation is applied, then they are saved once.")
+    subcommands = parser.add_subparsers(dest="command", required=True, parser_class=parser_class)
+    if "add" in commands:
+        add = subcommands.add_parser("add", help="add one transaction")
+        add.add_argument("category")
+        add.add_argument("amount", type=float)
+        add.add_argument("date", help=f"date as {date_format}")
+        add.add_argument("type", nargs="?", default="Expense", type=str.title, choices=TRANSACTION_TYPES,
+                         help="Income or Expense (default Expense)")
+    if "import" in commands:
+        bulk = subcommands.add_parser("import", help="add every line of one or more bulk files (category,amount,date)")
+        bulk.add_argument("files", nargs="+", help="files or glob patterns")
+    if "delete" in commands:
+        delete = subcommands.add_parser("delete", help="delete transactions by id, e.g. delete 12 #15")
+        delete.add_argument("ids", nargs="+")
+    if "summary" in commands:
+        subcommands.add_parser("summary", help="print the summary")
+    if "report" in commands:
+        report = subcommands.add_parser("report", help="print totals per period")
+        report.add_argument("granularity", nargs="?", default="month", choices=("day", "month", "year"))
+        report.add_argument("--from", dest="start_date")
+        report.add_argument("--to", dest="end_date")
+    if "export" in commands:
+        export_command = subcommands.add_parser(
+            "export", help="write the transactions to a .json, .bin or .db file, or stream them to CSV, JSON Lines "
+                           "or the CourseWork1 list schema, optionally filtered")
+        export_command.add_argument("target", help="file to write; .csv and .jsonl files are streamed, - is stdout")
+        export_command.add_argument("--format", choices=export.EXPORT_FORMATS)
+        export_command.add_argument("--category")
+        export_command.add_argument("--type", dest="transaction_type", type=str.title)
+        export_command.add_argument("--from", dest="start_date", help=f"first date to include, as {date_format}")
+        export_command.add_argument("--to", dest="end_date", help=f"last date to include, as {date_format}")
+    run = subcommands.add_parser("run", help="run the operations in a script file, one per line ('-' reads stdin)")
+    run.add_argument("script")
+    return parser
+
+
+# Function to read the operations of a script: one command line per line, lines starting with # are comments.
+# A line shlex cannot split (an unbalanced quote) raises OperationError naming the line.
+def read_script(file):
+    for line_number, line in enumerate(file, 1):
+        if line.lstrip().startswith("#"):
+            continue  # Only whole lines, since "#12" is also how an id is written
+        try:
+            words = shlex.split(line)
+        except ValueError as e:
+            raise OperationError(f"Line {line_number}: {e}") from None
+        if words:
+            yield line_number, words
+
+
+# Function to turn "12" or "#12" into a transaction id
+def parse_id(text):
+    digits = text[1:] if text.startswith("#") else text
+    if not digits.isdigit():
+        raise OperationError(f"Invalid ID {text!r}. Please enter a number, optionally after #.")
+    return int(digits)
+
+
+# Function to delete transactions by id; an unknown id is reported and the others are still deleted
+def delete_ids(store, ids):
+    deleted_all = True
+    for text in ids:
+        try:
+            row = store.row_of(parse_id(text))
+        except OperationError as e:
+            print(e)
+            deleted_all = False
+            continue
+        except KeyError:
+            print(f"No transaction with ID {text}.")
+            deleted_all = False
+            continue
+        deleted_transaction = store.entry(row)
+        store.delete(row)
+        print("Transaction deleted successfully:", deleted_transaction)
+    return deleted_all
+
+
+# Function to run the export command: a streamed export for a format, a filter, stdout or a .csv/.jsonl target,
+# otherwise a copy through the storage backend the target's extension names
+def export_file(store, args):
+    filters = (args.category, args.start_date, args.end_date, args.transaction_type)
+    if args.format or args.target == "-" or export.format_for_file(args.target) or any(filters):
+        written, skipped = export.export_transactions(store, args.target, args.format, *filters)
+        if skipped:
+            print(f"Skipped {skipped} transaction(s) whose category has a comma.", file=sys.stderr)
+        if args.target != "-":
+            print(f"Wrote {written} transaction(s) to {args.target}.")
+        return not skipped
+    backend = storage.open_backend(storage.SUFFIX_MODES.get(os.path.splitext(args.target)[1], "json"), args.target)
+    try:
+        backend.save_all(store)
+    finally:
+        backend.close()
+    print(f"Wrote {len(store)} transaction(s) to {args.target}.")
+
+
+# Function to run one command line (or a script of them) against a coursework's store.
+# handlers maps command -> function(args) returning False or raising OperationError on failure; load and save
+# are called once around the whole batch, and save only if the store changed; save returns False if it failed.
+# Returns 0 if every operation worked, 1 otherwise, for use as the exit status.
+def main(argv, store, handlers, load, save, prog=None, date_format="YYYY|MM|DD"):
+    parser = build_parser(prog, handlers, date_format)
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        line_parser = build_parser(prog, handlers, date_format, ScriptParser)
+        try:
+            file = sys.stdin if args.script == "-" else open(args.script, "r")
+        except OSError as e:
+            print(f"Error: could not read {args.script}: {e}")
+            return 1
+        try:
+            operations = []
+            for line_number, words in read_script(file):
+                try:
+                    operation = line_parser.parse_args(words)
+                    if operation.command == "run":
+                        raise OperationError("scripts cannot run other scripts")
+                except OperationError as e:
+                    print(f"Line {line_number}: {e}")
+                    return 1  # Nothing has been applied yet, so a mistake in the script changes nothing
+                operations.append((f"Line {line_number}", operation))
+        except OperationError as e:
+            print(e)
+            return 1
+        finally:
+            if file is not sys.stdin:
+                file.close()  # stdin stays open for whoever runs the batch
+    else:
+        operations = [(args.command, args)]
+
+    load()
+    loaded_version = store.version
+    failures = 0
+    for label, operation in operations:
+        try:
+            if handlers[operation.command](operation) is False:
+                failures += 1
+        except (OperationError, ValueError, OSError, sqlite3.Error) as e:
+            print(f"{label}: {e}")
+            failures += 1
+    if store.version != loaded_version and save() is False:
+        failures += 1
+    return 1 if failures else 0
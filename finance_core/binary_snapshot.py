@@ -0,0 +1,271 @@
+from array import array
+from bisect import bisect_left, bisect_right
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from . import date_codec
+from . import schema
+from .transaction_store import TransactionStore, format_day
+
+# Layout, all little-endian:
+#   header      magic, format version, date separator, row count, category count, type count, string table size
+#   totals      float64 per category, then float64 per type (the running totals at save time)
+#   columns     amounts float64[rows], transaction ids int64[rows], days int32[rows], category ids uint32[rows],
+#               type ids uint8[rows]
+#   date order  uint32[rows], row numbers sorted by day, for range queries
+#   strings     UTF-8 JSON with the category names, type names, the next transaction id and any dates that are not
+#               valid dates
+# Format version 1 had no transaction ids; those snapshots are still read, with the rows numbered from 1.
+MAGIC = b"FTSNAP\x00\x01"
+FORMAT_VERSION = 2
+READABLE_VERSIONS = (1, 2)
+HEADER = struct.Struct("<8sHc5xQIIQ")
+SNAPSHOT_FILE = "transactions.bin"
+NATIVE_LITTLE_ENDIAN = sys.byteorder == "little"
+# Attribute name -> (section, typecode, attribute holding the element count)
+COLUMNS = {
+    "category_totals_column": ("category_totals", 'd', "category_count"),
+    "type_totals_column": ("type_totals", 'd', "type_count"),
+    "amounts": ("amounts", 'd', "count"),
+    "ids": ("ids", 'q', "count"),
+    "days": ("days", 'i', "count"),
+    "category_ids": ("category_ids", 'I', "count"),
+    "type_ids": ("type_ids", 'B', "count"),
+    "date_order": ("date_order", 'I', "count"),
+}
+
+
+# Function to round a byte offset up to the next multiple of 8 so every column is aligned
+def align(offset):
+    return (offset + 7) & ~7
+
+
+# Function to work out where each section starts from the counts in the header
+def section_offsets(rows, categories, types, version=FORMAT_VERSION):
+    offsets = {"category_totals": HEADER.size}
+    offsets["type_totals"] = offsets["category_totals"] + 8 * categories
+    offsets["amounts"] = offsets["type_totals"] + 8 * types
+    if version >= 2:
+        offsets["ids"] = offsets["amounts"] + 8 * rows
+        offsets["days"] = offsets["ids"] + 8 * rows
+    else:
+        offsets["days"] = offsets["amounts"] + 8 * rows
+    offsets["category_ids"] = offsets["days"] + 4 * rows
+    offsets["type_ids"] = offsets["category_ids"] + 4 * rows
+    offsets["date_order"] = align(offsets["type_ids"] + rows)
+    offsets["strings"] = offsets["date_order"] + 4 * rows
+    return offsets
+
+
+# Function to return an array's bytes in little-endian order
+def little_endian_bytes(column):
+    if NATIVE_LITTLE_ENDIAN:
+        return column.tobytes()
+    swapped = array(column.typecode, column)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+# Function to write a store as a binary snapshot, replacing the file atomically
+def write_snapshot(store, filename=SNAPSHOT_FILE):
+    rows, categories, types = len(store), len(store.categories), len(store.type_names)
+    ids, amounts, days, category_ids, type_ids, odd_dates = store.live_columns()  # Deleted rows are left out
+    strings = json.dumps({"categories": store.categories, "types": store.type_names, "next_id": store.next_id,
+                          "odd_dates": {str(row): date_str for row, date_str in odd_dates.items()}}).encode()
+    date_order = array('I', sorted(range(rows), key=days.__getitem__))
+    offsets = section_offsets(rows, categories, types)
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, "wb") as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, store.file_separator.encode(), rows, categories, types,
+                               len(strings)))
+        file.write(little_endian_bytes(store.category_totals_column))
+        file.write(little_endian_bytes(store.type_totals_column))
+        file.write(little_endian_bytes(amounts))
+        file.write(little_endian_bytes(ids))
+        file.write(little_endian_bytes(days))
+        file.write(little_endian_bytes(category_ids))
+        file.write(type_ids.tobytes())
+        file.write(bytes(offsets["date_order"] - offsets["type_ids"] - rows))
+        file.write(little_endian_bytes(date_order))
+        file.write(strings)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_filename, filename)
+
+
+class SnapshotReader:
+    # Read-only view of a binary snapshot through mmap; nothing is copied until a row is asked for
+    def __init__(self, filename=SNAPSHOT_FILE):
+        self.file = open(filename, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"{filename} is empty, not a snapshot")
+        magic, version, separator, rows, categories, types, strings_size = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version not in READABLE_VERSIONS:
+            self.close()
+            raise ValueError(f"{filename} is not a transaction snapshot")
+        self.version = version
+        self.separator = separator.decode()
+        self.offsets = section_offsets(rows, categories, types, version)
+        self.count = rows
+        self.category_count = categories
+        self.type_count = types
+        strings = json.loads(self.map[self.offsets["strings"]:self.offsets["strings"] + strings_size])
+        self.categories = strings["categories"]
+        self.type_names = strings["types"]
+        self.odd_dates = {int(row): date_str for row, date_str in strings["odd_dates"].items()}
+        self.next_id = strings.get("next_id")
+        self.category_lookup = {name: i for i, name in enumerate(self.categories)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for name in [name for name, value in self.__dict__.items() if isinstance(value, memoryview)]:
+            del self.__dict__[name]
+        try:
+            self.map.close()
+        except BufferError:
+            pass  # A caller still holds rows from this snapshot; the map is released along with them
+        self.file.close()
+
+    def raw_column(self, name):
+        # Little-endian bytes of one column, straight out of the map
+        section, typecode, count_name = COLUMNS[name]
+        if section not in self.offsets:
+            raise AttributeError(f"a version {self.version} snapshot has no {name} column")
+        start = self.offsets[section]
+        return memoryview(self.map)[start:start + array(typecode).itemsize * self.__dict__[count_name]]
+
+    # Columns are mapped on first use, so a summary never touches the row data
+    def __getattr__(self, name):
+        if name not in COLUMNS:
+            raise AttributeError(name)
+        typecode = COLUMNS[name][1]
+        data = self.raw_column(name)
+        if NATIVE_LITTLE_ENDIAN:
+            value = data.cast(typecode)
+        else:
+            value = array(typecode, data.tobytes())
+            value.byteswap()
+        self.__dict__[name] = value
+        return value
+
+    def category_totals(self):
+        return dict(zip(self.categories, self.category_totals_column))
+
+    def type_totals(self):
+        return dict(zip(self.type_names, self.type_totals_column))
+
+    def date(self, row):
+        day = self.days[row]
+        if not day:
+            return self.odd_dates.get(row, "")
+        return format_day(day, self.separator)
+
+    def record(self, row):
+        return [self.amounts[row], self.categories[self.category_ids[row]], self.type_names[self.type_ids[row]], self.date(row)]
+
+    def rows_between(self, start_date, end_date):
+        # Rows dated from start_date to end_date inclusive, found by bisecting the date order
+        start_day = date_codec.date_key(start_date, self.separator)
+        end_day = date_codec.date_key(end_date, self.separator)
+        order, days = self.date_order, self.days
+        low = bisect_left(order, start_day, key=days.__getitem__)
+        high = bisect_right(order, end_day, key=days.__getitem__)
+        return order[low:high]
+
+    def total_between(self, start_date, end_date, category=None):
+        amounts, category_ids = self.amounts, self.category_ids
+        rows = self.rows_between(start_date, end_date)
+        if category is None:
+            return sum(map(amounts.__getitem__, rows))
+        category_id = self.category_lookup.get(category)
+        return sum(amounts[row] for row in rows if category_ids[row] == category_id)
+
+
+# Function to load a binary snapshot into a store, copying whole columns instead of building records
+def load_snapshot(store, filename=SNAPSHOT_FILE):
+    with SnapshotReader(filename) as reader:
+        columns = {}
+        for name, typecode in (("amounts", 'd'), ("days", 'i'), ("category_ids", 'I'), ("type_ids", 'B'), ("ids", 'q')):
+            if COLUMNS[name][0] not in reader.offsets:
+                continue  # No ids before version 2
+            column = array(typecode)
+            with reader.raw_column(name) as data:
+                column.frombytes(data)
+            if not NATIVE_LITTLE_ENDIAN:
+                column.byteswap()
+            columns[name] = column
+        store.separator = store.file_separator = reader.separator
+        store.load_columns(columns["amounts"], columns["days"], columns["category_ids"], columns["type_ids"],
+                           reader.categories, reader.type_names, reader.odd_dates,
+                           list(reader.category_totals_column), list(reader.type_totals_column),
+                           columns.get("ids"), reader.next_id)
+    return store
+
+
+# Function to convert a JSON transactions file (either schema) into a binary snapshot
+def json_to_snapshot(json_filename, snapshot_filename):
+    with open(json_filename, "r") as file:
+        data = json.load(file)
+    store = TransactionStore()
+    schema.load_document(store, data)
+    write_snapshot(store, snapshot_filename)
+    return store
+
+
+# Function to convert a binary snapshot back into the JSON schema that matches its date separator
+def snapshot_to_json(snapshot_filename, json_filename):
+    store = load_snapshot(TransactionStore(), snapshot_filename)
+    with open(json_filename, "w") as file:
+        file.writelines(schema.document_chunks(store))
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert transactions between JSON and the binary snapshot format.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    to_binary = commands.add_parser("to-binary", help="convert a JSON file into a binary snapshot")
+    to_binary.add_argument("source", nargs="?", default="transactions.json")
+    to_binary.add_argument("target", nargs="?", default=SNAPSHOT_FILE)
+    to_json = commands.add_parser("to-json", help="convert a binary snapshot into a JSON file")
+    to_json.add_argument("source", nargs="?", default=SNAPSHOT_FILE)
+    to_json.add_argument("target", nargs="?", default="transactions.json")
+    info = commands.add_parser("info", help="print totals straight from a binary snapshot")
+    info.add_argument("source", nargs="?", default=SNAPSHOT_FILE)
+    info.add_argument("--from", dest="start_date", help="start of a date range to total")
+    info.add_argument("--to", dest="end_date", help="end of a date range to total")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "to-binary":
+            store = json_to_snapshot(args.source, args.target)
+            print(f"Wrote {len(store)} transaction(s) to {args.target}.")
+        elif args.command == "to-json":
+            store = snapshot_to_json(args.source, args.target)
+            print(f"Wrote {len(store)} transaction(s) to {args.target}.")
+        else:
+            with SnapshotReader(args.source) as reader:
+                print(f"{reader.count} transaction(s)")
+                for category, total in reader.category_totals().items():
+                    print(f"{category}: LKR{total:.2f}")
+                if args.start_date and args.end_date:
+                    total = reader.total_between(args.start_date, args.end_date)
+                    print(f"Total from {args.start_date} to {args.end_date}: LKR{total:.2f}")
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found!")
+    except (ValueError, KeyError) as e:
+        print(f"Error: could not convert the file: {e}")
+
+
+if __name__ == "__main__":
+    main()
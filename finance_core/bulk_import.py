@@ -0,0 +1,105 @@
+import glob
+import os
+from . import date_codec
+
+BULK_BATCH_SIZE = 10000  # Lines parsed per batch when importing from a file
+BULK_READ_BUFFER = 1024 * 1024  # Bytes read from disk at a time when importing from a file
+MAX_REPORTED_ERRORS = 20  # Rejected lines listed individually in the import report
+
+
+# Function to read a bulk file lazily, yielding batches of (line number, line) pairs
+def read_bulk_batches(file, batch_size=BULK_BATCH_SIZE):
+    batch = []
+    for line_number, line in enumerate(file, start=1):
+        batch.append((line_number, line))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Function to record a rejected line in the import report
+def reject_bulk_line(report, line_number, reason, line):
+    report["rejected"] += 1
+    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+        report["errors"].append((line_number, reason, line.rstrip("\n")))
+
+
+# Function to parse a batch of lines into (category, amount, date) rows
+def parse_bulk_batch(batch, report):
+    candidates = []
+    for line_number, line in batch:
+        data = line.strip().split(',')
+        if data == ['']:
+            continue  # Skip blank lines
+        if len(data) < 3:
+            reject_bulk_line(report, line_number, "Invalid data", line)
+            continue
+        category, amount_str, date = data[0], data[1], data[2]
+
+        if not category.strip() or not amount_str.strip() or not date.strip():
+            reject_bulk_line(report, line_number, "Invalid data", line)
+            continue
+
+        try:
+            amount = float(amount_str)
+        except ValueError:
+            reject_bulk_line(report, line_number, "Invalid amount", line)
+            continue
+
+        candidates.append((line_number, line, category, amount, date))
+
+    # Validate the date column of the whole batch at once
+    valid_dates = date_codec.validate_dates([candidate[4] for candidate in candidates])
+    rows = []
+    for (line_number, line, category, amount, date), valid in zip(candidates, valid_dates):
+        if not valid:
+            reject_bulk_line(report, line_number, "Invalid date format", line)
+            continue
+        rows.append((category, amount, date))
+    return rows
+
+
+# Function to expand a list of filenames and glob patterns into files, in a stable order
+def expand_bulk_files(patterns):
+    files = []
+    for pattern in patterns:
+        pattern = pattern.strip()
+        if not pattern:
+            continue
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for filename in matches:
+            if filename not in files:
+                files.append(filename)
+    return files
+
+
+# Function run in a worker process or thread to parse one bulk file into per-category columns
+# progress(fraction) is called after every batch; once cancelled() returns True the file is abandoned
+def parse_bulk_file(filename, progress=None, cancelled=None):
+    report = {"accepted": 0, "rejected": 0, "errors": [], "failed": None}
+    grouped = {}
+    try:
+        size = os.path.getsize(filename) or 1
+        done = 0
+        with open(filename, 'r', buffering=BULK_READ_BUFFER) as file:
+            for batch in read_bulk_batches(file):
+                if cancelled and cancelled():
+                    report["failed"] = "Import cancelled."
+                    break
+                for category, amount, date in parse_bulk_batch(batch, report):
+                    if category not in grouped:
+                        grouped[category] = ([], [])
+                    amounts, dates = grouped[category]
+                    amounts.append(amount)
+                    dates.append(date)
+                    report["accepted"] += 1
+                if progress:
+                    done += sum(len(line) for line_number, line in batch)
+                    progress(min(done / size, 1.0))
+    except FileNotFoundError:
+        report["failed"] = f"{filename} not found!"
+    except Exception as e:
+        report["failed"] = f"Unexpected error while reading {filename}: {e}"
+    return filename, grouped, report
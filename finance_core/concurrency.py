@@ -0,0 +1,262 @@
+from contextlib import contextmanager
+import os
+from . import schema
+from . import storage
+from .transaction_store import TransactionStore
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # No advisory locks on Windows; saves still replace the file atomically and merge what they can see
+
+LOCK_SUFFIX = ".lock"  # The lock is taken on a file of its own, since saves rename a new data file over the old one
+SHARED_MODES = ("json", "journal", "snapshot")  # Storage modes kept in a JSON file; SQLite does its own locking
+
+
+# Function to hold the advisory lock of a ledger: saves take it exclusively, loads share it, so loads never wait for
+# each other, only for a save that is writing at that moment
+@contextmanager
+def locked(filename, exclusive=True):
+    if fcntl is None:
+        yield
+        return
+    with open(filename + LOCK_SUFFIX, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# Function to apply the changes one process made to its store onto a store read from the file another process has
+# saved since. added holds (first id, last id) runs of transactions added here; touched maps the id of every
+# transaction updated or deleted here to its values before the first change. The values to apply are read from source
+# as they are now, so a transaction changed twice is applied once and one added then deleted not at all.
+# Transactions are found by their id, which the file keeps; if the other process changed or deleted the same
+# transaction it no longer holds the old values, and the change is returned as a conflict instead of being applied.
+# A transaction added here keeps its id unless the other process gave the same id to one of its own.
+def replay_changes(source, added, touched, store):
+    conflicts = []
+    for transaction_id, old in touched.items():
+        try:
+            source_row = source.row_of(transaction_id)
+        except KeyError:
+            source_row = None
+        event = "delete" if source_row is None else "update"
+        try:
+            row = store.row_of(transaction_id)
+        except KeyError:
+            row = None
+        saved = None if row is None else store.record(row)
+        wanted = None if source_row is None else source.record(source_row)
+        if saved == wanted:
+            continue  # The other process made the same change
+        if saved != old:
+            conflicts.append(f"{event} of {old[1]} {old[0]} on {old[3]}: changed by another process")
+        elif wanted is None:
+            store.delete(row)
+        else:
+            store.update(row, amount=wanted[0], date_str=wanted[3], category=wanted[1], transaction_type=wanted[2])
+    for first_id, last_id in added:
+        for transaction_id in range(first_id, last_id + 1):
+            try:
+                source_row = source.row_of(transaction_id)
+            except KeyError:
+                continue  # Deleted again before the save
+            try:
+                store.row_of(transaction_id)
+                new_id = None  # Taken by a transaction the other process added; the next free id is used
+            except KeyError:
+                new_id = transaction_id
+            store.add(source.category(source_row), source.amounts[source_row], source.date(source_row),
+                      source.transaction_type(source_row), new_id)
+    return conflicts
+
+
+class SharedBackend(storage.StorageBackend):
+    # Wraps the backend of a JSON ledger so several processes (menus, GUI windows, batch runs) can save to it without
+    # losing each other's updates. The file's revision and its journal's size are noted when it is read; a save checks
+    # them under the exclusive lock, and if another process saved in between, the file is read again, this process's
+    # changes are replayed on top of it, and the merged transactions are written back as a new revision.
+    # The merged transactions are then applied to the store by id with apply_merge(); a save on a worker thread passes
+    # defer_merge=True and leaves that to the thread that owns the store.
+    # Only ids and the values replaced by updates and deletes are kept between saves; the values of added and changed
+    # transactions are read from the store when a merge needs them, so a large import costs a few ints here.
+    def __init__(self, mode, filename=None):
+        self.mode = mode
+        self.backend = storage.open_backend(mode, filename)
+        self.filename = self.backend.filename
+        self.journal_file = os.path.splitext(self.filename)[0] + ".journal"
+        self.disk_state = None  # (revision, journal size) of the file as this process last read or wrote it
+        self.added = []  # [first id, last id] runs of the transactions added since then
+        self.touched = {}  # Id -> record before its first update or delete since then, for transactions not added here
+        self.replaced = False  # Set when the store was cleared or reloaded, which cannot be replayed
+        self.merged = None  # Merged TransactionStore written by the last save, until apply_merge() takes it
+        self.merges = 0
+        self.conflicts = 0
+
+    @property
+    def file_version(self):
+        return self.backend.file_version
+
+    @property
+    def bytes_written(self):
+        return self.backend.bytes_written
+
+    @property
+    def keep_totals(self):
+        return self.backend.keep_totals
+
+    @keep_totals.setter
+    def keep_totals(self, keep_totals):
+        self.backend.keep_totals = keep_totals  # Written by the wrapped backend, so under the same lock as the data
+
+    def read_disk_state(self):
+        header = schema.read_file_header(self.filename)
+        try:
+            journal_size = os.path.getsize(self.journal_file)
+        except OSError:
+            journal_size = 0
+        return (None if header is None else header.get("revision", 0)), journal_size
+
+    def load(self, store):
+        with locked(self.filename, exclusive=False):
+            found = self.backend.load(store)
+            self.disk_state = self.read_disk_state()
+        self.attach(store)
+        self.forget_changes()
+        self.merged = None
+        return found
+
+    def forget_changes(self):
+        self.added = []
+        self.touched = {}
+        self.replaced = False
+
+    def note_added(self, first_id, last_id):
+        if self.added and self.added[-1][1] == first_id - 1:
+            self.added[-1][1] = last_id  # Ids are handed out in order, so most adds extend the last run
+        else:
+            self.added.append([first_id, last_id])
+
+    def added_here(self, transaction_id):
+        return any(first_id <= transaction_id <= last_id for first_id, last_id in reversed(self.added))
+
+    def on_change(self, event, row, old):
+        ids = self.store.ids
+        if event == "add":
+            self.note_added(ids[row], ids[row])
+        elif event == "add_many":
+            self.note_added(ids[row], ids[len(ids) - 1])
+        elif event in ("update", "delete"):
+            transaction_id = ids[row]
+            if transaction_id not in self.touched and not self.added_here(transaction_id):
+                self.touched[transaction_id] = old
+        elif event != "compact":
+            self.replaced = True
+
+    def save(self, store, rewrite=False, defer_merge=False):
+        with locked(self.filename):
+            merged = None
+            if self.store is store and self.disk_state is not None and self.read_disk_state() != self.disk_state:
+                merged = self.merge(store)
+                rewrite = True  # The journal on disk is not the one this process was appending to
+            if merged is not None:
+                self.backend.save_all(merged)
+            elif rewrite:
+                self.backend.save_all(store)
+            else:
+                self.backend.save(store)
+            self.disk_state = self.read_disk_state()
+        self.forget_changes()
+        if merged is not None:
+            self.merged = merged
+            if not defer_merge:
+                self.apply_merge(store)
+
+    def save_all(self, store, defer_merge=False):
+        self.save(store, rewrite=True, defer_merge=defer_merge)
+
+    def merge(self, store):
+        # Read the file again and replay this process's changes on it; returns the merged TransactionStore, or None if
+        # the store was reloaded here and simply replaces the file
+        current = TransactionStore(store.separator)
+        reader = storage.open_backend(self.mode, self.filename)
+        try:
+            reader.load(current)
+        finally:
+            reader.close()
+        self.backend.revision = reader.revision  # The next write follows the revision on disk
+        self.merges += 1
+        if self.replaced:
+            print(f"Warning: {self.filename} was changed by another process; "
+                  f"the transactions here were reloaded, so they replace those changes.")
+            return None
+        current.separator = store.separator  # As in an upgrade, dates are kept as day numbers
+        conflicts = replay_changes(store, self.added, self.touched, current)
+        if conflicts:
+            self.conflicts += len(conflicts)
+            print(f"Warning: {len(conflicts)} change(s) could not be merged with those saved by another process:")
+            for conflict in conflicts:
+                print(f"   {conflict}")
+        return current
+
+    def apply_merge(self, store):
+        # Bring the store in line with the merged transactions of the last save, matching them by id, so listeners
+        # such as the GUI see only the rows that differ. Must run on the thread that changes the store.
+        merged, self.merged = self.merged, None
+        if merged is None:
+            return
+        # The file already holds these changes, so neither this backend nor the one it wraps should note them again
+        followers = [self.on_change] + ([self.backend.on_change] if self.backend.store is store else [])
+        for follower in followers:
+            store.unsubscribe(follower)
+        try:
+            for row in list(store.rows()):
+                try:
+                    merged_row = merged.row_of(store.ids[row])
+                except KeyError:
+                    store.delete(row)
+                    continue
+                record = merged.record(merged_row)
+                if store.record(row) != record:
+                    store.update(row, amount=record[0], date_str=record[3], category=record[1],
+                                 transaction_type=record[2])
+            for merged_row in merged.rows():
+                transaction_id = merged.ids[merged_row]
+                try:
+                    store.row_of(transaction_id)
+                except KeyError:
+                    store.add(merged.category(merged_row), merged.amounts[merged_row], merged.date(merged_row),
+                              merged.transaction_type(merged_row), transaction_id)
+            store.next_id = max(store.next_id, merged.next_id)
+            store.file_separator = merged.file_separator  # Another process may have upgraded an older file
+        finally:
+            for follower in followers:
+                store.subscribe(follower)
+
+    def close(self):
+        super().close()
+        self.backend.close()
+
+    def category_totals(self, store):
+        return self.backend.category_totals(store)
+
+    def type_totals(self, store):
+        return self.backend.type_totals(store)
+
+    def total(self, store, category=None, transaction_type=None, start_date=None, end_date=None):
+        return self.backend.total(store, category, transaction_type, start_date, end_date)
+
+
+# Function to open the backend for a storage mode, shared between processes when it keeps a JSON file; with keep_totals
+# every save also writes the running totals beside the file
+def open_shared_backend(mode, filename=None, keep_totals=False):
+    backend = SharedBackend(mode, filename) if mode in SHARED_MODES else storage.open_backend(mode, filename)
+    backend.keep_totals = keep_totals
+    return backend
+
+
+# Function to open a shared backend for a file, picking the storage mode from its extension
+def shared_backend_for_file(filename, keep_totals=False):
+    return open_shared_backend(storage.mode_for_file(filename), filename, keep_totals)
@@ -0,0 +1,48 @@
+from datetime import date, datetime
+from functools import lru_cache
+
+DATE_CACHE_SIZE = 65536  # Distinct date strings remembered by parse_date
+SEPARATORS = {"%Y|%m|%d": "|", "%Y-%m-%d": "-"}  # Formats handled by the fixed-width parser
+
+
+# Function to parse a YYYY|MM|DD (or YYYY-MM-DD) string into a date, returning None if it is invalid
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_date(date_str, separator="|"):
+    if len(date_str) == 10 and date_str[4] == separator and date_str[7] == separator and date_str.isascii():
+        year, month, day = date_str[:4], date_str[5:7], date_str[8:]
+        if not (year.isdigit() and month.isdigit() and day.isdigit()):
+            return None
+        try:
+            return date(int(year), int(month), int(day))
+        except ValueError:
+            return None
+    # Shorter forms such as 2024|3|5, and digits outside ASCII, are rare; leave them to strptime which accepts them
+    try:
+        return datetime.strptime(date_str, f"%Y{separator}%m{separator}%d").date()
+    except ValueError:
+        return None
+
+
+# Function to check a single date string
+def is_valid_date(date_str, separator="|"):
+    return parse_date(date_str, separator) is not None
+
+
+# Function to validate a whole column of date strings, parsing each distinct value only once
+def validate_dates(column, separator="|"):
+    results = {date_str: parse_date(date_str, separator) is not None for date_str in set(column)}
+    return [results[date_str] for date_str in column]
+
+
+# Function to turn a date string into an integer sort key; invalid dates sort first
+def date_key(date_str, separator="|"):
+    parsed = parse_date(date_str, separator) if date_str else None
+    return parsed.toordinal() if parsed else 0
+
+
+# Function to format a date string in the canonical zero-padded form, leaving invalid strings unchanged
+def normalize_date(date_str, separator="|"):
+    parsed = parse_date(date_str, separator)
+    if parsed is None:
+        return date_str
+    return f"{parsed.year:04d}{separator}{parsed.month:02d}{separator}{parsed.day:02d}"
@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from . import storage
+from .transaction_store import TransactionStore, format_day
+
+EXPORT_FORMATS = ("csv", "jsonl", "list")
+SUFFIX_FORMATS = {".csv": "csv", ".txt": "csv", ".jsonl": "jsonl"}  # A list export is a .json file, so it is asked for by name
+EXPORT_CHUNK_LINES = 4096  # Encoded lines joined into one write
+EXPORT_WRITE_BUFFER = 1024 * 1024  # Bytes buffered by the file before they reach the disk
+BULK_SEPARATOR = "|"  # Date separator read_bulk_transactions_from_file accepts
+LIST_SEPARATOR = "-"  # Date separator of the CourseWork1 list schema
+
+
+# Function to give the live rows matching every filter given; dates are inclusive and rows with odd dates never
+# match a range, the same rules as StorageBackend.total. Without a type or date filter the store's own rows are
+# returned, so a caller skipping to a page (islice) does not step through the skipped rows in Python.
+def select_rows(store, category=None, start_date=None, end_date=None, transaction_type=None):
+    if category is not None and category not in store:
+        return iter(())
+    type_id = store.type_lookup.get(transaction_type)
+    if transaction_type is not None and type_id is None:
+        return iter(())
+    start_day = store.encode_date(start_date) if start_date else None
+    end_day = store.encode_date(end_date) if end_date else None
+    if start_date and not start_day or end_date and not end_day:
+        raise ValueError(f"Invalid date {start_date if start_date and not start_day else end_date!r}")
+    rows = store.rows_for(category) if category is not None else store.rows()
+    if type_id is None and start_day is None and end_day is None:
+        return iter(rows)
+    return filter_rows(store, rows, type_id, start_day, end_day)
+
+
+# Function to yield the rows of a type and date range
+def filter_rows(store, rows, type_id, start_day, end_day):
+    days, type_ids = store.days, store.type_ids
+    for row in rows:
+        if type_id is not None and type_ids[row] != type_id:
+            continue
+        if start_day is not None or end_day is not None:
+            day = days[row]
+            if not day or (start_day is not None and day < start_day) or (end_day is not None and day > end_day):
+                continue
+        yield row
+
+
+# Function to give a row's date with another separator; odd dates that never parsed are passed through as they are
+def date_with(store, row, separator):
+    day = store.days[row]
+    return format_day(day, separator) if day else store.odd_dates.get(row, "")
+
+
+# Function to encode rows as bulk file lines (category,amount,YYYY|MM|DD); a category holding a comma cannot be read
+# back, so its rows are counted in skipped instead of written
+def csv_lines(store, rows, skipped):
+    amounts, category_ids, categories = store.amounts, store.category_ids, store.categories
+    for row in rows:
+        category = categories[category_ids[row]]
+        if "," in category or "\n" in category:
+            skipped[0] += 1
+            continue
+        yield f"{category},{amounts[row]!r},{date_with(store, row, BULK_SEPARATOR)}\n"
+
+
+# Function to give one transaction as the object written to JSON Lines (and returned by the HTTP API)
+def transaction_object(store, row):
+    return {"id": store.ids[row], "amount": store.amounts[row], "category": store.category(row),
+            "type": store.transaction_type(row), "date": store.date(row)}
+
+
+# Function to encode rows as JSON Lines, one object per transaction
+def jsonl_lines(store, rows, skipped):
+    for row in rows:
+        yield json.dumps(transaction_object(store, row)) + "\n"
+
+
+# Function to encode rows as the CourseWork1 list schema, [[amount, category, type, date], ...], one record at a time
+def list_lines(store, rows, skipped):
+    opening = "["
+    for row in rows:
+        yield opening + json.dumps([store.amounts[row], store.category(row), store.transaction_type(row),
+                                    date_with(store, row, LIST_SEPARATOR)])
+        opening = ", "
+    yield "[]" if opening == "[" else "]"
+
+
+ENCODERS = {"csv": csv_lines, "jsonl": jsonl_lines, "list": list_lines}
+
+
+# Function to write lines in chunks of EXPORT_CHUNK_LINES, so only one chunk is held at a time
+def write_chunks(lines, file, chunk_size=EXPORT_CHUNK_LINES):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == chunk_size:
+            file.write("".join(chunk))
+            chunk = []
+    if chunk:
+        file.write("".join(chunk))
+
+
+# Function to pick the export format from a file's extension; None if it names none
+def format_for_file(filename):
+    return SUFFIX_FORMATS.get(os.path.splitext(filename)[1].lower())
+
+
+# Function to stream the matching transactions to a file ("-" for stdout) without building the document in memory.
+# Returns (rows written, rows skipped).
+def export_transactions(store, target, export_format=None, category=None, start_date=None, end_date=None,
+                        transaction_type=None):
+    export_format = export_format or format_for_file(target) or "jsonl"
+    if export_format not in ENCODERS:
+        raise ValueError(f"Unknown export format {export_format!r}, expected one of: {', '.join(EXPORT_FORMATS)}")
+    written = [0]
+    skipped = [0]
+
+    def counted(rows):
+        for row in rows:
+            written[0] += 1
+            yield row
+
+    rows = counted(select_rows(store, category, start_date, end_date, transaction_type))
+    lines = ENCODERS[export_format](store, rows, skipped)
+    if target == "-":
+        write_chunks(lines, sys.stdout)
+    else:
+        temp_filename = target + ".tmp"
+        try:
+            with open(temp_filename, "w", buffering=EXPORT_WRITE_BUFFER) as file:
+                write_chunks(lines, file)
+        except BaseException:
+            os.remove(temp_filename)
+            raise
+        os.replace(temp_filename, target)  # A failed export leaves any earlier file whole
+    return written[0] - skipped[0], skipped[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream transactions to CSV (readable by the bulk import), "
+                                                 "JSON Lines or the CourseWork1 list schema.")
+    parser.add_argument("source", help="a .json, .bin or .db transactions file")
+    parser.add_argument("target", help="file to write, or - for stdout")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, help="default: from the target's extension, else jsonl")
+    parser.add_argument("--category")
+    parser.add_argument("--type", dest="transaction_type", type=str.title, help="Income or Expense, in any case")
+    parser.add_argument("--from", dest="start_date", help="first date to include, written like the source's dates")
+    parser.add_argument("--to", dest="end_date", help="last date to include")
+    args = parser.parse_args(argv)
+
+    source = storage.backend_for_file(args.source)
+    store = TransactionStore()
+    try:
+        if not source.load(store):
+            print(f"Error: {args.source} not found!", file=sys.stderr)
+            return
+        written, skipped = export_transactions(store, args.target, args.format, args.category, args.start_date,
+                                               args.end_date, args.transaction_type)
+        if args.target != "-":
+            print(f"Wrote {written} transaction(s) to {args.target}.")
+        if skipped:
+            print(f"Skipped {skipped} transaction(s) whose category has a comma.", file=sys.stderr)
+    except (ValueError, KeyError, sqlite3.Error) as e:
+        print(f"Error: could not export the file: {e}", file=sys.stderr)
+    finally:
+        source.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+import atexit
+import json
+import os
+import sys
+import time
+
+ENABLED = os.environ.get("FINANCE_INSTRUMENT") == "1"  # Time and count the hot paths
+OUTPUT_FILE = os.environ.get("FINANCE_INSTRUMENT_OUTPUT")  # Write the report here as JSON instead of printing it
+PROFILE_MODES = {mode.strip() for mode in os.environ.get("FINANCE_PROFILE", "").split(",") if mode.strip()}
+PROFILE_FILE = os.environ.get("FINANCE_PROFILE_FILE", "finance.prof")  # cProfile stats, readable with pstats
+PROFILE_TOP = 15  # Entries printed from the profile and the memory snapshot
+# Upper bounds of the latency histogram buckets in milliseconds; anything slower lands in the last, open bucket
+BUCKET_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+timings = {}  # Operation -> {"count", "total", "min", "max", "buckets"}
+counters = {}  # Counter name -> running total
+
+
+# Function to add one measured call to an operation's statistics
+def record(name, seconds):
+    stats = timings.get(name)
+    if stats is None:
+        stats = timings[name] = {"count": 0, "total": 0.0, "min": seconds, "max": seconds,
+                                 "buckets": [0] * (len(BUCKET_BOUNDS_MS) + 1)}
+    stats["count"] += 1
+    stats["total"] += seconds
+    stats["min"] = min(stats["min"], seconds)
+    stats["max"] = max(stats["max"], seconds)
+    stats["buckets"][bisect_left(BUCKET_BOUNDS_MS, seconds * 1000)] += 1
+
+
+# Decorator timing every call of a function; when instrumentation is off the function is returned untouched
+def timed(name):
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def _timer(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+# Function to time a block: with instrumentation.timer("name"): ...
+def timer(name):
+    return _timer(name) if ENABLED else nullcontext()
+
+
+# Function to add to a counter, e.g. rows read by an import
+def count(name, amount=1):
+    if ENABLED:
+        counters[name] = counters.get(name, 0) + amount
+
+
+def snapshot():
+    # Timings and counters gathered so far, in a JSON-friendly shape
+    operations = {}
+    for name, stats in timings.items():
+        labels = [f"<={bound}ms" for bound in BUCKET_BOUNDS_MS] + [f">{BUCKET_BOUNDS_MS[-1]}ms"]
+        operations[name] = {"count": stats["count"], "total_ms": stats["total"] * 1000,
+                            "mean_ms": stats["total"] * 1000 / stats["count"],
+                            "min_ms": stats["min"] * 1000, "max_ms": stats["max"] * 1000,
+                            "histogram": {label: n for label, n in zip(labels, stats["buckets"]) if n}}
+    return {"operations": operations, "counters": dict(counters)}
+
+
+def report(file=None):
+    # Print a per-operation latency table with its histogram, then the counters
+    file = file or sys.stderr
+    data = snapshot()
+    print("Instrumentation report:", file=file)
+    for name, stats in sorted(data["operations"].items()):
+        print(f"  {name}: {stats['count']} call(s), mean {stats['mean_ms']:.2f} ms, "
+              f"min {stats['min_ms']:.2f} ms, max {stats['max_ms']:.2f} ms", file=file)
+        for label, n in stats["histogram"].items():
+            print(f"    {label:>10} {n:6d} {'#' * min(n, 50)}", file=file)
+    for name, total in sorted(data["counters"].items()):
+        print(f"  {name}: {total}", file=file)
+
+
+def dump(filename):
+    with open(filename, "w") as file:
+        json.dump(snapshot(), file, indent=2)
+
+
+def reset():
+    timings.clear()
+    counters.clear()
+
+
+# Function to start a measured session; called once by each entry point before its main loop
+def start_session():
+    if ENABLED:
+        atexit.register(finish_report)
+    if "cprofile" in PROFILE_MODES:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        atexit.register(finish_profile, profiler)
+    if "tracemalloc" in PROFILE_MODES:
+        import tracemalloc
+        tracemalloc.start(25)
+        atexit.register(finish_tracemalloc)
+
+
+def finish_report():
+    if OUTPUT_FILE:
+        dump(OUTPUT_FILE)
+        print(f"Instrumentation report written to {OUTPUT_FILE}.", file=sys.stderr)
+    else:
+        report()
+
+
+def finish_profile(profiler):
+    import pstats
+    profiler.disable()
+    profiler.dump_stats(PROFILE_FILE)
+    print(f"Profile written to {PROFILE_FILE}; slowest calls by cumulative time:", file=sys.stderr)
+    pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(PROFILE_TOP)
+
+
+def finish_tracemalloc():
+    import tracemalloc
+    current, peak = tracemalloc.get_traced_memory()
+    statistics = tracemalloc.take_snapshot().statistics("lineno")
+    tracemalloc.stop()
+    print(f"Memory: {current / 1024:.0f} KiB still allocated, peak {peak / 1024:.0f} KiB; largest allocations:",
+          file=sys.stderr)
+    for stat in statistics[:PROFILE_TOP]:
+        print(f"  {stat}", file=sys.stderr)
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+from . import schema
+
+SNAPSHOT_FILE = "transactions.json"  # Full snapshot of the transactions
+JOURNAL_FILE = "transactions.journal"  # Append-only log of changes made since the snapshot
+# The journal is folded into the snapshot once it holds COMPACT_THRESHOLD records and COMPACT_RATIO records for every
+# row of the snapshot. Replaying a record costs about a third of loading a snapshot row, while rewriting the snapshot
+# costs about twice that per row on every save, so a journal as long as the snapshot makes a load about a third slower
+# and keeps each save an append; below COMPACT_THRESHOLD records the replay takes a few milliseconds at most.
+COMPACT_THRESHOLD = int(os.environ.get("FINANCE_JOURNAL_RECORDS", "10000"))
+COMPACT_RATIO = float(os.environ.get("FINANCE_JOURNAL_RATIO", "1.0"))
+
+
+# Function to compute the digest that ties a journal to the snapshot it was written against
+def snapshot_digest(raw_bytes):
+    return hashlib.sha1(raw_bytes).hexdigest()
+
+
+# Function to apply a single journal record to a TransactionStore. Updates and deletes find their transaction by id;
+# journals written before they carried one find it by its position within the category instead
+def apply_record(transactions, record):
+    op = record["op"]
+    if op == "add":
+        transactions.add(record["category"], record["amount"], record["date"], record.get("type", "Expense"),
+                         record.get("id"))
+        return
+    if "id" in record:
+        row = transactions.row_of(record["id"])
+    else:
+        row = transactions.row_at(record["category"], record["index"])
+    if op == "update":
+        transactions.update(row, amount=record["amount"], date_str=record["date"],
+                            category=record.get("category") if "id" in record else None,
+                            transaction_type=record.get("type"))
+    elif op == "delete":
+        transactions.delete(row)
+    else:
+        raise ValueError(f"Unknown journal operation: {op}")
+
+
+# Function to write a file so that a crash leaves either the old or the new contents, never a mix
+def write_atomic(filename, raw_bytes):
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, "wb") as file:
+        file.write(raw_bytes)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_filename, filename)
+
+
+class Journal:
+    def __init__(self, snapshot_file=SNAPSHOT_FILE, journal_file=JOURNAL_FILE, compact_threshold=COMPACT_THRESHOLD,
+                 compact_ratio=COMPACT_RATIO):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file
+        self.compact_threshold = compact_threshold
+        self.compact_ratio = compact_ratio
+        self.snapshot_rows = 0  # Transactions in the snapshot the journal belongs to
+        self.digest = snapshot_digest(b"")  # Digest of the snapshot the journal belongs to
+        self.record_count = 0  # Records already on disk in the journal
+        self.valid_size = 0  # Bytes of the journal that hold complete records
+        self.pending = []  # Records not yet written to disk
+        self.snapshot_needed = False  # Set when a full snapshot is cheaper than appending
+        self.file_version = None  # Schema version of the snapshot last read or written
+        self.revision = 0  # Revision in the snapshot's header, counting its rewrites
+        self.separator = None  # Date separator of the records, kept in the journal's header for want of a snapshot
+        self.bytes_written = 0  # Bytes of snapshots and records written so far
+
+    def load(self):
+        # Read the snapshot (None if there is none yet) and the journal records written against it
+        try:
+            with open(self.snapshot_file, "rb") as file:
+                raw = file.read()
+            data = json.loads(raw)
+        except FileNotFoundError:
+            raw = b""
+            data = None
+        self.digest = snapshot_digest(raw)
+        self.pending = []
+        self.snapshot_needed = False
+        return data, self.read_records()
+
+    def read_records(self):
+        self.record_count = 0
+        self.valid_size = 0
+        self.separator = None
+        records = []
+        try:
+            with open(self.journal_file, "rb") as file:
+                header = file.readline()
+                try:
+                    header = json.loads(header) if header.endswith(b"\n") else {}
+                except ValueError:
+                    header = {}
+                base = header.get("base")
+                if base != self.digest:
+                    # Journal from before the last compaction, its changes are already in the snapshot
+                    return records
+                self.separator = header.get("separator")
+                offset = file.tell()
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        break  # Torn write from a crash, ignore the partial record
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        print("Warning: journal is damaged, ignoring records after the damaged entry.")
+                        break
+                    offset += len(line)
+                self.valid_size = offset
+        except FileNotFoundError:
+            pass
+        self.record_count = len(records)
+        return records
+
+    def replay(self, transactions):
+        # Load snapshot plus journal into the given store; returns False if neither exists
+        data, records = self.load()
+        self.file_version = None
+        self.revision = 0
+        if data is not None:
+            self.file_version, _ = schema.load_document(transactions, data)
+            self.revision = schema.document_revision(data)
+        elif self.separator:
+            transactions.separator = transactions.file_separator = self.separator  # Records of a first save
+        self.snapshot_rows = len(transactions)
+        for record in records:
+            apply_record(transactions, record)
+        return data is not None or bool(records)
+
+    def record(self, record):
+        # Queue a change; once the journal would pass the threshold, a snapshot is written instead
+        if self.snapshot_needed:
+            return
+        self.pending.append(record)
+        if self.record_count + len(self.pending) >= self.compact_limit():
+            self.pending = []
+            self.snapshot_needed = True
+
+    def compact_limit(self):
+        # Records the journal may hold before the next save writes a snapshot instead
+        return max(self.compact_threshold, int(self.compact_ratio * self.snapshot_rows))
+
+    def save(self, transactions):
+        if self.snapshot_needed:
+            self.compact(transactions)
+        elif self.pending:
+            self.separator = transactions.file_separator
+            self.append(self.pending)
+            self.pending = []
+
+    def append(self, records):
+        payload = b"".join(json.dumps(record).encode() + b"\n" for record in records)
+        if self.valid_size == 0:
+            header = json.dumps({"base": self.digest, "separator": self.separator}).encode() + b"\n"
+            with open(self.journal_file, "wb") as file:
+                file.write(header + payload)
+                file.flush()
+                os.fsync(file.fileno())
+            self.valid_size = len(header) + len(payload)
+            self.bytes_written += len(header)
+        else:
+            with open(self.journal_file, "r+b") as file:
+                file.seek(self.valid_size)
+                file.truncate()  # Drop any partial record left behind by a crash
+                file.write(payload)
+                file.flush()
+                os.fsync(file.fileno())
+            self.valid_size += len(payload)
+        self.bytes_written += len(payload)
+        self.record_count += len(records)
+
+    def compact(self, transactions):
+        # Fold everything into a new snapshot; the old journal no longer matches its digest
+        raw = "".join(schema.document_chunks(transactions, self.revision + 1)).encode()
+        write_atomic(self.snapshot_file, raw)
+        self.bytes_written += len(raw)
+        self.file_version = schema.SCHEMA_VERSION
+        self.revision += 1
+        self.digest = snapshot_digest(raw)
+        self.snapshot_rows = len(transactions)
+        try:
+            os.remove(self.journal_file)
+        except FileNotFoundError:
+            pass
+        self.record_count = 0
+        self.valid_size = 0
+        self.pending = []
+        self.snapshot_needed = False
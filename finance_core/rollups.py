@@ -0,0 +1,161 @@
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+import math
+
+GRANULARITIES = ("day", "month", "year")
+DIMENSIONS = ("category", "type")  # Per category for CourseWork2/3, income against expense for CourseWork1
+
+
+# Function to give the day, month and year bucket keys of a day number
+def period_keys(day):
+    d = date.fromordinal(day)
+    return day, d.year * 12 + d.month - 1, d.year
+
+
+# Function to turn a bucket key back into the label shown in a report, e.g. 2024|03 for a month
+def period_label(granularity, key, separator="|"):
+    if granularity == "day":
+        d = date.fromordinal(key)
+        return f"{d.year:04d}{separator}{d.month:02d}{separator}{d.day:02d}"
+    if granularity == "month":
+        return f"{key // 12:04d}{separator}{key % 12 + 1:02d}"
+    return f"{key:04d}"
+
+
+class Rollups:
+    # Daily, monthly and yearly totals per category and per type, kept up to date from the store's change
+    # notifications, so a period report reads the buckets instead of every transaction.
+    # Rows whose date could not be parsed are kept in an undated bucket.
+    def __init__(self, store):
+        self.store = store
+        self.dirty = True  # Built on the first report, then followed change by change
+        self.day_keys = {}  # Day number -> (day, month, year) keys, so each distinct day is split up only once
+        store.subscribe(self.on_change)
+
+    def close(self):
+        self.store.unsubscribe(self.on_change)
+
+    def build(self):
+        store = self.store
+        # Buckets: dimension -> granularity -> period key -> {name: [total, count]}
+        self.buckets = {dimension: {granularity: {} for granularity in GRANULARITIES} for dimension in DIMENSIONS}
+        self.periods = {granularity: [] for granularity in GRANULARITIES}  # Sorted keys of the periods with rows
+        self.undated = {dimension: {} for dimension in DIMENSIONS}
+        # Sum the rows per (category, type, day) first; the months and years are then rolled up from those few sums
+        sums = {}
+        amounts, days, category_ids, type_ids = store.amounts, store.days, store.category_ids, store.type_ids
+        for row in store.rows():
+            key = (category_ids[row], type_ids[row], days[row])
+            total = sums.get(key)
+            if total is None:
+                sums[key] = [amounts[row], 1]
+            else:
+                total[0] += amounts[row]
+                total[1] += 1
+        for (category_id, type_id, day), (amount, count) in sums.items():
+            self.add_amount(store.categories[category_id], store.type_names[type_id], day, amount, count)
+        self.dirty = False
+
+    def add_amount(self, category, transaction_type, day, amount, count):
+        # Add (or with a negative count, take away) amount to every bucket the day falls in
+        for dimension, name in (("category", category), ("type", transaction_type)):
+            if not day:
+                self.add_to_bucket(self.undated[dimension], name, amount, count)
+                continue
+            keys = self.day_keys.get(day)
+            if keys is None:
+                keys = self.day_keys[day] = period_keys(day)
+            for granularity, key in zip(GRANULARITIES, keys):
+                buckets = self.buckets[dimension][granularity]
+                bucket = buckets.get(key)
+                if bucket is None:
+                    bucket = buckets[key] = {}
+                    if dimension == "category":  # Both dimensions cover the same periods; track them once
+                        insort(self.periods[granularity], key)
+                self.add_to_bucket(bucket, name, amount, count)
+                if not bucket:
+                    del buckets[key]
+                    if dimension == "category":
+                        periods = self.periods[granularity]
+                        periods.pop(bisect_left(periods, key))
+
+    @staticmethod
+    def add_to_bucket(bucket, name, amount, count):
+        total = bucket.get(name)
+        if total is None:
+            bucket[name] = [amount, count]
+            return
+        total[0] += amount
+        total[1] += count
+        if not total[1]:
+            del bucket[name]  # The last row left; dropping it also drops the float left over from the subtractions
+
+    def on_change(self, event, row, old):
+        # Moves the changed row's amount between buckets; a compaction moves rows but not their dates, so it changes nothing
+        if self.dirty:
+            return
+        store = self.store
+        if event in ("update", "delete"):
+            self.add_amount(old[1], old[2], store.encode_date(old[3]), -old[0], -1)
+        if event in ("add", "update"):
+            self.add_amount(store.category(row), store.transaction_type(row), store.days[row], store.amounts[row], 1)
+        elif event == "add_many":
+            category, transaction_type = store.category(row), store.transaction_type(row)  # One category and type per batch
+            for day, amount in zip(store.days[row:], store.amounts[row:]):
+                self.add_amount(category, transaction_type, day, amount, 1)
+        elif event not in ("delete", "compact"):
+            self.dirty = True
+
+    # Reports
+    def report(self, granularity="month", by="category", start_date=None, end_date=None):
+        # [(period label, {name: total}), ...] in date order for the periods between the dates (inclusive)
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity {granularity!r}, expected one of: {', '.join(GRANULARITIES)}")
+        if by not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension {by!r}, expected one of: {', '.join(DIMENSIONS)}")
+        if self.dirty:
+            self.build()
+        periods = self.periods[granularity]
+        low = bisect_left(periods, self.period_key(granularity, start_date)) if start_date else 0
+        high = bisect_right(periods, self.period_key(granularity, end_date)) if end_date else len(periods)
+        buckets = self.buckets[by][granularity]
+        separator = self.store.separator
+        report = []
+        for key in periods[low:high]:
+            bucket = buckets.get(key)
+            if bucket:
+                report.append((period_label(granularity, key, separator),
+                               {name: total for name, (total, count) in bucket.items()}))
+        return report
+
+    def undated_totals(self, by="category"):
+        if self.dirty:
+            self.build()
+        return {name: total for name, (total, count) in self.undated[by].items()}
+
+    def period_key(self, granularity, date_str):
+        day = self.store.encode_date(date_str)
+        if not day:
+            raise ValueError(f"Invalid date {date_str!r}")
+        return period_keys(day)[GRANULARITIES.index(granularity)]
+
+    def verify(self):
+        # Compare the buckets with a fresh build; returns the mismatches, like TransactionStore.verify_totals
+        if self.dirty:
+            return []
+        expected = self.buckets
+        self.build()
+        mismatches = []
+        for dimension in DIMENSIONS:
+            for granularity in GRANULARITIES:
+                actual = self.buckets[dimension][granularity]
+                for key in set(actual) | set(expected[dimension][granularity]):
+                    kept = expected[dimension][granularity].get(key, {})
+                    fresh = actual.get(key, {})
+                    for name in set(kept) | set(fresh):
+                        kept_total = kept.get(name, [0.0, 0])[0]
+                        fresh_total = fresh.get(name, [0.0, 0])[0]
+                        if not math.isclose(kept_total, fresh_total, rel_tol=1e-9, abs_tol=1e-6):
+                            label = period_label(granularity, key, self.store.separator)
+                            mismatches.append(f"{label} {name}: kept {kept_total:.2f}, recomputed {fresh_total:.2f}")
+        return mismatches
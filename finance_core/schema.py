@@ -0,0 +1,411 @@
+#   Layout of a version 2 transactions file: a small header object wrapping the data of either schema
+#   {"format": "finance-tracker", "version": 2, "schema": "categories", "revision": 7, "next_id": 42,
+#    "transactions": {...}}
+#   revision    counts the saves of the file, so a process can tell another one saved since it read the file
+#   next_id     id the next new transaction gets, so the id of a deleted transaction is never given out again
+#   list        CourseWork1: [[amount, category, type, "YYYY-MM-DD", id], ...]
+#   categories  CourseWork2/3: {category: [{"id": ..., "amount": ..., "date": "YYYY|MM|DD"}, ...]}, with "type" on
+#               non-expenses
+#   Transaction ids were added to version 2 later; files without them are read with ids numbered from 1 in file order.
+#   Version 1 files are the bare list or dict with no header; they are still read, and upgraded when loaded.
+#   A version 2 file keeps its schema whichever coursework saves it; each shows the dates with its own separator.
+import argparse
+import heapq
+import json
+import os
+import sys
+import tempfile
+from . import date_codec
+
+FORMAT_NAME = "finance-tracker"
+SCHEMA_VERSION = 2
+LIST_SCHEMA = "list"
+CATEGORY_SCHEMA = "categories"
+SCHEMA_SEPARATORS = {LIST_SCHEMA: "-", CATEGORY_SCHEMA: "|"}  # Date separator each schema is written with
+MIGRATE_READ_CHUNK = 1024 * 1024  # Characters read at a time by the streaming reader
+MIGRATE_RUN_SIZE = 50000  # Records sorted in memory at a time when a list is grouped into categories
+
+
+# Function to name the schema a store is written in, from its date separator
+def schema_for_separator(separator):
+    return LIST_SCHEMA if separator == SCHEMA_SEPARATORS[LIST_SCHEMA] else CATEGORY_SCHEMA
+
+
+# Function to split a decoded file into (version, schema, body), raising ValueError for files this version cannot read
+def read_document(data):
+    if isinstance(data, list):
+        return 1, LIST_SCHEMA, data
+    if not isinstance(data, dict):
+        raise ValueError("not a transactions file")
+    if data.get("format") != FORMAT_NAME:
+        return 1, CATEGORY_SCHEMA, data
+    return check_header(data), data["schema"], data["transactions"]
+
+
+# Function to check the version and schema named in a header; returns the version
+def check_header(header):
+    version = header.get("version")
+    if not isinstance(version, int) or version > SCHEMA_VERSION:
+        raise ValueError(f"the file is version {version}; this program reads up to version {SCHEMA_VERSION}")
+    if header.get("schema") not in SCHEMA_SEPARATORS:
+        raise ValueError(f"unknown schema {header.get('schema')!r}")
+    return version
+
+
+# Function to give the revision of a decoded file; files without a header count as revision 0
+def document_revision(data):
+    if isinstance(data, dict) and data.get("format") == FORMAT_NAME:
+        return data.get("revision", 0)
+    return 0
+
+
+# Function to fill a store from a decoded file of any version; the store takes the file's date separator.
+# Returns the file's (version, schema).
+def load_document(store, data):
+    version, schema, body = read_document(data)
+    store.separator = store.file_separator = SCHEMA_SEPARATORS[schema]
+    if schema == LIST_SCHEMA:
+        store.load_list(body)
+    else:
+        store.load_dict(body)
+    if version > 1:
+        store.next_id = max(store.next_id, data.get("next_id", 1))
+    return version, schema
+
+
+# Function to encode a store as a version 2 file, piece by piece so a writer never holds the whole document
+def document_chunks(store, revision=0):
+    schema = schema_for_separator(store.file_separator)
+    yield json.dumps({"format": FORMAT_NAME, "version": SCHEMA_VERSION, "schema": schema,
+                      "revision": revision, "next_id": store.next_id})[:-1] + ', "transactions": '
+    ids = store.ids
+    if schema == LIST_SCHEMA:
+        records = ([store.amounts[row], store.category(row), store.transaction_type(row), store.file_date(row),
+                    ids[row]] for row in store.rows())
+        yield from list_body(records)
+    else:
+        opening = "{"
+        for category, rows in zip(store.categories, store.category_rows()):
+            yield opening + json.dumps(category) + ": ["
+            separator = ""
+            for row in rows:
+                yield separator + category_entry(store.amounts[row], store.transaction_type(row),
+                                                 store.file_date(row), ids[row])
+                separator = ", "
+            yield "]"
+            opening = ", "
+        yield "{}" if opening == "{" else "}"
+    yield "}"
+
+
+# Function to encode [amount, category, type, date, id] records as the list schema; an id of None is left out
+def list_body(records):
+    opening = "["
+    for record in records:
+        yield opening + json.dumps(record if record[4] is not None else record[:4])
+        opening = ", "
+    yield "[]" if opening == "[" else "]"
+
+
+# Function to encode one transaction of the categories schema; the type is only written when it is not an expense
+def category_entry(amount, transaction_type, date_str, transaction_id=None):
+    entry = {"amount": amount, "date": date_str} if transaction_id is None else {
+        "id": transaction_id, "amount": amount, "date": date_str}
+    if transaction_type != "Expense":
+        entry["type"] = transaction_type
+    return json.dumps(entry)
+
+
+# Function to encode records already grouped by category as the categories schema
+def category_body(records):
+    current = None
+    for amount, category, transaction_type, date_str, transaction_id in records:
+        if category == current:
+            yield ", " + category_entry(amount, transaction_type, date_str, transaction_id)
+            continue
+        yield ("], " if current is not None else "{") + json.dumps(category) + ": [" + category_entry(
+            amount, transaction_type, date_str, transaction_id)
+        current = category
+    yield "{}" if current is None else "]}"
+
+
+# Function to show a loaded store's dates in the program's own schema, and to rewrite a file older than the current
+# version in that schema. A current file is left as it is: saves keep its schema, so CourseWork1 and CourseWork2/3
+# sharing one file do not convert it back and forth. Returns a message saying what changed, or None.
+def upgrade(store, backend, target_schema):
+    separator = SCHEMA_SEPARATORS[target_schema]
+    store.separator = separator  # Dates are kept as day numbers, so only how they are shown changes
+    version = backend.file_version
+    if version is None or version >= SCHEMA_VERSION:
+        return None
+    old_schema = schema_for_separator(store.file_separator)
+    store.file_separator = separator
+    backend.save_all(store)
+    old = f"the {old_schema} schema" + (f" (version {version})" if version is not None else "")
+    return f"Upgraded {backend.filename} from {old} to the {target_schema} schema (version {SCHEMA_VERSION})."
+
+
+class JsonStreamReader:
+    # Reads one JSON value after another from a file without loading the whole file: the text is read in chunks and
+    # each value is decoded with raw_decode as soon as it is complete
+    def __init__(self, file, chunk_size=MIGRATE_READ_CHUNK):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+        self.mark = None  # Position the reader may go back to; the text after it is kept when the buffer is refilled
+        self.header = {}  # Header of a version 2 file once read_header has read it
+        self.at_end = False
+
+    def fill(self):
+        more = self.file.read(self.chunk_size)
+        if not more:
+            self.at_end = True
+        keep = self.position if self.mark is None else self.mark
+        self.buffer = self.buffer[keep:] + more
+        self.position -= keep
+        if self.mark is not None:
+            self.mark = 0
+
+    def peek(self):
+        # Next character that is not whitespace, without consuming it; "" at the end of the file
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in " \t\r\n":
+                self.position += 1
+            if self.position < len(self.buffer) or self.at_end:
+                return self.buffer[self.position:self.position + 1]
+            self.fill()
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"expected {char!r} but found {found or 'the end of the file'!r}")
+        self.position += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self.at_end:
+                    raise
+                self.fill()
+                continue
+            if end == len(self.buffer) and not self.at_end:
+                self.fill()  # A number at the end of the buffer may go on in the next chunk
+                continue
+            self.position = end
+            return value
+
+    def items(self, closing):
+        # Yield once per item of the array or object just opened, leaving the reader on the item
+        if self.peek() == closing:
+            self.position += 1
+            return
+        while True:
+            yield
+            separator = self.peek()
+            self.position += 1
+            if separator == closing:
+                return
+            if separator != ",":
+                raise ValueError(f"expected ',' or {closing!r} but found {separator or 'the end of the file'!r}")
+
+
+# Function to read the header of a file as a stream; returns (version, schema) and leaves the reader at the body
+def read_header(reader):
+    if reader.peek() == "[":
+        return 1, LIST_SCHEMA
+    # A version 1 dict starts straight with a category; look at the first key, then go back if it is not the header
+    reader.mark = reader.position
+    reader.expect("{")
+    is_header = False
+    if reader.peek() == '"' and reader.value() == "format":
+        reader.expect(":")
+        if reader.peek() == '"':  # A category called "format" would hold a list instead
+            if reader.value() != FORMAT_NAME:
+                raise ValueError("not a transactions file")
+            is_header = True
+    if not is_header:
+        reader.position = reader.mark
+        reader.mark = None
+        return 1, CATEGORY_SCHEMA
+    reader.mark = None
+    header = {"format": FORMAT_NAME}
+    while True:
+        reader.expect(",")
+        key = reader.value()
+        reader.expect(":")
+        if key == "transactions":
+            reader.header = header
+            return check_header(header), header.get("schema")
+        header[key] = reader.value()
+
+
+# Function to read only the header of a file; {} for a version 1 file, None if there is no file
+def read_file_header(filename):
+    try:
+        with open(filename, "r") as file:
+            reader = JsonStreamReader(file, 4096)
+            read_header(reader)
+    except FileNotFoundError:
+        return None
+    return reader.header
+
+
+# Function to stream the (amount, category, type, date, id) records of a file's body; the id is None in older files
+def read_records(reader, schema):
+    if schema == LIST_SCHEMA:
+        reader.expect("[")
+        for _ in reader.items("]"):
+            record = reader.value()
+            amount, category, transaction_type, date_str = record[:4]
+            yield amount, category, transaction_type, date_str, (record[4] if len(record) > 4 else None)
+        return
+    reader.expect("{")
+    for _ in reader.items("}"):
+        category = reader.value()
+        reader.expect(":")
+        reader.expect("[")
+        for _ in reader.items("]"):
+            item = reader.value()
+            yield item["amount"], category, item.get("type", "Expense"), item["date"], item.get("id")
+
+
+# Function to read what follows the body of a file, checking nothing but the end of the header object is left
+def read_trailer(reader, version):
+    if version > 1:
+        while reader.peek() == ",":
+            reader.position += 1
+            reader.value()
+            reader.expect(":")
+            reader.value()
+        reader.expect("}")
+    if reader.peek():
+        raise ValueError("unexpected data after the transactions")
+
+
+# Function to rewrite the date of each record from one separator to the other; dates that never parsed stay as they are
+def convert_dates(records, source_separator, target_separator):
+    if source_separator == target_separator:
+        yield from records
+        return
+    for amount, category, transaction_type, date_str, transaction_id in records:
+        parsed = date_codec.parse_date(date_str, source_separator) if isinstance(date_str, str) else None
+        if parsed is not None:
+            date_str = f"{parsed.year:04d}{target_separator}{parsed.month:02d}{target_separator}{parsed.day:02d}"
+        yield amount, category, transaction_type, date_str, transaction_id
+
+
+# Function to group records by category, keeping first-seen category order and file order within each.
+# Runs of MIGRATE_RUN_SIZE records are sorted in memory and spilled to temporary files, then merged, so memory
+# holds one run plus the category names however long the file is.
+def group_by_category(records, run_size=MIGRATE_RUN_SIZE):
+    order = {}
+    runs = []
+    run = []
+    try:
+        for sequence, record in enumerate(records):
+            run.append((order.setdefault(record[1], len(order)), sequence, record))
+            if len(run) == run_size:
+                runs.append(spill_run(run))
+                run = []
+        run.sort(key=lambda item: item[:2])
+        if not runs:
+            for _, _, record in run:
+                yield record
+            return
+        runs.append(spill_run(run))
+        for _, _, record in heapq.merge(*(read_run(file) for file in runs)):
+            yield record
+    finally:
+        for file in runs:
+            file.close()
+
+
+def spill_run(run):
+    run.sort(key=lambda item: item[:2])
+    file = tempfile.TemporaryFile("w+")
+    for key, sequence, record in run:
+        file.write(json.dumps([key, sequence, *record]) + "\n")
+    file.seek(0)
+    return file
+
+
+def read_run(file):
+    for line in file:
+        key, sequence, *record = json.loads(line)
+        yield key, sequence, record
+
+
+# Function to convert a transactions file of any version into a version 2 file of the given schema in one pass.
+# Returns (records written, source version, source schema).
+def migrate_file(source, target, target_schema=None):
+    with open(source, "r") as file:
+        reader = JsonStreamReader(file)
+        version, source_schema = read_header(reader)
+        target_schema = target_schema or (CATEGORY_SCHEMA if source_schema == LIST_SCHEMA else LIST_SCHEMA)
+        count = [0]
+
+        def counted(records):
+            for record in records:
+                count[0] += 1
+                yield record
+
+        records = counted(convert_dates(read_records(reader, source_schema), SCHEMA_SEPARATORS[source_schema],
+                                        SCHEMA_SEPARATORS[target_schema]))
+        if target_schema == LIST_SCHEMA:
+            body = list_body(records)
+        elif source_schema == CATEGORY_SCHEMA:
+            body = category_body(records)  # Already grouped
+        else:
+            body = category_body(group_by_category(records))
+        temp_filename = target + ".tmp"
+        try:
+            with open(temp_filename, "w", buffering=MIGRATE_READ_CHUNK) as output:
+                header = {"format": FORMAT_NAME, "version": SCHEMA_VERSION, "schema": target_schema}
+                if "next_id" in reader.header:
+                    header["next_id"] = reader.header["next_id"]
+                output.write(json.dumps(header)[:-1] + ', "transactions": ')
+                output.writelines(body)
+                output.write("}")
+            read_trailer(reader, version)
+        except BaseException:
+            os.remove(temp_filename)
+            raise
+    os.replace(temp_filename, target)
+    return count[0], version, source_schema
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and convert transactions files between the CourseWork1 list "
+                                                 "schema and the CourseWork2/3 categories schema.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    info = commands.add_parser("info", help="print the version and schema of a file")
+    info.add_argument("source", nargs="?", default="transactions.json")
+    migrate = commands.add_parser("migrate", help="convert a file in one streaming pass")
+    migrate.add_argument("source")
+    migrate.add_argument("target", help="file to write; may be the source itself")
+    migrate.add_argument("--to", dest="schema", choices=tuple(SCHEMA_SEPARATORS),
+                         help="schema to write (default: the other one; give the same one to upgrade the version)")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "info":
+            with open(args.source, "r") as file:
+                version, schema = read_header(JsonStreamReader(file, 4096))
+            print(f"{args.source}: version {version}, {schema} schema")
+        else:
+            count, version, schema = migrate_file(args.source, args.target, args.schema)
+            print(f"Wrote {count} transaction(s) from {args.source} ({schema} schema, version {version}) to "
+                  f"{args.target}.")
+    except FileNotFoundError:
+        print(f"Error: {args.source} not found!", file=sys.stderr)
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"Error: could not read {args.source}: {e}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+import argparse
+from functools import partial
+import json
+import os
+import sqlite3
+from . import binary_snapshot
+from . import date_codec
+from . import journal
+from . import schema
+from .transaction_store import TRANSACTION_TYPES, TransactionStore, totals_file, write_totals
+
+JSON_FILE = "transactions.json"
+SQLITE_FILE = "transactions.db"
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    amount REAL NOT NULL,
+    category TEXT NOT NULL,
+    type TEXT NOT NULL,
+    date TEXT NOT NULL,
+    day INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_category_day ON transactions (category, day);
+CREATE INDEX IF NOT EXISTS transactions_type_day ON transactions (type, day);
+CREATE INDEX IF NOT EXISTS transactions_day ON transactions (day);
+CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+BACKENDS = {}  # Storage mode -> callable taking an optional filename and returning a backend
+SUFFIX_MODES = {".json": "json", ".bin": "binary", ".db": "sqlite"}
+
+
+class StorageBackend:
+    # Where the transactions live between runs; the default queries are answered from the store in memory
+    filename = None
+    store = None  # Store whose change notifications this backend follows, if it writes changes as they happen
+    file_version = None  # Schema version of the JSON file last loaded (see schema.py); None for other formats
+    revision = 0  # Saves of the JSON file counted in its header, as last read or written
+    bytes_written = 0  # Bytes this backend has written to disk, for reports such as autosave's
+    keep_totals = False  # Also write the running totals beside the file on every save, for the menus to check on load
+
+    def load(self, store):
+        # Fill the store; returns False if there was nothing saved yet
+        raise NotImplementedError
+
+    def save(self, store):
+        raise NotImplementedError
+
+    def save_all(self, store):
+        # Write the whole store, not only the changes this backend has seen
+        self.save(store)
+
+    def totals_file(self):
+        return totals_file(self.filename)
+
+    def write_totals(self, store):
+        # Called at the end of every save, so the totals always describe the transactions just written
+        if self.keep_totals:
+            write_totals(store, self.totals_file())
+
+    def attach(self, store):
+        if self.store is not None:
+            self.store.unsubscribe(self.on_change)
+        self.store = store
+        store.subscribe(self.on_change)
+
+    def on_change(self, event, row, old):
+        pass
+
+    def close(self):
+        if self.store is not None:
+            self.store.unsubscribe(self.on_change)
+            self.store = None
+
+    def category_totals(self, store):
+        return store.category_totals()
+
+    def type_totals(self, store):
+        return store.type_totals()
+
+    def total(self, store, category=None, transaction_type=None, start_date=None, end_date=None):
+        # Sum of the amounts matching every filter given; dates are inclusive and rows with odd dates never match a range
+        if category is not None and category not in store:
+            return 0.0
+        type_id = store.type_lookup.get(transaction_type)
+        if transaction_type is not None and type_id is None:
+            return 0.0
+        start_day = date_codec.date_key(start_date, store.separator) if start_date else None
+        end_day = date_codec.date_key(end_date, store.separator) if end_date else None
+        amounts, days, type_ids = store.amounts, store.days, store.type_ids
+        total = 0.0
+        for row in (store.rows_for(category) if category is not None else store.rows()):
+            if type_id is not None and type_ids[row] != type_id:
+                continue
+            if start_day is not None or end_day is not None:
+                day = days[row]
+                if not day or (start_day is not None and day < start_day) or (end_day is not None and day > end_day):
+                    continue
+            total += amounts[row]
+        return total
+
+
+class JsonBackend(StorageBackend):
+    # Whole-file JSON in either schema: the CourseWork1 list for "-" dates, the category dict otherwise
+    def __init__(self, filename=JSON_FILE):
+        self.filename = filename
+
+    def load(self, store):
+        journal_file = os.path.splitext(self.filename)[0] + ".journal"
+        if os.path.exists(journal_file):
+            # CourseWork2/3's journal mode keeps its latest changes beside the snapshot; they belong to this file too
+            snapshot = journal.Journal(self.filename, journal_file)
+            found = snapshot.replay(store)
+            self.file_version, self.revision = snapshot.file_version, snapshot.revision
+            return found
+        try:
+            with open(self.filename, "r") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return False
+        self.file_version, _ = schema.load_document(store, data)
+        self.revision = schema.document_revision(data)
+        return True
+
+    def save(self, store):
+        temp_filename = self.filename + ".tmp"
+        with open(temp_filename, "w") as file:
+            file.writelines(schema.document_chunks(store, self.revision + 1))
+        self.bytes_written += os.path.getsize(temp_filename)
+        os.replace(temp_filename, self.filename)
+        self.file_version = schema.SCHEMA_VERSION
+        self.revision += 1
+        self.write_totals(store)
+
+
+class BinaryBackend(StorageBackend):
+    def __init__(self, filename=binary_snapshot.SNAPSHOT_FILE):
+        self.filename = filename
+
+    def load(self, store):
+        try:
+            binary_snapshot.load_snapshot(store, self.filename)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def save(self, store):
+        binary_snapshot.write_snapshot(store, self.filename)
+        self.bytes_written += os.path.getsize(self.filename)
+        self.write_totals(store)
+
+
+class SqliteBackend(StorageBackend):
+    # One row per transaction, keyed by the store's transaction id; each change to the store becomes a single
+    # statement, committed on save
+    def __init__(self, filename=SQLITE_FILE):
+        self.filename = filename
+        self.connection = None
+        self.pending_rows = []  # Added rows not yet inserted, flushed before any other statement
+
+    def connect(self):
+        if self.connection is None:
+            # The GUI saves from a worker thread; only one thread uses the backend at a time
+            self.connection = sqlite3.connect(self.filename, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")  # WAL keeps the file consistent; only the last commits are at risk
+            self.connection.executescript(SQLITE_SCHEMA)
+        return self.connection
+
+    def load(self, store):
+        self.pending_rows = []
+        if not os.path.exists(self.filename):
+            self.attach(store)  # Nothing to read; the database is created by the first change
+            return False
+        connection = self.connect()
+        separator = connection.execute("SELECT value FROM settings WHERE name = 'separator'").fetchone()
+        if separator:
+            store.separator = store.file_separator = separator[0]
+        for row_id, amount, category, transaction_type, date_str in connection.execute(
+                "SELECT id, amount, category, type, date FROM transactions ORDER BY id"):
+            store.add(category, amount, date_str, transaction_type, transaction_id=row_id)
+        next_id = connection.execute("SELECT value FROM settings WHERE name = 'next_id'").fetchone()
+        if next_id:
+            store.next_id = max(store.next_id, int(next_id[0]))  # Ids of deleted transactions are not given out again
+        self.attach(store)
+        return True
+
+    def save(self, store):
+        if self.store is not store:
+            self.attach(store)
+            self.replace_all(store)
+        connection = self.flush()
+        connection.execute("INSERT OR REPLACE INTO settings (name, value) VALUES ('separator', ?), ('next_id', ?)",
+                           (store.file_separator, str(store.next_id)))
+        size_before = self.file_sizes()
+        connection.commit()
+        # Only growth is seen: pages written over a WAL that SQLite reuses after a checkpoint are not counted
+        self.bytes_written += max(0, self.file_sizes() - size_before)
+        self.write_totals(store)
+
+    def save_all(self, store):
+        self.attach(store)
+        self.replace_all(store)
+        self.save(store)
+
+    def close(self):
+        super().close()
+        if self.connection is not None:
+            self.connection.execute("PRAGMA optimize")  # Refresh the statistics the planner uses to pick an index
+            self.connection.close()
+            self.connection = None
+
+    def file_sizes(self):
+        # Bytes in the database and its write-ahead log
+        size = 0
+        for filename in (self.filename, self.filename + "-wal"):
+            try:
+                size += os.path.getsize(filename)
+            except OSError:
+                pass
+        return size
+
+    # Write-through of store changes
+    def flush(self):
+        # Insert the queued rows in one executemany and return the connection for the next statement
+        connection = self.connect()
+        if self.pending_rows:
+            connection.executemany(
+                "INSERT INTO transactions (id, amount, category, type, date, day) VALUES (?, ?, ?, ?, ?, ?)",
+                self.pending_rows)
+            self.pending_rows = []
+        return connection
+
+    def insert_row(self, store, row):
+        self.pending_rows.append((store.ids[row], store.amounts[row], store.category(row), store.transaction_type(row),
+                                  store.file_date(row), store.days[row]))
+
+    def replace_all(self, store):
+        self.pending_rows = []
+        self.connect().execute("DELETE FROM transactions")
+        for row in store.rows():
+            self.insert_row(store, row)
+
+    def on_change(self, event, row, old):
+        store = self.store
+        if event == "add":
+            self.insert_row(store, row)
+        elif event == "add_many":
+            for new_row in range(row, len(store.amounts)):
+                self.insert_row(store, new_row)
+        elif event == "update":
+            self.flush().execute(
+                "UPDATE transactions SET amount = ?, category = ?, type = ?, date = ?, day = ? WHERE id = ?",
+                (store.amounts[row], store.category(row), store.transaction_type(row), store.file_date(row),
+                 store.days[row], store.ids[row]))
+        elif event == "delete":
+            self.flush().execute("DELETE FROM transactions WHERE id = ?", (store.ids[row],))
+        elif event != "compact":  # Compaction moves rows but not ids, so the table is already right
+            self.replace_all(store)  # Cleared, or reloaded column by column
+
+    # Summaries as SQL aggregates over the indexed columns
+    def category_totals(self, store):
+        totals = dict.fromkeys(store.categories, 0.0)
+        totals.update(self.flush().execute("SELECT category, SUM(amount) FROM transactions GROUP BY category"))
+        return totals
+
+    def type_totals(self, store):
+        totals = dict.fromkeys(TRANSACTION_TYPES, 0.0)
+        totals.update(self.flush().execute("SELECT type, SUM(amount) FROM transactions GROUP BY type"))
+        return totals
+
+    def total(self, store, category=None, transaction_type=None, start_date=None, end_date=None):
+        conditions, parameters = [], []
+        if category is not None:
+            conditions.append("category = ?")
+            parameters.append(category)
+        if transaction_type is not None:
+            conditions.append("type = ?")
+            parameters.append(transaction_type)
+        if start_date or end_date:
+            conditions.append("day > 0")
+        if start_date:
+            conditions.append("day >= ?")
+            parameters.append(date_codec.date_key(start_date, store.separator))
+        if end_date:
+            conditions.append("day <= ?")
+            parameters.append(date_codec.date_key(end_date, store.separator))
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        total, = self.flush().execute("SELECT TOTAL(amount) FROM transactions" + where, parameters).fetchone()
+        return total
+
+
+class JournalBackend(StorageBackend):
+    # Storage backend for the JSON snapshot plus journal; with compact_on_save every save rewrites the snapshot
+    def __init__(self, filename=journal.SNAPSHOT_FILE, compact_on_save=False):
+        self.filename = filename
+        self.journal = journal.Journal(filename, os.path.splitext(filename)[0] + ".journal")
+        self.compact_on_save = compact_on_save
+
+    def load(self, store):
+        found = self.journal.replay(store)
+        self.file_version = self.journal.file_version
+        if not self.compact_on_save:
+            self.attach(store)  # Every later change to the store becomes a journal record
+        return found
+
+    def add_record(self, row):
+        store = self.store
+        record = {"op": "add", "id": store.ids[row], "category": store.category(row), "amount": store.amounts[row],
+                  "date": store.file_date(row)}
+        if store.transaction_type(row) != "Expense":
+            record["type"] = store.transaction_type(row)  # Only the batch add and CourseWork1 files have incomes
+        self.journal.record(record)
+
+    def on_change(self, event, row, old):
+        store = self.store
+        log = self.journal
+        if event == "add":
+            self.add_record(row)
+        elif event == "add_many":
+            if log.record_count + len(log.pending) + len(store.amounts) - row >= log.compact_limit():
+                log.snapshot_needed = True  # The batch alone would pass the threshold; skip building its records
+            else:
+                for new_row in range(row, len(store.amounts)):
+                    self.add_record(new_row)
+        elif event == "update":
+            record = {"op": "update", "id": store.ids[row], "amount": store.amounts[row],
+                      "date": store.file_date(row)}
+            if old[1] != store.category(row):
+                record["category"] = store.category(row)  # Left out when unchanged, as most updates leave it
+            if old[2] != store.transaction_type(row):
+                record["type"] = store.transaction_type(row)
+            log.record(record)
+        elif event == "delete":
+            log.record({"op": "delete", "id": store.ids[row]})
+        elif event != "compact":  # Records name transactions by id, so renumbered rows do not matter
+            log.snapshot_needed = True  # Not expressible as a record; the next save writes a full snapshot
+
+    def save(self, store):
+        if self.compact_on_save:
+            self.journal.compact(store)
+        else:
+            self.journal.save(store)
+        self.write_totals(store)
+
+    def save_all(self, store):
+        self.journal.compact(store)
+        self.write_totals(store)
+
+    @property
+    def bytes_written(self):
+        return self.journal.bytes_written
+
+    @property
+    def revision(self):
+        return self.journal.revision
+
+    @revision.setter
+    def revision(self, revision):
+        self.journal.revision = revision
+
+
+# Function to make another storage mode available to open_backend
+def register_backend(mode, factory):
+    BACKENDS[mode] = factory
+
+
+register_backend("json", JsonBackend)
+register_backend("binary", BinaryBackend)
+register_backend("sqlite", SqliteBackend)
+register_backend("journal", JournalBackend)
+register_backend("snapshot", partial(JournalBackend, compact_on_save=True))
+
+
+# Function to create the backend for a FINANCE_STORAGE_MODE value
+def open_backend(mode, filename=None):
+    factory = BACKENDS.get(mode)
+    if factory is None:
+        raise ValueError(f"Unknown storage mode {mode!r}, expected one of: {', '.join(BACKENDS)}")
+    return factory(filename) if filename else factory()
+
+
+# Function to pick a storage mode from a file's extension; .json files go through the journal where there is one
+def mode_for_file(filename):
+    mode = SUFFIX_MODES.get(os.path.splitext(filename)[1], "json")
+    if mode == "json" and "journal" in BACKENDS:
+        mode = "journal"
+    return mode
+
+
+# Function to pick a backend from a file's extension
+def backend_for_file(filename):
+    return open_backend(mode_for_file(filename), filename)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Copy transactions between the JSON, binary and SQLite formats.")
+    parser.add_argument("source", help="file to read, e.g. transactions.json")
+    parser.add_argument("target", help="file to write, e.g. transactions.db")
+    args = parser.parse_args(argv)
+
+    source = backend_for_file(args.source)
+    target = open_backend(SUFFIX_MODES.get(os.path.splitext(args.target)[1], "json"), args.target)
+    store = TransactionStore()
+    try:
+        if not source.load(store):
+            print(f"Error: {args.source} not found!")
+            return
+        target.save(store)
+        print(f"Wrote {len(store)} transaction(s) to {args.target}.")
+    except (ValueError, KeyError, sqlite3.Error) as e:
+        print(f"Error: could not convert the file: {e}")
+    finally:
+        source.close()
+        target.close()
+
+
+if __name__ == "__main__":
+    main()
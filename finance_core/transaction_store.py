@@ -0,0 +1,491 @@
+from array import array
+from bisect import bisect_left
+from datetime import date
+from itertools import compress
+import json
+import math
+import os
+from . import date_codec
+
+TRANSACTION_TYPES = ("Expense", "Income")  # Type codes 0 and 1; other types are interned after these
+TOTALS_SUFFIX = ".totals.json"  # Running totals are saved next to the transactions, e.g. transactions.totals.json
+VERIFY_TOTALS = os.environ.get("FINANCE_VERIFY_TOTALS") == "1"  # Check running totals against a full recompute
+DELETED = 0xFFFFFFFF  # Category id of a deleted row (a tombstone) until the next compaction drops it
+COMPACT_MIN_DELETED = 1024  # Tombstones are dropped once there are at least this many ...
+COMPACT_FRACTION = 0.25  # ... and they make up this share of the rows
+
+
+# Function to turn a day number back into a zero-padded date string
+def format_day(day, separator="|"):
+    d = date.fromordinal(day)
+    return f"{d.year:04d}{separator}{d.month:02d}{separator}{d.day:02d}"
+
+
+class CategoryView:
+    # Read-only sequence over the rows of one category, giving the {"amount", "date"} dicts the menus print
+    def __init__(self, store, rows):
+        self.store = store
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.store.entry(row) for row in self.rows[index]]
+        return self.store.entry(self.rows[index])
+
+    def __iter__(self):
+        entry = self.store.entry
+        for row in self.rows:
+            yield entry(row)
+
+
+class TransactionStore:
+    # Transactions kept in typed arrays, one slot per row, instead of a dict or list per transaction.
+    # Every transaction also has an id that never changes; row numbers only change when deleted rows are compacted away.
+    def __init__(self, separator="|"):
+        self.separator = separator  # Date separator used when formatting dates back to strings
+        self.file_separator = separator  # Date separator of the file the store was read from, which saves keep
+        self.ids = array('q')  # Transaction id of each row
+        self.next_id = 1  # Id given to the next added transaction
+        self._id_rows = None  # Transaction id -> row, only built once ids stop being row + 1
+        self.deleted = 0  # Rows deleted but not yet compacted away
+        self.amounts = array('d')  # Amount of each row
+        self.days = array('i')  # Date of each row as a day number, 0 if the date could not be parsed
+        self.category_ids = array('I')  # Interned category of each row
+        self.type_ids = array('B')  # Interned transaction type of each row
+        self.categories = []  # Category names, indexed by category id
+        self.category_lookup = {}  # Category name -> category id
+        self.type_names = list(TRANSACTION_TYPES)  # Type names, indexed by type id
+        self.type_lookup = {name: i for i, name in enumerate(self.type_names)}
+        self.odd_dates = {}  # Row -> original date string for dates that are not valid dates
+        self.category_totals_column = array('d')  # Running total of each category, kept up to date on every change
+        self.type_totals_column = array('d', bytes(8 * len(self.type_names)))  # Running total of each type
+        self._category_rows = []  # Rows of each category in insertion order, rebuilt lazily after deletes
+        self.listeners = []  # Callbacks told about every change as (event, row, old record)
+        self.version = 0  # Bumped on every change so caches can tell when they are stale
+
+    def __len__(self):
+        return len(self.amounts) - self.deleted
+
+    def __contains__(self, category):
+        return category in self.category_lookup
+
+    def __iter__(self):
+        return iter(list(self.categories))
+
+    def __getitem__(self, category):
+        return CategoryView(self, self.rows_for(category))
+
+    def keys(self):
+        return list(self.categories)
+
+    def items(self):
+        for category in list(self.categories):
+            yield category, self[category]
+
+    def values(self):
+        for category in list(self.categories):
+            yield self[category]
+
+    def intern_category(self, category):
+        category_id = self.category_lookup.get(category)
+        if category_id is None:
+            category_id = len(self.categories)
+            self.categories.append(category)
+            self.category_lookup[category] = category_id
+            self.category_totals_column.append(0.0)
+            if self._category_rows is not None:
+                self._category_rows.append(array('I'))
+        return category_id
+
+    def intern_type(self, transaction_type):
+        type_id = self.type_lookup.get(transaction_type)
+        if type_id is None:
+            type_id = len(self.type_names)
+            self.type_names.append(transaction_type)
+            self.type_lookup[transaction_type] = type_id
+            self.type_totals_column.append(0.0)
+        return type_id
+
+    def category_rows(self):
+        # Rows grouped by category id; deletes shift row numbers so the grouping is rebuilt on demand
+        if self._category_rows is None:
+            grouped = [array('I') for _ in self.categories]
+            for row, category_id in enumerate(self.category_ids):
+                if category_id != DELETED:
+                    grouped[category_id].append(row)
+            self._category_rows = grouped
+        return self._category_rows
+
+    def rows_for(self, category):
+        return self.category_rows()[self.category_lookup[category]]
+
+    def row_at(self, category, index):
+        # Row of the index-th transaction within a category (negative indexes count from the end)
+        return self.rows_for(category)[index]
+
+    def rows(self):
+        # Every live row in order, skipping deleted ones
+        if not self.deleted:
+            return range(len(self.amounts))
+        category_ids = self.category_ids
+        return compress(range(len(category_ids)), map(DELETED.__ne__, category_ids))  # Skipped without a Python loop
+
+    def nth_row(self, index):
+        # Row of the index-th live transaction, for menus that number every transaction in one list
+        if not 0 <= index < len(self):
+            raise IndexError("transaction index out of range")
+        if not self.deleted:
+            return index
+        for row in self.rows():
+            if index == 0:
+                return row
+            index -= 1
+
+    def is_live(self, row):
+        return 0 <= row < len(self.category_ids) and self.category_ids[row] != DELETED
+
+    # Lookup by transaction id
+    def transaction_id(self, row):
+        return self.ids[row]
+
+    def row_of(self, transaction_id):
+        # Row holding a transaction, in O(1); raises KeyError if there is no such transaction
+        if self._id_rows is not None:
+            return self._id_rows[transaction_id]
+        if isinstance(transaction_id, int) and self.is_live(transaction_id - 1):
+            return transaction_id - 1  # Ids are still row + 1, so no index is needed
+        raise KeyError(transaction_id)
+
+    def build_id_index(self):
+        self._id_rows = {transaction_id: row for row, transaction_id in enumerate(self.ids)
+                         if self.category_ids[row] != DELETED}
+
+    def encode_date(self, date_str):
+        parsed = date_codec.parse_date(date_str, self.separator)
+        return parsed.toordinal() if parsed else 0
+
+    def format_day(self, day):
+        return format_day(day, self.separator)
+
+    def file_date(self, row):
+        # The row's date as the file writes it, which differs from date() when a program shows the other schema's dates
+        day = self.days[row]
+        return format_day(day, self.file_separator) if day else self.odd_dates.get(row, "")
+
+    # Accessors for a single row
+    def amount(self, row):
+        return self.amounts[row]
+
+    def date(self, row):
+        day = self.days[row]
+        return self.format_day(day) if day else self.odd_dates.get(row, "")
+
+    def category(self, row):
+        return self.categories[self.category_ids[row]]
+
+    def transaction_type(self, row):
+        return self.type_names[self.type_ids[row]]
+
+    def entry(self, row):
+        return {"amount": self.amounts[row], "date": self.date(row)}
+
+    def record(self, row):
+        return [self.amounts[row], self.category(row), self.transaction_type(row), self.date(row)]
+
+    # Mutations
+    def add(self, category, amount, date_str, transaction_type="Expense", transaction_id=None):
+        # transaction_id keeps the id a transaction was saved with; otherwise the next free id is used
+        row = len(self.amounts)
+        category_id = self.intern_category(category)
+        type_id = self.intern_type(transaction_type)
+        day = self.encode_date(date_str)
+        amount = float(amount)
+        if transaction_id is None:
+            transaction_id = self.next_id
+        if self._id_rows is None and transaction_id != row + 1:
+            self.build_id_index()  # Ids no longer follow row numbers, so keep a real index from now on
+        if self._id_rows is not None:
+            if transaction_id in self._id_rows:
+                raise ValueError(f"Duplicate transaction id {transaction_id}")
+            self._id_rows[transaction_id] = row
+        self.next_id = max(self.next_id, transaction_id + 1)
+        self.ids.append(transaction_id)
+        self.amounts.append(amount)
+        self.days.append(day)
+        self.category_ids.append(category_id)
+        self.type_ids.append(type_id)
+        self.category_totals_column[category_id] += amount
+        self.type_totals_column[type_id] += amount
+        if not day:
+            self.odd_dates[row] = date_str
+        if self._category_rows is not None:
+            self._category_rows[category_id].append(row)
+        self.version += 1
+        if self.listeners:
+            self.notify("add", row)
+        return row
+
+    def add_many(self, category, amounts, dates, transaction_type="Expense"):
+        # Append a column of amounts and dates to one category in a single call: the columns are extended in bulk, the
+        # totals updated once, and listeners get one "add_many" event for the rows from the returned row to the end
+        first = len(self.amounts)
+        amounts = array('d', map(float, amounts))
+        dates = list(dates)
+        count = len(amounts)
+        if count != len(dates):
+            raise ValueError(f"{count} amount(s) but {len(dates)} date(s)")
+        if not count:
+            return first
+        category_id = self.intern_category(category)
+        type_id = self.intern_type(transaction_type)
+        day_of = {date_str: self.encode_date(date_str) for date_str in set(dates)}  # Each distinct date is parsed once
+        days = array('i', map(day_of.__getitem__, dates))
+        if 0 in day_of.values():
+            self.odd_dates.update((row, date_str) for row, date_str in enumerate(dates, first) if not day_of[date_str])
+        ids = range(self.next_id, self.next_id + count)
+        if self._id_rows is None and self.next_id != first + 1:
+            self.build_id_index()
+        if self._id_rows is not None:
+            self._id_rows.update(zip(ids, range(first, first + count)))
+        self.next_id += count
+        self.ids.extend(ids)
+        self.amounts.extend(amounts)
+        self.days.extend(days)
+        self.category_ids.extend(array('I', [category_id]) * count)
+        self.type_ids.extend(array('B', [type_id]) * count)
+        total = math.fsum(amounts)
+        self.category_totals_column[category_id] += total
+        self.type_totals_column[type_id] += total
+        if self._category_rows is not None:
+            self._category_rows[category_id].extend(range(first, first + count))
+        self.version += 1
+        if self.listeners:
+            self.notify("add_many", first)
+        return first
+
+    def update(self, row, amount=None, date_str=None, category=None, transaction_type=None):
+        if not self.is_live(row):
+            raise IndexError("transaction row out of range")
+        old = self.record(row) if self.listeners else None
+        # Take the row out of the running totals, change it, then put it back
+        old_amount = self.amounts[row]
+        self.category_totals_column[self.category_ids[row]] -= old_amount
+        self.type_totals_column[self.type_ids[row]] -= old_amount
+        if amount is not None:
+            self.amounts[row] = float(amount)
+        if date_str is not None:
+            day = self.encode_date(date_str)
+            self.days[row] = day
+            if day:
+                self.odd_dates.pop(row, None)
+            else:
+                self.odd_dates[row] = date_str
+        if transaction_type is not None:
+            self.type_ids[row] = self.intern_type(transaction_type)
+        if category is not None:
+            category_id = self.intern_category(category)
+            if category_id != self.category_ids[row]:
+                self.category_ids[row] = category_id
+                self._category_rows = None
+        new_amount = self.amounts[row]
+        self.category_totals_column[self.category_ids[row]] += new_amount
+        self.type_totals_column[self.type_ids[row]] += new_amount
+        self.version += 1
+        if self.listeners:
+            self.notify("update", row, old)
+
+    def delete(self, row):
+        # The row becomes a tombstone, so no other row moves and every id and row number stays valid
+        if not self.is_live(row):
+            raise IndexError("transaction row out of range")
+        old = self.record(row) if self.listeners else None
+        category_id = self.category_ids[row]
+        self.category_totals_column[category_id] -= self.amounts[row]
+        self.type_totals_column[self.type_ids[row]] -= self.amounts[row]
+        self.amounts[row] = 0.0  # Full scans over the amount column can then ignore tombstones
+        self.category_ids[row] = DELETED
+        self.odd_dates.pop(row, None)
+        if self._category_rows is not None:
+            rows = self._category_rows[category_id]
+            del rows[bisect_left(rows, row)]
+        if self._id_rows is not None:
+            del self._id_rows[self.ids[row]]
+        self.deleted += 1
+        self.version += 1
+        if self.listeners:
+            self.notify("delete", row, old)
+        if self.deleted >= COMPACT_MIN_DELETED and self.deleted >= COMPACT_FRACTION * len(self.amounts):
+            self.compact()
+
+    def live_columns(self):
+        # (ids, amounts, days, category_ids, type_ids, odd_dates) without the tombstones; copies only if there are any
+        if not self.deleted:
+            return self.ids, self.amounts, self.days, self.category_ids, self.type_ids, self.odd_dates
+        keep = list(self.rows())
+        new_rows = {row: i for i, row in enumerate(keep)} if self.odd_dates else {}
+        return (array('q', map(self.ids.__getitem__, keep)), array('d', map(self.amounts.__getitem__, keep)),
+                array('i', map(self.days.__getitem__, keep)), array('I', map(self.category_ids.__getitem__, keep)),
+                array('B', map(self.type_ids.__getitem__, keep)),
+                {new_rows[row]: date_str for row, date_str in self.odd_dates.items()})
+
+    def compact(self):
+        # Drop the tombstones; rows after them move down, so listeners get a "compact" event and look their rows up again
+        if not self.deleted:
+            return
+        self.ids, self.amounts, self.days, self.category_ids, self.type_ids, self.odd_dates = self.live_columns()
+        self.deleted = 0
+        self._category_rows = None
+        self.build_id_index()
+        self.version += 1
+        if self.listeners:
+            self.notify("compact", None)
+
+    def clear(self):
+        listeners, version, file_separator = self.listeners, self.version, self.file_separator
+        self.__init__(self.separator)
+        self.listeners, self.version, self.file_separator = listeners, version + 1, file_separator
+        if self.listeners:
+            self.notify("clear", None)
+
+    def load_columns(self, amounts, days, category_ids, type_ids, categories, type_names, odd_dates,
+                     category_totals=None, type_totals=None, ids=None, next_id=None):
+        # Replace the contents with whole columns at once, as read from a binary snapshot; without ids the rows are
+        # numbered from 1
+        self.clear()
+        self.amounts, self.days, self.category_ids, self.type_ids = amounts, days, category_ids, type_ids
+        self.categories = list(categories)
+        self.category_lookup = {name: i for i, name in enumerate(self.categories)}
+        self.type_names = list(type_names)
+        self.type_lookup = {name: i for i, name in enumerate(self.type_names)}
+        self.odd_dates = dict(odd_dates)
+        self._category_rows = None
+        numbered = array('q', range(1, len(amounts) + 1))
+        self.ids = numbered if ids is None else ids
+        self.next_id = max(next_id or 1, max(self.ids, default=0) + 1)
+        self._id_rows = None
+        if self.ids != numbered:
+            self.build_id_index()  # Also catches ids given twice, which would make row_of ambiguous
+            if len(self._id_rows) != len(self.ids):
+                raise ValueError("the snapshot gives the same transaction id to more than one transaction")
+        if category_totals is None or type_totals is None:
+            totals = self.recompute_totals()
+            category_totals = [totals["categories"][name] for name in self.categories]
+            type_totals = [totals["types"][name] for name in self.type_names]
+        self.category_totals_column = array('d', category_totals)
+        self.type_totals_column = array('d', type_totals)
+        self.version += 1
+        if self.listeners:
+            self.notify("clear", None)
+
+    # Change notifications
+    def subscribe(self, callback):
+        self.listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def notify(self, event, row, old=None):
+        for callback in list(self.listeners):
+            callback(event, row, old)
+
+    # Summaries, answered from the running totals without looking at any rows
+    def category_totals(self):
+        return dict(zip(self.categories, self.category_totals_column))
+
+    def type_totals(self):
+        return dict(zip(self.type_names, self.type_totals_column))
+
+    def balance(self):
+        type_totals = self.type_totals()
+        return type_totals["Income"] - type_totals["Expense"]
+
+    def recompute_totals(self):
+        # Full scan over every row, used to check the running totals
+        amounts = self.amounts
+        category_totals = {category: sum(map(amounts.__getitem__, rows))
+                           for category, rows in zip(self.categories, self.category_rows())}
+        type_totals = dict.fromkeys(self.type_names, 0.0)
+        type_names = self.type_names
+        for type_id, amount in zip(self.type_ids, amounts):
+            type_totals[type_names[type_id]] += amount
+        return {"categories": category_totals, "types": type_totals}
+
+    def totals_snapshot(self):
+        return {"count": len(self), "categories": self.category_totals(), "types": self.type_totals()}
+
+    def verify_totals(self, expected=None):
+        # Compare the running totals (or totals read from disk) with a full recompute; returns the mismatches
+        expected = expected or self.totals_snapshot()
+        actual = self.recompute_totals()
+        mismatches = []
+        for group in ("categories", "types"):
+            for name, total in actual[group].items():
+                stored = expected.get(group, {}).get(name, 0.0)
+                if not math.isclose(stored, total, rel_tol=1e-9, abs_tol=1e-6):
+                    mismatches.append(f"{name}: running total {stored:.2f}, recomputed {total:.2f}")
+        return mismatches
+
+    def nbytes(self):
+        columns = (self.ids, self.amounts, self.days, self.category_ids, self.type_ids)
+        grouped = self._category_rows or []
+        return sum(column.itemsize * len(column) for column in columns) + sum(rows.itemsize * len(rows) for rows in grouped)
+
+    # Conversion to and from the JSON schemas
+    def load_dict(self, data):
+        # CourseWork2/3 schema: {category: [{"id": ..., "amount": ..., "date": ...}, ...]}; "type" is only there for
+        # non-expenses, and "id" is missing from files saved before ids were kept
+        for category, items in data.items():
+            self.intern_category(category)
+            for item in items:
+                self.add(category, item["amount"], item["date"], item.get("type", "Expense"), item.get("id"))
+
+    def to_dict(self):
+        return {category: [self.entry(row) for row in rows]
+                for category, rows in zip(self.categories, self.category_rows())}
+
+    def load_list(self, data):
+        # CourseWork1 schema: [[amount, category, type, date, id], ...], without the id in older files
+        for record in data:
+            self.add(record[1], record[0], record[3], record[2], record[4] if len(record) > 4 else None)
+
+    def to_list(self):
+        return [self.record(row) for row in self.rows()]
+
+    @classmethod
+    def from_dict(cls, data, separator="|"):
+        store = cls(separator)
+        store.load_dict(data)
+        return store
+
+    @classmethod
+    def from_list(cls, data, separator="-"):
+        store = cls(separator)
+        store.load_list(data)
+        return store
+
+
+# Function to name the file the running totals of a data file are saved in
+def totals_file(filename):
+    return os.path.splitext(filename)[0] + TOTALS_SUFFIX
+
+
+# Function to save the running totals next to the data so they can be checked on the next load; the new file replaces
+# the old one in a single rename, so a crash leaves one or the other and never half of each
+def write_totals(store, filename):
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, "w") as file:
+        json.dump(store.totals_snapshot(), file)
+    os.replace(temp_filename, filename)
+
+
+# Function to read totals saved by write_totals, returning None if there are none
+def read_totals(filename):
+    try:
+        with open(filename, "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
@@ -0,0 +1,45 @@
+import pytest
+from finance_core import analytics
+from finance_core.transaction_store import TransactionStore
+
+
+# Function to build a store with incomes, several categories, a deleted row and a date that never parsed
+def sample_store():
+    store = TransactionStore()
+    for i in range(200):
+        store.add(("Food", "Rent", "Travel")[i % 3], (i * 37 % 101) + 0.1 * (i % 7), f"20{23 + i % 2}|{i % 12 + 1:02d}|"
+                  f"{i % 28 + 1:02d}", "Income" if i % 10 == 0 else "Expense")
+    store.delete(store.row_of(5))
+    store.add("Food", 12.5, "not a date")
+    return store
+
+
+# Function to run every query of an Analytics
+def every_answer(engine):
+    return (engine.totals("category"), engine.totals("type"),
+            [engine.period_totals(granularity, by) for granularity in ("day", "month", "year")
+             for by in ("category", "type")],
+            engine.running_balance(), engine.percentiles(), engine.percentiles(category="Rent"))
+
+
+def test_numpy_and_pure_python_give_identical_results():
+    pytest.importorskip("numpy")
+    store = sample_store()
+    assert every_answer(analytics.Analytics(store, use_numpy=True)) == every_answer(
+        analytics.Analytics(store, use_numpy=False))
+    store.update(store.row_of(7), amount=1000.0)  # The arrays follow the store after a change
+    assert every_answer(analytics.Analytics(store, use_numpy=True)) == every_answer(
+        analytics.Analytics(store, use_numpy=False))
+
+
+def test_pure_python_answers():
+    store = TransactionStore()
+    store.add("Salary", 100, "2024|01|01", "Income")
+    store.add("Food", 10, "2024|01|02")
+    store.add("Food", 30, "2024|02|01")
+    engine = analytics.Analytics(store, use_numpy=False)
+    assert engine.totals() == {"Salary": 100.0, "Food": 40.0}
+    assert engine.period_totals("month") == [("2024|01", {"Salary": 100.0, "Food": 10.0}),
+                                             ("2024|02", {"Food": 30.0})]
+    assert engine.running_balance() == [("2024|01|01", 100.0), ("2024|01|02", 90.0), ("2024|02|01", 60.0)]
+    assert engine.percentiles((0, 50, 100)) == {0: 10.0, 50: 30.0, 100: 100.0}
@@ -0,0 +1,73 @@
+import time
+from finance_core import autosave
+from finance_core.transaction_store import TransactionStore
+
+
+# Function to wait until condition() holds, for at most a second
+def wait_for(condition):
+    deadline = time.monotonic() + 1
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_a_burst_of_changes_is_one_background_save():
+    store = TransactionStore()
+    saver = autosave.AutoSaver(store, delay=0.05, max_operations=1000)
+    saves = []
+    saver.start(lambda: saves.append(len(store)))
+    try:
+        with saver.lock:
+            for day in range(1, 11):
+                store.add("Food", day, f"2024|01|{day:02d}")
+        assert wait_for(lambda: saves)
+        time.sleep(0.1)
+        assert saves == [10] and saver.pending == 0 and saver.background_saves == 1
+    finally:
+        saver.stop()
+
+
+def test_reaching_max_operations_saves_without_waiting():
+    store = TransactionStore()
+    saver = autosave.AutoSaver(store, delay=60, max_operations=5)
+    saves = []
+    saver.start(lambda: saves.append(len(store)))
+    try:
+        store.add_many("Food", list(range(5)), ["2024|01|01"] * 5)
+        assert wait_for(lambda: saves == [5])
+    finally:
+        saver.stop()
+
+
+def test_failed_saves_are_kept_and_tried_again():
+    store = TransactionStore()
+    saver = autosave.AutoSaver(store, delay=0.05, max_operations=1)
+    results = [False, OSError("disk full"), True]
+    attempts = []
+
+    def save():
+        attempts.append(time.monotonic())
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    saver.start(save)
+    try:
+        store.add("Food", 5, "2024|01|01")
+        assert wait_for(lambda: saver.saves == 1)  # The worker lived through the exception
+        assert saver.failed_saves == 2 and saver.pending == 0
+        assert attempts[1] - attempts[0] >= 0.04 and attempts[2] - attempts[1] >= 0.04  # Not retried in a tight loop
+    finally:
+        saver.stop()
+    assert "2 save(s) failed" in saver.report()
+
+
+def test_an_explicit_flush_reports_a_failure():
+    store = TransactionStore()
+    saver = autosave.AutoSaver(store, delay=0)
+    saver.start(lambda: False)
+    store.add("Food", 5, "2024|01|01")
+    saver.pending = 1  # With a delay of 0 the store is not followed; the menu calls flush() itself
+    assert saver.flush() is False
+    assert saver.pending == 1 and saver.saves == 0 and saver.failed_saves == 1
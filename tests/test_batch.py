@@ -0,0 +1,50 @@
+import io
+import sys
+
+from finance_core import batch, export, storage
+from finance_core.transaction_store import TransactionStore
+
+
+def run_script(monkeypatch, text):
+    store = TransactionStore()
+    calls = []
+    handlers = {"add": lambda args: store.add(args.category, args.amount, args.date, args.type)}
+    stdin = io.StringIO(text)
+    monkeypatch.setattr(sys, "stdin", stdin)
+    status = batch.main(["run", "-"], store, handlers, lambda: calls.append("load"), lambda: calls.append("save"))
+    return status, store, calls, stdin
+
+
+def test_script_from_stdin_leaves_stdin_open(monkeypatch):
+    script = "# rent first\nadd Rent 500 2024|01|01\nadd 'Food and drink' 20 2024|01|02\n"
+    status, store, calls, stdin = run_script(monkeypatch, script)
+    assert status == 0 and calls == ["load", "save"]
+    assert store.categories == ["Rent", "Food and drink"]
+    assert not stdin.closed
+
+
+def test_unbalanced_quote_is_reported_with_its_line(monkeypatch, capsys):
+    status, store, calls, stdin = run_script(monkeypatch, "add Rent 500 2024|01|01\nadd 'Food 20 2024|01|02\n")
+    assert status == 1 and calls == [] and len(store) == 0
+    assert capsys.readouterr().out.startswith("Line 2: No closing quotation")
+    assert not stdin.closed
+
+
+def test_help_on_a_script_line_is_reported_not_an_exit(monkeypatch, capsys):
+    status, store, calls, stdin = run_script(monkeypatch, "add Rent 500 2024|01|01\nadd -h\n")
+    assert status == 1 and calls == [] and len(store) == 0
+    assert capsys.readouterr().out.endswith("Line 2: -h prints help and is not an operation\n")
+
+
+def test_export_types_are_matched_in_any_case(tmp_path):
+    store = TransactionStore()
+    store.add("Salary", 1000, "2024|01|01", "Income")
+    store.add("Food", 5, "2024|01|02")
+    source, batch_target, cli_target = (str(tmp_path / name) for name in ("t.json", "batch.jsonl", "cli.jsonl"))
+    backend = storage.open_backend("json", source)
+    backend.save(store)
+    handlers = {"export": lambda args: batch.export_file(store, args)}
+    assert batch.main(["export", batch_target, "--type", "income"], store, handlers, lambda: None, lambda: None) == 0
+    export.main([source, cli_target, "--type", "income"])
+    with open(batch_target) as batch_file, open(cli_target) as cli_file:
+        assert batch_file.read() == cli_file.read() != ""
@@ -0,0 +1,63 @@
+import json
+import pytest
+from finance_core import binary_snapshot, schema
+from finance_core.transaction_store import TransactionStore
+
+
+# Function to build a store with incomes, a deleted row, an id that no longer follows its row and an odd date
+def sample_store(separator="|"):
+    store = TransactionStore(separator)
+    for day in range(1, 21):
+        store.add(("Food", "Rent")[day % 2], day * 1.5, f"2024{separator}01{separator}{day:02d}",
+                  "Income" if day % 5 == 0 else "Expense")
+    store.delete(store.row_of(4))
+    store.add("Food", 9, "someday")
+    return store
+
+
+# Function to list a store's transactions by id
+def by_id(store):
+    return {store.ids[row]: store.record(row) for row in store.rows()}
+
+
+def test_a_snapshot_loads_back_the_same_store(tmp_path):
+    store = sample_store()
+    filename = str(tmp_path / "t.bin")
+    binary_snapshot.write_snapshot(store, filename)
+    loaded = binary_snapshot.load_snapshot(TransactionStore(), filename)
+    assert by_id(loaded) == by_id(store) and loaded.next_id == store.next_id == 22
+    assert loaded.category_totals() == store.category_totals() and loaded.type_totals() == store.type_totals()
+    assert loaded.record(loaded.row_of(21)) == [9.0, "Food", "Expense", "someday"]
+    assert not loaded.verify_totals()
+
+
+def test_the_reader_answers_without_loading_the_rows(tmp_path):
+    store = sample_store()
+    filename = str(tmp_path / "t.bin")
+    binary_snapshot.write_snapshot(store, filename)
+    with binary_snapshot.SnapshotReader(filename) as reader:
+        assert reader.category_totals() == store.category_totals()
+        assert "amounts" not in reader.__dict__  # Totals come from their own section
+        rows = list(reader.rows_between("2024|01|05", "2024|01|10"))
+        assert sorted(reader.record(row)[3] for row in rows) == [f"2024|01|{day:02d}" for day in range(5, 11)]
+        assert reader.total_between("2024|01|05", "2024|01|10", "Food") == sum(day * 1.5 for day in (6, 8, 10))
+        assert reader.total_between("2023|01|01", "2023|12|31") == 0
+
+
+@pytest.mark.parametrize("separator", ["|", "-"])
+def test_json_converts_to_a_snapshot_and_back(tmp_path, separator):
+    store = sample_store(separator)
+    json_file, snapshot_file, back_file = (str(tmp_path / name) for name in ("t.json", "t.bin", "back.json"))
+    with open(json_file, "w") as file:
+        file.writelines(schema.document_chunks(store))
+    binary_snapshot.json_to_snapshot(json_file, snapshot_file)
+    binary_snapshot.snapshot_to_json(snapshot_file, back_file)
+    with open(json_file) as original, open(back_file) as converted:
+        assert json.load(converted) == json.load(original)
+
+
+def test_other_files_are_refused(tmp_path):
+    path = tmp_path / "t.bin"
+    path.write_bytes(b"{}" * 64)
+    with pytest.raises(ValueError):
+        binary_snapshot.SnapshotReader(str(path))
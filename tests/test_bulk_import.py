@@ -0,0 +1,48 @@
+import io
+from finance_core import bulk_import
+
+
+# Function to parse a whole bulk file held in a string, as the importers do batch by batch
+def parse(text, batch_size=bulk_import.BULK_BATCH_SIZE):
+    report = {"accepted": 0, "rejected": 0, "errors": []}
+    rows = []
+    for batch in bulk_import.read_bulk_batches(io.StringIO(text), batch_size):
+        rows.extend(bulk_import.parse_bulk_batch(batch, report))
+    return rows, report
+
+
+def test_rejected_lines_are_counted_and_reported_once():
+    text = ("Food,5,2024|01|01\n"
+            "\n"
+            "Food,5\n"
+            ",5,2024|01|02\n"
+            "Food,five,2024|01|03\n"
+            "Food,5,2024-01-04\n"
+            "Rent,500,2024|02|30\n"
+            "Rent,500,2024|02|29\n")
+    rows, report = parse(text)
+    assert rows == [("Food", 5.0, "2024|01|01"), ("Rent", 500.0, "2024|02|29")]
+    assert report["rejected"] == 5  # The blank line is skipped, not rejected
+    assert report["errors"] == [(3, "Invalid data", "Food,5"), (4, "Invalid data", ",5,2024|01|02"),
+                                (5, "Invalid amount", "Food,five,2024|01|03"),
+                                (6, "Invalid date format", "Food,5,2024-01-04"),
+                                (7, "Invalid date format", "Rent,500,2024|02|30")]
+
+
+def test_batches_keep_line_numbers_and_order():
+    text = "".join(f"Food,{i},2024|01|{i % 28 + 1:02d}\n" if i % 4 else f"bad line {i}\n" for i in range(1, 101))
+    rows, report = parse(text, batch_size=7)
+    assert [amount for category, amount, date in rows] == [float(i) for i in range(1, 101) if i % 4]
+    assert report["rejected"] == 25 and len(report["errors"]) == bulk_import.MAX_REPORTED_ERRORS
+    assert [line_number for line_number, reason, line in report["errors"]][:3] == [4, 8, 12]
+
+
+def test_parse_bulk_file_groups_by_category(tmp_path):
+    path = tmp_path / "bank.csv"
+    path.write_text("Food,5,2024|01|01\nRent,500,2024|01|02\nFood,7,2024|01|03\nFood,x,2024|01|04\n")
+    progress = []
+    filename, grouped, report = bulk_import.parse_bulk_file(str(path), progress.append)
+    assert filename == str(path) and report["failed"] is None
+    assert grouped == {"Food": ([5.0, 7.0], ["2024|01|01", "2024|01|03"]), "Rent": ([500.0], ["2024|01|02"])}
+    assert report["accepted"] == 3 and report["rejected"] == 1 and progress[-1] == 1.0
+    assert bulk_import.parse_bulk_file(str(tmp_path / "missing.csv"))[2]["failed"].endswith("not found!")
@@ -0,0 +1,96 @@
+from finance_core import concurrency, storage
+from finance_core.transaction_store import TransactionStore
+
+
+# Function to map each live transaction id to its record
+def by_id(store):
+    return {store.ids[row]: store.record(row) for row in store.rows()}
+
+
+# Function to open a shared journal backend on filename and load it into a new store
+def load(filename):
+    store = TransactionStore()
+    backend = concurrency.open_shared_backend("journal", filename)
+    backend.load(store)
+    return store, backend
+
+
+def test_deferred_merge_is_applied_by_id(tmp_path):
+    filename = str(tmp_path / "shared.json")
+    store, backend = load(filename)
+    for day in range(1, 7):
+        store.add("Food" if day % 2 else "Rent", day, f"2024|01|{day:02d}")
+    backend.save(store)
+
+    other, other_backend = load(filename)
+    other.delete(other.row_of(1))
+    other.update(other.row_of(2), amount=20)
+    other.add("Food", 7, "2024|01|07")
+    other_backend.save(other)
+
+    store.add("Food", 8, "2024|01|08")  # Id 7 here as well, so the merge renumbers it
+    store.update(store.row_of(5), category="Rent")  # Before Rent's id 6 in the file, after it here
+    events = []
+    store.subscribe(lambda event, row, old: events.append((event, store.ids[row])))
+    backend.save(store, defer_merge=True)
+    assert events == [] and 1 in by_id(store)  # Written, but the store is left for its own thread
+
+    backend.apply_merge(store)
+    assert events == [("delete", 1), ("update", 2), ("update", 7), ("add", 8)]  # No clear, only what differs
+    reader, reader_backend = load(filename)
+    assert by_id(reader) == by_id(store)
+    reader_backend.close()
+
+    # The file holds the merged rows in its own order; later changes must still reach the right transactions
+    store.delete(store.row_of(2))
+    store.update(store.row_of(8), amount=80)
+    backend.save(store)
+    assert backend.merges == 1
+    reader = TransactionStore()
+    reader_backend = storage.open_backend("journal", filename)
+    reader_backend.load(reader)
+    assert by_id(reader) == by_id(store)
+
+
+def test_changes_are_kept_as_ids(tmp_path):
+    filename = str(tmp_path / "shared.json")
+    store, backend = load(filename)
+    store.add("Rent", 500, "2024|01|01")
+    backend.save(store)
+    store.add_many("Food", list(range(1000)), ["2024|01|02"] * 1000)
+    store.add("Food", 5, "2024|01|03")
+    store.update(store.row_of(2), amount=7)  # Added since the last save, so its values are read at the merge
+    store.update(store.row_of(1), amount=450)
+    store.update(store.row_of(1), amount=400)
+    assert backend.added == [[2, 1002]]
+    assert backend.touched == {1: [500.0, "Rent", "Expense", "2024|01|01"]}
+
+    other, other_backend = load(filename)
+    other.add("Travel", 80, "2024|02|01")  # Id 2 as well
+    other_backend.save(other)
+    store.delete(store.row_of(3))  # Added and deleted before the merge, so never written
+    backend.save(store)
+    reader, reader_backend = load(filename)
+    reader_backend.close()
+    assert by_id(reader) == by_id(store)
+    assert len(reader) == 1002 and reader.record(reader.row_of(1))[0] == 400
+    assert reader.record(reader.row_of(2))[1] == "Travel"
+    assert reader.record(reader.row_of(3))[0] == 7  # Its id 2 was taken, and 3 was never saved
+
+
+def test_the_same_change_in_both_processes_is_no_conflict(tmp_path):
+    filename = str(tmp_path / "shared.json")
+    store, backend = load(filename)
+    store.add("Rent", 500, "2024|01|01")
+    store.add("Food", 5, "2024|01|02")
+    backend.save(store)
+    other, other_backend = load(filename)
+    other.delete(other.row_of(1))
+    other.update(other.row_of(2), amount=6)
+    other_backend.save(other)
+
+    store.delete(store.row_of(1))
+    store.update(store.row_of(2), amount=7)
+    backend.save(store)
+    assert backend.conflicts == 1  # Only the update: the other process left 6 where 5 was expected
+    assert by_id(store) == {2: [6.0, "Food", "Expense", "2024|01|02"]}
@@ -0,0 +1,36 @@
+from datetime import datetime
+import pytest
+from finance_core import date_codec
+
+SAMPLES = ["2024|01|31", "2024|02|29", "2023|02|29", "2024|13|01", "2024|00|10", "2024|04|31", "0001|01|01",
+           "9999|12|31", "0000|01|01", "2024|1|5", "2024|01|5", "24|01|01", "2024-01-31", "2024|01-31", "2024/01/31",
+           "2024|01|3a", "２０２４|01|01", "2024|01|01 ", " 2024|01|01", "2024||0101", "", "|", "abcd|ef|gh"]
+
+
+# Function to give what strptime makes of a date string, as the code before the codec did
+def strptime_date(date_str, separator):
+    try:
+        return datetime.strptime(date_str, f"%Y{separator}%m{separator}%d").date()
+    except ValueError:
+        return None
+
+
+@pytest.mark.parametrize("separator", ["|", "-"])
+def test_the_codec_agrees_with_strptime(separator):
+    for sample in SAMPLES:
+        date_str = sample.replace("|", separator)
+        assert date_codec.parse_date(date_str, separator) == strptime_date(date_str, separator), date_str
+        assert date_codec.is_valid_date(date_str, separator) == (strptime_date(date_str, separator) is not None)
+
+
+def test_a_column_is_validated_in_order():
+    column = SAMPLES * 3
+    assert date_codec.validate_dates(column) == [strptime_date(date_str, "|") is not None for date_str in column]
+
+
+def test_keys_and_normal_forms():
+    assert date_codec.date_key("2024|01|02") - date_codec.date_key("2024|01|01") == 1
+    assert date_codec.date_key("not a date") == 0 and date_codec.date_key("") == 0
+    assert date_codec.normalize_date("2024|1|5") == "2024|01|05"
+    assert date_codec.normalize_date("2024-1-5", "-") == "2024-01-05"
+    assert date_codec.normalize_date("not a date") == "not a date"
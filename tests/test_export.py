@@ -0,0 +1,72 @@
+import json
+import pytest
+from finance_core import bulk_import, export
+from finance_core.transaction_store import TransactionStore
+
+
+# Function to fill a store with three categories, incomes, a category holding a comma and a date that never parsed
+def sample_store():
+    store = TransactionStore()
+    for day in range(1, 31):
+        store.add(("Food", "Rent", "Travel")[day % 3], day + 0.25, f"2024|{day % 12 + 1:02d}|{day:02d}",
+                  "Income" if day % 5 == 0 else "Expense")
+    store.delete(store.row_of(7))
+    store.add("Fees, bank", 3, "2024|01|01")
+    store.add("Food", 4, "someday")
+    return store
+
+
+@pytest.mark.parametrize("export_format", export.EXPORT_FORMATS)
+def test_every_format_writes_the_rows_asked_for(tmp_path, export_format):
+    store = sample_store()
+    target = str(tmp_path / f"out.{export_format}")
+    for filters in ({}, {"category": "Food"}, {"transaction_type": "Income"}, {"category": "Missing"},
+                    {"start_date": "2024|03|01", "end_date": "2024|06|30"},
+                    {"category": "Rent", "transaction_type": "Expense", "start_date": "2024|06|01"}):
+        expected = list(export.select_rows(store, **filters))
+        skipped = sum(store.category(row) == "Fees, bank" for row in expected) if export_format == "csv" else 0
+        written = export.export_transactions(store, target, export_format, **filters)
+        assert written == (len(expected) - skipped, skipped), filters
+        with open(target) as file:
+            text = file.read()
+        if export_format == "list":
+            assert len(json.loads(text)) == len(expected)
+        else:
+            assert len(text.splitlines()) == len(expected) - skipped
+
+
+def test_filters_match_the_rows_they_name():
+    store = sample_store()
+    assert len(list(export.select_rows(store))) == 31
+    assert {store.category(row) for row in export.select_rows(store, category="Food")} == {"Food"}
+    march_to_june = list(export.select_rows(store, start_date="2024|03|01", end_date="2024|06|30"))
+    assert march_to_june and all("2024|03|01" <= store.date(row) <= "2024|06|30" for row in march_to_june)
+    assert "someday" not in {store.date(row) for row in export.select_rows(store, start_date="2024|01|01")}
+    with pytest.raises(ValueError):
+        list(export.select_rows(store, end_date="2024|02|30"))
+
+
+def test_csv_reads_back_through_the_bulk_import(tmp_path):
+    store = sample_store()
+    target = tmp_path / "out.csv"
+    assert export.export_transactions(store, str(target)) == (30, 1)  # Format from the extension
+    report = {"accepted": 0, "rejected": 0, "errors": []}
+    with open(target) as file:
+        batches = bulk_import.read_bulk_batches(file)
+        rows = [row for batch in batches for row in bulk_import.parse_bulk_batch(batch, report)]
+    assert report["rejected"] == 1  # The row dated "someday"
+    live = [row for row in store.rows() if store.category(row) != "Fees, bank" and store.days[row]]
+    assert rows == [(store.category(row), store.amounts[row], store.date(row)) for row in live]
+
+
+def test_lines_are_written_a_chunk_at_a_time():
+    class Recorder:
+        def __init__(self):
+            self.writes = []
+
+        def write(self, text):
+            self.writes.append(text)
+
+    file = Recorder()
+    export.write_chunks((f"{i}\n" for i in range(10)), file, chunk_size=4)
+    assert [text.count("\n") for text in file.writes] == [4, 4, 2]
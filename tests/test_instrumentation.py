@@ -0,0 +1,70 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import pytest
+from finance_core import instrumentation
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(instrumentation, "ENABLED", True)
+    instrumentation.reset()
+    yield
+    instrumentation.reset()
+
+
+def test_nothing_is_wrapped_or_recorded_when_disabled(monkeypatch):
+    monkeypatch.setattr(instrumentation, "ENABLED", False)
+    instrumentation.reset()
+
+    def work():
+        return 42
+
+    assert instrumentation.timed("work")(work) is work
+    with instrumentation.timer("block"):
+        pass
+    instrumentation.count("rows", 10)
+    assert instrumentation.snapshot() == {"operations": {}, "counters": {}}
+
+
+def test_calls_land_in_the_latency_histogram(enabled):
+    for seconds in (0.00005, 0.0003, 0.0003, 0.02, 60):
+        instrumentation.record("save", seconds)
+    calls = []
+    wrapped = instrumentation.timed("add")(lambda amount: calls.append(amount) or amount)
+    assert wrapped(5) == 5 and calls == [5]
+    with pytest.raises(ZeroDivisionError):
+        with instrumentation.timer("divide"):
+            1 / 0  # Failed calls are timed too
+    instrumentation.count("rows", 3)
+    instrumentation.count("rows", 4)
+
+    data = instrumentation.snapshot()
+    save = data["operations"]["save"]
+    assert save["count"] == 5 and save["min_ms"] == pytest.approx(0.05) and save["max_ms"] == 60000
+    assert save["histogram"] == {"<=0.1ms": 1, "<=0.5ms": 2, "<=25ms": 1, ">10000ms": 1}
+    assert data["operations"]["add"]["count"] == 1 and data["operations"]["divide"]["count"] == 1
+    assert data["counters"] == {"rows": 7}
+    output = io.StringIO()
+    instrumentation.report(output)
+    assert "save: 5 call(s)" in output.getvalue() and "rows: 7" in output.getvalue()
+
+
+def test_a_session_writes_its_report_and_profiles_at_exit(tmp_path):
+    report_file = tmp_path / "report.json"
+    env = dict(os.environ, FINANCE_INSTRUMENT="1", FINANCE_INSTRUMENT_OUTPUT=str(report_file),
+               FINANCE_PROFILE="cprofile,tracemalloc", FINANCE_PROFILE_FILE=str(tmp_path / "session.prof"))
+    script = ("from finance_core import instrumentation\n"
+              "instrumentation.start_session()\n"
+              "instrumentation.timed('work')(sum)(range(1000))\n"
+              "instrumentation.count('rows', 2)\n")
+    result = subprocess.run([sys.executable, "-c", script], cwd=REPO_DIR, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    data = json.loads(report_file.read_text())
+    assert data["operations"]["work"]["count"] == 1 and data["counters"] == {"rows": 2}
+    assert (tmp_path / "session.prof").exists()
+    assert "Memory:" in result.stderr
@@ -0,0 +1,180 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+from finance_core import journal, storage
+from finance_core.transaction_store import TransactionStore
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Function to open a journal backend on a snapshot in tmp_path, loaded into a new store
+def open_ledger(tmp_path, compact_threshold=journal.COMPACT_THRESHOLD):
+    backend = storage.JournalBackend(str(tmp_path / "transactions.json"))
+    backend.journal.compact_threshold = compact_threshold
+    store = TransactionStore()
+    backend.load(store)
+    return store, backend
+
+
+# Function to read the ledger back the way the next run would
+def reload(tmp_path):
+    store, backend = open_ledger(tmp_path)
+    backend.close()
+    return store.to_list()
+
+
+def test_storage_script_reads_the_journal(tmp_path):
+    store, backend = open_ledger(tmp_path)
+    store.add("Food", 10, "2024|01|01")
+    backend.save_all(store)
+    store.add("Rent", 500, "2024|01|02")  # Only in the journal
+    backend.save(store)
+    target = str(tmp_path / "copy.bin")
+    result = subprocess.run([sys.executable, "-m", "finance_core.storage", backend.filename, target], cwd=REPO_DIR,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == f"Wrote 2 transaction(s) to {target}."
+
+
+def test_changes_are_appended_and_replayed(tmp_path):
+    store, backend = open_ledger(tmp_path)
+    store.add("Food", 10, "2024|01|01")
+    store.add("Rent", 500, "2024|01|02")
+    backend.save(store)
+    store.update(store.row_at("Food", 0), amount=12.5, date_str="2024|01|03")
+    store.add("Pay", 900, "2024|01|04", "Income")
+    store.delete(store.row_at("Rent", 0))
+    backend.save(store)
+
+    assert not os.path.exists(tmp_path / "transactions.json")  # Nothing was compacted, only journaled
+    assert reload(tmp_path) == [[12.5, "Food", "Expense", "2024|01|03"], [900.0, "Pay", "Income", "2024|01|04"]]
+
+
+def test_torn_record_is_ignored_and_truncated(tmp_path):
+    store, backend = open_ledger(tmp_path)
+    store.add("Food", 10, "2024|01|01")
+    backend.save(store)
+    with open(tmp_path / "transactions.journal", "ab") as file:
+        file.write(b'{"op": "add", "category": "Food", "amo')  # A crash in the middle of an append
+
+    store, backend = open_ledger(tmp_path)
+    assert store.to_list() == [[10.0, "Food", "Expense", "2024|01|01"]]
+    store.add("Rent", 500, "2024|01|02")
+    backend.save(store)
+
+    with open(tmp_path / "transactions.journal", "rb") as file:
+        assert b'"amo{' not in file.read()  # The next append wrote over the torn record
+    assert reload(tmp_path) == [[10.0, "Food", "Expense", "2024|01|01"], [500.0, "Rent", "Expense", "2024|01|02"]]
+
+
+def test_damaged_record_stops_the_replay(tmp_path, capsys):
+    store, backend = open_ledger(tmp_path)
+    store.add("Food", 10, "2024|01|01")
+    backend.save(store)
+    with open(tmp_path / "transactions.journal", "ab") as file:
+        file.write(b"not json\n")
+        file.write(b'{"op": "add", "category": "Rent", "amount": 5, "date": "2024|01|02"}\n')
+
+    assert reload(tmp_path) == [[10.0, "Food", "Expense", "2024|01|01"]]
+    assert "journal is damaged" in capsys.readouterr().out
+
+
+def test_journal_of_another_snapshot_is_ignored(tmp_path):
+    store, backend = open_ledger(tmp_path)
+    store.add("Food", 10, "2024|01|01")
+    backend.save_all(store)  # Snapshot with Food only
+    store.add("Rent", 500, "2024|01|02")
+    backend.save(store)  # Journaled against that snapshot
+
+    os.makedirs(tmp_path / "other")
+    other, other_backend = open_ledger(tmp_path / "other")
+    other.add("Travel", 75, "2024|02|01")
+    other_backend.save_all(other)
+    shutil.copy(tmp_path / "other" / "transactions.json", tmp_path / "transactions.json")
+
+    # The journal's base digest names the old snapshot, so its Rent record must not be applied to this one
+    assert reload(tmp_path) == [[75.0, "Travel", "Expense", "2024|02|01"]]
+
+
+def test_replay_after_compaction(tmp_path):
+    store, backend = open_ledger(tmp_path, compact_threshold=3)
+    for day in range(1, 3):
+        store.add("Food", day, f"2024|01|{day:02d}")
+        backend.save(store)
+    shutil.copy(tmp_path / "transactions.journal", tmp_path / "stale.journal")
+    store.add("Food", 3, "2024|01|03")
+    backend.save(store)  # The third record reaches the threshold, so this save writes a snapshot instead
+
+    assert os.path.exists(tmp_path / "transactions.json")
+    assert not os.path.exists(tmp_path / "transactions.journal")
+    expected = [[float(day), "Food", "Expense", f"2024|01|{day:02d}"] for day in range(1, 4)]
+    assert reload(tmp_path) == expected
+
+    # A crash between writing the snapshot and removing the journal leaves the old journal behind; its records are
+    # already in the snapshot, so replaying them would add them twice
+    shutil.copy(tmp_path / "stale.journal", tmp_path / "transactions.journal")
+    assert reload(tmp_path) == expected
+
+    store, backend = open_ledger(tmp_path, compact_threshold=3)
+    store.add("Food", 4, "2024|01|04")
+    store.delete(store.row_at("Food", 0))
+    backend.save(store)  # Journaled against the new snapshot, over the stale journal
+    assert reload(tmp_path) == expected[1:] + [[4.0, "Food", "Expense", "2024|01|04"]]
+
+
+def test_records_name_transactions_by_id(tmp_path):
+    store, backend = open_ledger(tmp_path)
+    store.add("Food", 1, "2024|01|01")
+    store.add("Rent", 2, "2024|01|02")
+    store.add("Food", 3, "2024|01|03")
+    backend.save_all(store)  # The snapshot keeps Food's rows together: ids 1, 3, then Rent's 2
+    store.update(store.row_of(1), category="Rent")  # Before id 2 in Rent here, after it once replayed
+    store.delete(store.row_of(2))
+    store.update(store.row_of(3), amount=30)
+    backend.save(store)
+    assert backend.journal.record_count == 3  # Even the change of category is appended as a record
+
+    reloaded, backend = open_ledger(tmp_path)
+    backend.close()
+    assert {reloaded.ids[row]: reloaded.record(row) for row in reloaded.rows()} == {
+        1: [1.0, "Rent", "Expense", "2024|01|01"], 3: [30.0, "Food", "Expense", "2024|01|03"]}
+
+
+def test_records_of_older_journals_still_replay(tmp_path):
+    store, backend = open_ledger(tmp_path)
+    store.add("Food", 10, "2024|01|01")
+    store.add("Food", 20, "2024|01|02")
+    backend.save_all(store)
+    with open(tmp_path / "transactions.journal", "wb") as file:
+        file.write(json.dumps({"base": backend.journal.digest}).encode() + b"\n")
+        file.write(b'{"op": "update", "category": "Food", "index": 1, "amount": 25, "date": "2024|01|03"}\n')
+        file.write(b'{"op": "delete", "category": "Food", "index": 0}\n')
+    assert reload(tmp_path) == [[25.0, "Food", "Expense", "2024|01|03"]]
+
+
+def test_type_only_update_survives_a_reload(tmp_path):
+    store, backend = open_ledger(tmp_path)
+    store.add("Pay", 900, "2024|01|01")
+    store.add("Pay", 950, "2024|02|01", "Income")
+    backend.save(store)
+    store.update(store.row_at("Pay", 0), transaction_type="Income")
+    store.update(store.row_at("Pay", 1), transaction_type="Expense")
+    backend.save(store)
+    assert not backend.journal.snapshot_needed  # Appended as records, not a full rewrite
+    assert reload(tmp_path) == store.to_list()
+
+
+def test_compaction_limit_grows_with_the_snapshot(tmp_path):
+    store, backend = open_ledger(tmp_path, compact_threshold=3)
+    backend.journal.compact_ratio = 0.5
+    store.add_many("Food", list(range(10)), ["2024|01|01"] * 10)
+    backend.save(store)  # Ten records at once pass the threshold, so this writes a snapshot of ten rows
+    assert backend.journal.compact_limit() == 5
+    for amount in range(4):
+        store.add("Rent", amount, "2024|01|02")
+    backend.save(store)
+    assert backend.journal.record_count == 4 and not backend.journal.snapshot_needed
+    store.add("Rent", 4, "2024|01|02")
+    assert backend.journal.snapshot_needed
@@ -0,0 +1,53 @@
+import pytest
+from finance_core.rollups import GRANULARITIES, Rollups
+from finance_core.transaction_store import TransactionStore
+
+
+# Function to give every report of a Rollups, so a kept one can be compared with a fresh build
+def every_report(rollups):
+    return ([rollups.report(granularity, by) for granularity in GRANULARITIES for by in ("category", "type")],
+            rollups.undated_totals("category"), rollups.undated_totals("type"))
+
+
+def test_buckets_follow_updates_and_deletes():
+    store = TransactionStore()
+    store.add("Salary", 1000, "2024|01|31", "Income")
+    store.add("Food", 10, "2024|01|31")
+    store.add("Food", 20, "2024|02|01")
+    store.add("Rent", 500, "2023|12|31")
+    rollups = Rollups(store)
+    assert rollups.report("month") == [("2023|12", {"Rent": 500.0}), ("2024|01", {"Salary": 1000.0, "Food": 10.0}),
+                                       ("2024|02", {"Food": 20.0})]
+
+    store.update(store.row_of(2), amount=15, date_str="2024|02|10")  # Moves to another month
+    store.update(store.row_of(3), category="Travel", transaction_type="Income")
+    store.delete(store.row_of(4))  # The only row of its day, month and year
+    store.add_many("Food", [1, 2], ["2024|02|10", "not a date"])
+    store.compact()
+    assert rollups.report("month") == [("2024|01", {"Salary": 1000.0}),
+                                       ("2024|02", {"Food": 16.0, "Travel": 20.0})]
+    assert rollups.report("year", "type") == [("2024", {"Income": 1020.0, "Expense": 16.0})]
+    assert rollups.report("day", start_date="2024|02|02") == [("2024|02|10", {"Food": 16.0})]
+    assert rollups.undated_totals() == {"Food": 2.0}
+    assert every_report(rollups) == every_report(Rollups(store))
+    assert not rollups.verify()
+
+
+def test_a_cleared_store_is_built_again():
+    store = TransactionStore()
+    store.add("Food", 10, "2024|01|01")
+    rollups = Rollups(store)
+    assert rollups.report("year") == [("2024", {"Food": 10.0})]
+    store.clear()
+    store.add("Rent", 5, "2025|01|01")
+    assert rollups.report("year") == [("2025", {"Rent": 5.0})]
+
+
+def test_reports_check_their_arguments():
+    rollups = Rollups(TransactionStore())
+    with pytest.raises(ValueError):
+        rollups.report("week")
+    with pytest.raises(ValueError):
+        rollups.report("month", by="account")
+    with pytest.raises(ValueError):
+        rollups.report("month", start_date="2024|13|01")
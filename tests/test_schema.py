@@ -0,0 +1,49 @@
+import json
+import pytest
+from finance_core import schema, storage
+from finance_core.transaction_store import TransactionStore
+
+
+# Function to load a file the way a coursework does: read it, then upgrade it to the program's own schema
+def load(mode, path, program_schema):
+    store = TransactionStore(schema.SCHEMA_SEPARATORS[program_schema])
+    backend = storage.open_backend(mode, str(path))
+    backend.load(store)
+    return store, backend, schema.upgrade(store, backend, program_schema)
+
+
+@pytest.mark.parametrize("mode", ["json", "journal", "sqlite"])
+def test_a_current_file_keeps_its_schema_in_both_programs(tmp_path, mode):
+    path = tmp_path / ("t.db" if mode == "sqlite" else "t.json")
+    store, backend, message = load(mode, path, schema.LIST_SCHEMA)  # CourseWork1 starts the file
+    store.add("Food", 5, "2024-01-02", "Income")
+    backend.save(store)
+    backend.close()
+
+    store, backend, message = load(mode, path, schema.CATEGORY_SCHEMA)  # CourseWork2/3 reads and changes it
+    assert message is None
+    assert store.record(0) == [5, "Food", "Income", "2024|01|02"]
+    store.add("Rent", 500, "2024|01|03")
+    backend.save(store)
+    backend.close()
+
+    store, backend, message = load(mode, path, schema.LIST_SCHEMA)
+    assert message is None
+    assert [store.record(row) for row in store.rows()] == [[5, "Food", "Income", "2024-01-02"],
+                                                           [500, "Rent", "Expense", "2024-01-03"]]
+    backend.close()
+    if mode == "json":
+        with open(path) as file:
+            data = json.load(file)
+        assert data["schema"] == schema.LIST_SCHEMA and data["transactions"][1][3] == "2024-01-03"
+
+
+def test_an_older_file_is_rewritten_in_the_program_schema(tmp_path):
+    path = tmp_path / "t.json"
+    path.write_text(json.dumps([[5, "Food", "Expense", "2024-01-02"]]))  # Version 1: CourseWork1's bare list
+    store, backend, message = load("json", path, schema.CATEGORY_SCHEMA)
+    assert message == (f"Upgraded {path} from the list schema (version 1) to the categories schema "
+                       f"(version {schema.SCHEMA_VERSION}).")
+    data = json.loads(path.read_text())
+    assert data["version"] == schema.SCHEMA_VERSION and data["schema"] == schema.CATEGORY_SCHEMA
+    assert data["transactions"]["Food"][0]["date"] == "2024|01|02"
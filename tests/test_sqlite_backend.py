@@ -0,0 +1,67 @@
+import sqlite3
+from finance_core import storage
+from finance_core.transaction_store import TransactionStore
+
+
+# Function to open the SQLite backend on a file in tmp_path and load it into a new store
+def load(path):
+    store = TransactionStore()
+    backend = storage.SqliteBackend(str(path))
+    backend.load(store)
+    return store, backend
+
+
+# Function to fill a store with two categories, an income and a date that never parsed
+def fill(store):
+    for day in range(1, 13):
+        store.add(("Food", "Rent", "Travel")[day % 3], day * 2.5, f"2024|{day:02d}|15",
+                  "Income" if day % 4 == 0 else "Expense")
+    store.add("Food", 7, "someday")
+
+
+def test_changes_round_trip_through_the_database(tmp_path):
+    store, backend = load(tmp_path / "t.db")
+    fill(store)
+    backend.save(store)
+    store.update(store.row_of(2), amount=99, category="Travel", transaction_type="Income")
+    store.delete(store.row_of(5))
+    store.add("Rent", 1, "2024|12|31")
+    backend.save(store)
+    backend.close()
+
+    reloaded, backend = load(tmp_path / "t.db")
+    assert {reloaded.ids[row]: reloaded.record(row) for row in reloaded.rows()} == {
+        store.ids[row]: store.record(row) for row in store.rows()}
+    assert reloaded.next_id == store.next_id
+    backend.close()
+
+
+def test_summaries_are_sql_aggregates_matching_the_store(tmp_path):
+    store, backend = load(tmp_path / "t.db")
+    fill(store)
+    store.delete(store.row_of(3))
+    in_memory = storage.StorageBackend()
+    assert backend.category_totals(store) == store.category_totals()
+    assert backend.type_totals(store) == store.type_totals()
+    for filters in ({}, {"category": "Food"}, {"transaction_type": "Income"}, {"category": "Missing"},
+                    {"start_date": "2024|03|01", "end_date": "2024|08|31"}, {"start_date": "2024|06|01"},
+                    {"category": "Rent", "transaction_type": "Expense", "end_date": "2024|06|30"}):
+        assert backend.total(store, **filters) == in_memory.total(store, **filters), filters
+    backend.close()
+
+
+def test_the_database_uses_wal_and_indexes(tmp_path):
+    store, backend = load(tmp_path / "t.db")
+    fill(store)
+    backend.save(store)
+    connection = sqlite3.connect(str(tmp_path / "t.db"))
+    try:
+        assert connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        indexes = {name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {"transactions_category_day", "transactions_type_day", "transactions_day"} <= indexes
+        plan = " ".join(str(step) for step in connection.execute(
+            "EXPLAIN QUERY PLAN SELECT TOTAL(amount) FROM transactions WHERE category = ? AND day >= ?", ("Food", 1)))
+        assert "transactions_category_day" in plan
+    finally:
+        connection.close()
+        backend.close()
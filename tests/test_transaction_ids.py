@@ -0,0 +1,69 @@
+import pytest
+from finance_core import concurrency, storage
+from finance_core.transaction_store import TransactionStore
+
+
+# Function to map each live transaction id to its record
+def by_id(store):
+    return {store.ids[row]: store.record(row) for row in store.rows()}
+
+
+# Function to open a backend on a file in tmp_path and load it into a new store
+def load(mode, path):
+    store = TransactionStore()
+    backend = storage.open_backend(mode, str(path))
+    backend.load(store)
+    return store, backend
+
+
+@pytest.mark.parametrize("mode, name", [("json", "t.json"), ("journal", "t.json"), ("snapshot", "t.json"),
+                                        ("binary", "t.bin"), ("sqlite", "t.db")])
+def test_ids_survive_a_reload(tmp_path, mode, name):
+    store, backend = load(mode, tmp_path / name)
+    for day in range(1, 9):
+        store.add("Food" if day % 2 else "Rent", day, f"2024|01|{day:02d}")
+    store.delete(store.row_of(3))
+    store.delete(store.row_of(8))  # The highest id; it must not be given to the next transaction
+    backend.save(store)
+    backend.close()
+
+    reloaded, backend = load(mode, tmp_path / name)
+    assert by_id(reloaded) == by_id(store)
+    reloaded.delete(reloaded.row_of(5))  # What "delete 5" in the menus or DELETE /transactions/5 does
+    assert reloaded.ids[reloaded.add("Travel", 9, "2024|01|09")] == 9
+    backend.save(reloaded)
+    backend.close()
+
+    again, backend = load(mode, tmp_path / name)
+    backend.close()
+    assert sorted(by_id(again)) == [1, 2, 4, 6, 7, 9]
+
+
+def test_merge_keeps_ids(tmp_path):
+    filename = str(tmp_path / "shared.json")
+    store = TransactionStore()
+    backend = concurrency.open_shared_backend("journal", filename)
+    backend.load(store)
+    for day in range(1, 7):
+        store.add("Food", day, f"2024|01|{day:02d}")
+    backend.save(store)
+
+    other = TransactionStore()
+    other_backend = concurrency.open_shared_backend("journal", filename)
+    other_backend.load(other)
+    other.delete(other.row_of(1))
+    other.add("Rent", 100, "2024|02|01")  # Id 7
+    other_backend.save(other)
+
+    store.delete(store.row_of(3))
+    store.add("Travel", 200, "2024|03|01")  # Also id 7 here, so it is renumbered in the merge
+    store.update(store.row_of(2), amount=55)
+    backend.save(store)
+
+    assert {transaction_id: record[:2] for transaction_id, record in by_id(store).items()} == {
+        2: [55.0, "Food"], 4: [4.0, "Food"], 5: [5.0, "Food"], 6: [6.0, "Food"], 7: [100.0, "Rent"],
+        8: [200.0, "Travel"]}
+    merged = TransactionStore()
+    reader = storage.open_backend("journal", filename)
+    reader.load(merged)
+    assert by_id(merged) == by_id(store)
@@ -0,0 +1,81 @@
+import pytest
+from finance_core import storage
+from finance_core.transaction_store import TransactionStore, read_totals
+
+AMOUNTS = [10, 20.5, 3]
+DATES = ["2024|01|02", "not a date", "2024|01|02"]
+
+
+def test_add_many_matches_adding_one_at_a_time():
+    one_by_one = TransactionStore()
+    one_by_one.add("Rent", 500, "2024|01|01")
+    for amount, date_str in zip(AMOUNTS, DATES):
+        one_by_one.add("Food", amount, date_str)
+    bulk = TransactionStore()
+    bulk.add("Rent", 500, "2024|01|01")
+    assert bulk.add_many("Food", iter(AMOUNTS), iter(DATES)) == 1
+
+    assert bulk.to_list() == one_by_one.to_list()
+    assert list(bulk.ids) == list(one_by_one.ids) and bulk.next_id == 5
+    assert bulk.odd_dates == {2: "not a date"}
+    assert bulk.category_totals() == one_by_one.category_totals() and not bulk.verify_totals()
+    assert list(bulk.rows_for("Food")) == [1, 2, 3]
+
+
+def test_add_many_sends_one_notification():
+    store = TransactionStore()
+    events = []
+    store.subscribe(lambda event, row, old: events.append((event, row)))
+    store.add_many("Food", AMOUNTS, DATES)
+    store.add_many("Food", [], [])
+    assert events == [("add_many", 0)]
+
+
+def test_add_many_after_ids_stop_following_rows():
+    store = TransactionStore()
+    store.add("Food", 1, "2024|01|01", transaction_id=7)
+    store.add_many("Food", AMOUNTS, DATES)
+    assert list(store.ids) == [7, 8, 9, 10]
+    assert store.row_of(9) == 2
+
+
+def test_running_totals_follow_every_change():
+    store = TransactionStore()
+    store.add("Salary", 1000, "2024|01|01", "Income")
+    store.add_many("Food", AMOUNTS, DATES)
+    rent = store.add("Rent", 500, "2024|01|03")
+    store.update(1, amount=15)
+    store.update(2, category="Rent", transaction_type="Income")
+    store.delete(rent)
+    store.compact()
+    assert store.category_totals() == {"Salary": 1000.0, "Food": 18.0, "Rent": 20.5}
+    assert store.type_totals() == {"Expense": 18.0, "Income": 1020.5}
+    assert store.balance() == 1002.5
+    totals = store.recompute_totals()
+    assert store.category_totals() == totals["categories"] and store.type_totals() == totals["types"]
+    assert not store.verify_totals()
+
+
+def test_verify_reports_totals_that_do_not_match():
+    store = TransactionStore()
+    store.add_many("Food", AMOUNTS, DATES)
+    stale = store.totals_snapshot()
+    store.add("Food", 7, "2024|01|03")
+    assert store.verify_totals(stale) == ["Food: running total 33.50, recomputed 40.50",
+                                          "Expense: running total 33.50, recomputed 40.50"]
+
+
+@pytest.mark.parametrize("mode, name", [("json", "t.json"), ("sqlite", "t.db")])
+def test_totals_are_saved_beside_the_data(tmp_path, mode, name):
+    store = TransactionStore()
+    backend = storage.open_backend(mode, str(tmp_path / name))
+    backend.keep_totals = True
+    backend.load(store)
+    store.add("Salary", 1000, "2024|01|01", "Income")
+    store.add_many("Food", AMOUNTS, DATES)
+    backend.save(store)
+    backend.close()
+    saved = read_totals(str(tmp_path / "t.totals.json"))
+    assert saved == {"count": 4, "categories": {"Salary": 1000.0, "Food": 33.5},
+                     "types": {"Expense": 33.5, "Income": 1000.0}}
+    assert not store.verify_totals(saved)